@@ -0,0 +1,93 @@
+"""Deterministic market metrics computed over OutcomeColumns.
+
+Everything here is plain arithmetic on the parsed prices and volumes, so
+it runs locally and the final LLM prompt can quote the numbers instead of
+working them out (and getting them wrong).
+
+Definitions, per outcome with a Yes ask ``y`` and No ask ``n``:
+
+- midpoint probability: ``(y + (1 - n)) / 2``, the middle of the Yes bid/ask
+- implied probability: midpoints normalised to sum to 1 for multi-outcome
+  markets (the midpoint itself for a single binary market)
+- spread: ``y + n - 1``, what a round trip through Yes and No costs
+- volume share: outcome volume over the summed outcome volume
+- expected return: ``p / price - 1`` for buying Yes at ``y`` (or No at ``n``)
+  if the implied probability ``p`` is right
+
+Market-level overround is ``sum(y) - 1`` across outcomes of a
+multi-outcome market, and ``y + n - 1`` for a single binary market.
+"""
+import math
+
+from market_model import NAN, is_missing, parse_market
+
+def _nansum(values):
+    return math.fsum(v for v in values if not math.isnan(v))
+
+def midpoints(buy_yes, buy_no):
+    return [(y + 1 - n) / 2 for y, n in zip(buy_yes, buy_no)]
+
+def normalize(values):
+    total = _nansum(values)
+    return [v / total if total and not math.isnan(v) else NAN for v in values]
+
+def spreads(buy_yes, buy_no):
+    return [y + n - 1 for y, n in zip(buy_yes, buy_no)]
+
+def shares(values):
+    return normalize(values)
+
+def expected_returns(probabilities, prices):
+    return [p / price - 1 if price > 0 else NAN for p, price in zip(probabilities, prices)]
+
+def _round(value, digits=4):
+    return None if is_missing(value) else round(value, digits)
+
+def market_metrics(market):
+    """Return a JSON-ready dict of metrics for one ParsedMarket."""
+    cols = market.columns()
+    mids = midpoints(cols.buy_yes, cols.buy_no)
+    if market.is_multi_outcome:
+        implied = normalize(mids)
+        overround = _nansum(cols.buy_yes) - 1 if len(cols) else NAN
+    else:
+        implied = mids
+        overround = cols.buy_yes[0] + cols.buy_no[0] - 1 if len(cols) else NAN
+    outcome_spreads = spreads(cols.buy_yes, cols.buy_no)
+    volume_shares = shares(cols.volume)
+    returns_yes = expected_returns(implied, cols.buy_yes)
+    returns_no = expected_returns([1 - p for p in implied], cols.buy_no)
+    outcome_volume = _nansum(cols.volume)
+
+    outcomes = []
+    for i, title in enumerate(cols.titles):
+        outcomes.append({
+            "title": title,
+            "displayed_probability": _round(cols.probability[i]),
+            "implied_probability": _round(implied[i]),
+            "buy_yes": _round(cols.buy_yes[i]),
+            "buy_no": _round(cols.buy_no[i]),
+            "spread": _round(outcome_spreads[i]),
+            "volume": _round(cols.volume[i], 2),
+            "volume_share": _round(volume_shares[i]),
+            "expected_return_yes": _round(returns_yes[i]),
+            "expected_return_no": _round(returns_no[i]),
+        })
+
+    unattributed = None
+    if market.volume is not None and outcome_volume:
+        unattributed = market.volume - outcome_volume
+
+    return {
+        "title": market.title,
+        "volume": market.volume,
+        "outcome_volume": _round(outcome_volume, 2) if outcome_volume else None,
+        "unattributed_volume": _round(unattributed, 2),
+        "overround": _round(overround),
+        "probability_sum": _round(_nansum(cols.probability)) if len(cols) else None,
+        "outcomes": outcomes,
+    }
+
+def compute_metrics(market_details):
+    """Parse scraped details dicts and compute metrics for each market."""
+    return [market_metrics(parse_market(details)) for details in market_details]
@@ -0,0 +1,626 @@
+"""Scraper backends that turn a search keyword into market data.
+
+Every backend returns the same shapes as the original Selenium code in
+main(): ``search`` gives ``[{"title", "index", "url"}]`` (``search_each``
+runs several searches, ``search_many`` merges them into the same shape) and
+``fetch_market`` gives ``{"title", "volume", "end_date", "outcomes"}``.
+"""
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote, urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import page_selectors as sel
+from readiness import readiness, wait_until
+from scraper import (
+    block_urls,
+    click_market_card,
+    extract_market_bulk,
+    extract_market_details,
+    extract_outcome_data,
+    setup_driver,
+)
+from tracing import debug, tracer
+
+POLYMARKET_URL = "https://polymarket.com"
+
+# Titles and links of every rendered card, and whether the page extends
+# below the viewport (scrolling there may load more cards)
+COLLECT_CARDS_SCRIPT = """
+var titleSelector = arguments[1], linkSelector = arguments[2];
+var cards = Array.prototype.map.call(document.querySelectorAll(arguments[0]), function (card) {
+    var title = card.querySelector(titleSelector);
+    var link = card.querySelector(linkSelector);
+    return {title: title ? title.innerText.trim() : null, url: link ? link.href : null};
+});
+var page = document.scrollingElement || document.documentElement;
+return {cards: cards, more: page.scrollHeight - (window.scrollY + window.innerHeight) > 2};
+"""
+
+class BackendError(Exception):
+    """Raised when a backend cannot produce data for a page."""
+
+def merge_searches(results):
+    """Merge per-keyword card lists, best keyword first, dropping repeated markets.
+
+    Cards are matched by URL (by title when they have none) and renumbered;
+    ``card_index`` keeps a card's position on its own search page, which
+    backends that click cards record as ``search_url``.
+    """
+    merged = []
+    seen = set()
+    for cards in results:
+        for card in cards or []:
+            key = card.get("url") or card["title"].strip().lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append({**card, "index": len(merged) + 1, "card_index": card.get("card_index", card["index"])})
+    return merged
+
+class ScraperBackend:
+    """Interface shared by all scraper backends."""
+
+    name = "base"
+
+    def search(self, keyword):
+        """Return the market cards found for ``keyword``."""
+        raise NotImplementedError
+
+    def search_each(self, keywords, concurrency=4):
+        """Search every keyword at once and return each keyword's cards, in order.
+
+        Keywords whose search failed get None.
+        """
+        def search(keyword):
+            try:
+                return self.search(keyword)
+            except BackendError as e:
+                print(f"Error searching for {keyword}: {str(e)}")
+                return None
+
+        if concurrency <= 1 or len(keywords) <= 1:
+            return [search(keyword) for keyword in keywords]
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(keywords))) as executor:
+            return list(executor.map(tracer.propagate(search), keywords))
+
+    def search_many(self, keywords, concurrency=4):
+        """Search every keyword at once and merge the cards with merge_searches.
+
+        A keyword whose search fails only loses its own cards.
+        """
+        return merge_searches(self.search_each(keywords, concurrency))
+
+    def fetch_market(self, market):
+        """Return details and outcomes for one market from ``search``."""
+        raise NotImplementedError
+
+    def fetch_markets(self, markets, concurrency=4):
+        """Fetch several markets at once, keeping the order of ``markets``.
+
+        Markets that could not be fetched are returned as None.
+        """
+        def fetch(market):
+            try:
+                return self.fetch_market(market)
+            except BackendError as e:
+                print(f"Error processing market card: {str(e)}")
+                return None
+
+        if concurrency <= 1 or len(markets) <= 1:
+            return [fetch(market) for market in markets]
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(markets))) as executor:
+            return list(executor.map(tracer.propagate(fetch), markets))
+
+    def close(self):
+        """Release any resources held by the backend."""
+
+class SeleniumBackend(ScraperBackend):
+    """Renders pages in headless Chrome, as main() originally did."""
+
+    name = "selenium"
+
+    def __init__(self, driver=None, base_url=POLYMARKET_URL, extraction_mode="bulk", pool=None,
+                 max_scrolls=3, scroll_timeout=1):
+        self._driver = driver
+        self._owns_driver = False
+        self.pool = pool
+        self.base_url = base_url.rstrip("/")
+        self.extraction_mode = extraction_mode
+        self.search_url = None
+        self.max_scrolls = max_scrolls
+        self.scroll_timeout = scroll_timeout
+
+    @property
+    def driver(self):
+        # Chrome is only started (or borrowed) when a page is actually needed
+        if self._driver is None:
+            if self.pool is not None:
+                self._driver = self.pool.acquire()
+            else:
+                print("Initializing WebDriver...")
+                with tracer.span("driver_start"):
+                    self._driver = setup_driver()
+            self._owns_driver = True
+        return self._driver
+
+    def search(self, keyword):
+        self.search_url = self._search_url(keyword)
+        print(f"\nNavigating to: {self.search_url}")
+        try:
+            driver = self.driver
+            with tracer.span("navigate", url=self.search_url):
+                driver.get(self.search_url)
+            handle = driver.current_window_handle
+            market_titles = self._collect_cards([handle])[0]
+            driver.switch_to.window(handle)
+        except Exception as e:
+            # WebDriver and timeout errors fail this search like any backend error
+            raise BackendError(f"search for {keyword!r} failed: {e}") from e
+        for market in market_titles:
+            market["search_url"] = self.search_url
+        return market_titles
+
+    def search_each(self, keywords, concurrency=4):
+        """Load up to ``concurrency`` searches at once in background tabs."""
+        if concurrency <= 1 or len(keywords) <= 1:
+            return super().search_each(keywords, 1)
+
+        results = [None] * len(keywords)
+        original = None
+        try:
+            driver = self.driver
+            original = driver.current_window_handle
+            for start in range(0, len(keywords), concurrency):
+                tabs = []
+                for i in range(start, min(start + concurrency, len(keywords))):
+                    url = self._search_url(keywords[i])
+                    print(f"\nNavigating to: {url}")
+                    tabs.append((i, url, self._open_tab(url)))
+                opened = [handle for _, _, handle in tabs if handle]
+                try:
+                    found = dict(zip(opened, self._collect_cards(opened))) if opened else {}
+                finally:
+                    self._close_tabs(original)
+                for i, url, handle in tabs:
+                    if handle is None:
+                        try:
+                            results[i] = self.search(keywords[i])
+                        except BackendError as e:
+                            print(f"Error searching for {keywords[i]}: {str(e)}")
+                        continue
+                    for market in found[handle]:
+                        market["search_url"] = url
+                    results[i] = found[handle]
+        except Exception as e:
+            # The keywords not searched yet keep None
+            print(f"Error searching in tabs: {str(e)}")
+            if original is not None:
+                self._close_tabs(original)
+        return results
+
+    def _search_url(self, keyword):
+        return f"{self.base_url}/markets?_q={quote(keyword)}"
+
+    def _collect_cards(self, handles):
+        """Read the search cards of the tabs in ``handles``, scrolling to load more.
+
+        The tabs are waited on together, so several searches cost about as
+        much waiting as one. A tab is only scrolled while its page extends
+        below the viewport, at most ``max_scrolls`` times, and stops once a
+        scroll brings no new card within ``scroll_timeout`` seconds.
+        """
+        driver = self.driver
+        readiness.wait_tabs(driver, {handle: () for handle in handles}, "search_cards")
+
+        found = {handle: [] for handle in handles}
+        seen = {handle: set() for handle in handles}
+
+        def read(handle):
+            # Returns the URL of the last card when the tab may have more
+            driver.switch_to.window(handle)
+            page = driver.execute_script(
+                COLLECT_CARDS_SCRIPT, sel.SEARCH_CARDS, sel.CARD_TITLE, sel.CARD_LINK
+            ) or {}
+            cards = page.get("cards") or []
+            market_titles = found[handle]
+            for idx, card in enumerate(cards, 1):
+                if not card.get("title"):
+                    debug(f"Card {idx} has no title")
+                    continue
+                key = card.get("url") or card["title"]
+                if key in seen[handle]:
+                    continue
+                seen[handle].add(key)
+                market_titles.append({
+                    "title": card["title"],
+                    "index": len(market_titles) + 1,
+                    "url": card.get("url"),
+                    "card_index": idx,
+                })
+                print(f"Found market {len(market_titles)}: {card['title']}")
+            return cards[-1].get("url") if cards and page.get("more") else None
+
+        scrolling = {handle: read(handle) for handle in handles}
+        for _ in range(self.max_scrolls):
+            scrolling = {handle: last for handle, last in scrolling.items() if last}
+            if not scrolling:
+                break
+            for handle in scrolling:
+                driver.switch_to.window(handle)
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            loaded = readiness.wait_tabs(
+                driver, {handle: (last,) for handle, last in scrolling.items()},
+                "more_search_cards", timeout=self.scroll_timeout,
+            )
+            scrolling = {handle: read(handle) for handle, more in loaded.items() if more}
+        for handle in handles:
+            print(f"\nFound {len(found[handle])} market cards")
+        return [found[handle] for handle in handles]
+
+    def _open_tab(self, url):
+        """Start loading ``url`` in a new tab and return its handle, or None."""
+        driver = self.driver
+        blocked = getattr(driver, "blocked_urls", None)
+        before = set(driver.window_handles)
+        # window.open returns immediately, so the pages load side by side
+        driver.execute_script("window.open(arguments[0], '_blank');", "about:blank" if blocked else url)
+        opened = set(driver.window_handles) - before
+        handle = opened.pop() if opened else None
+        if handle and blocked:
+            # Request blocking is per tab, so set it up before the page loads
+            current = driver.current_window_handle
+            driver.switch_to.window(handle)
+            block_urls(driver, blocked)
+            driver.execute_script("window.location.href = arguments[0];", url)
+            driver.switch_to.window(current)
+        return handle
+
+    def _close_tabs(self, original):
+        driver = self.driver
+        for handle in set(driver.window_handles) - {original}:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(original)
+
+    def fetch_market(self, market):
+        try:
+            driver = self.driver
+            if market.get("url"):
+                with tracer.span("navigate", url=market["url"]):
+                    driver.get(market["url"])
+            else:
+                # Cards without a link are clicked on the search page they came from
+                search_url = market.get("search_url") or self.search_url
+                if search_url and driver.current_url != search_url:
+                    with tracer.span("navigate", url=search_url):
+                        driver.get(search_url)
+                    readiness.wait(driver, "search_cards")
+                if not click_market_card(driver, market.get("card_index", market["index"])):
+                    return None
+            return self._extract()
+        except Exception as e:
+            print(f"Error processing market card: {str(e)}")
+            return None
+
+    def fetch_markets(self, markets, concurrency=4):
+        """Open up to ``concurrency`` markets in background tabs at once.
+
+        The tabs load in parallel while earlier ones are being extracted, and
+        the search page never has to be reloaded between markets.
+        """
+        if concurrency <= 1 or len(markets) <= 1 or not all(m.get("url") for m in markets):
+            return [self.fetch_market(market) for market in markets]
+
+        driver = self.driver
+        original = driver.current_window_handle
+        results = []
+        try:
+            for start in range(0, len(markets), concurrency):
+                tabs = [(market, self._open_tab(market["url"])) for market in markets[start:start + concurrency]]
+                for market, handle in tabs:
+                    if handle is None:
+                        driver.switch_to.window(original)
+                        results.append(self.fetch_market(market))
+                        continue
+                    try:
+                        driver.switch_to.window(handle)
+                        results.append(self._extract())
+                    except Exception as e:
+                        print(f"Error processing market {market['url']}: {str(e)}")
+                        results.append(None)
+                    finally:
+                        driver.close()
+                driver.switch_to.window(original)
+        except Exception as e:
+            print(f"Error fetching markets in tabs: {str(e)}")
+            self._close_tabs(original)
+            results.extend([None] * (len(markets) - len(results)))
+        return results
+
+    def _extract(self):
+        wait_until(self.driver, "outcome_rows")
+
+        if self.extraction_mode == "bulk":
+            # Extract details and all outcomes in one round trip
+            details, missing = extract_market_bulk(self.driver)
+            if not details or not details["title"]:
+                return None
+            if missing:
+                debug(f"Missing fields: {', '.join(missing)}")
+            return details
+
+        # Extract market details
+        details = extract_market_details(self.driver, self.driver)
+        if not details:
+            return None
+
+        # Extract outcomes
+        details["outcomes"] = extract_outcome_data(self.driver, self.driver)
+        return details
+
+    def close(self):
+        # A driver passed in by the caller is left for the caller to quit
+        if self._driver is not None and self._owns_driver:
+            if self.pool is not None:
+                self.pool.release(self._driver)
+            else:
+                self._driver.quit()
+        self._driver = None
+
+NEXT_DATA_RE = re.compile(
+    r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL
+)
+
+def parse_next_data(html):
+    """Return the JSON payload Next.js embeds in server-rendered pages."""
+    match = NEXT_DATA_RE.search(html)
+    if not match:
+        raise BackendError("page has no embedded __NEXT_DATA__ payload")
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError as e:
+        raise BackendError(f"embedded page data is not valid JSON: {e}")
+
+def iter_events(data):
+    """Yield every event object (a dict with a slug, title and markets list)."""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "slug" in node and "title" in node and isinstance(node.get("markets"), list):
+                yield node
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+def _json_list(value):
+    # Gamma serialises outcomes and prices as JSON strings inside the JSON
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    return value or []
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def format_volume(value):
+    value = _float(value)
+    return f"${round(value):,} Vol." if value is not None else None
+
+def format_percentage(price):
+    if price is None:
+        return None
+    if 0 < price < 0.01:
+        return "<1%"
+    if 0.99 < price < 1:
+        return ">99%"
+    return f"{round(price * 100)}%"
+
+def format_price(label, price):
+    return f"{label} {price * 100:.1f}¢" if price is not None else None
+
+def format_end_date(value):
+    if not value:
+        return None
+    try:
+        date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    return f"{date:%b} {date.day}, {date.year}"
+
+def _market_outcome(market, title):
+    prices = [_float(p) for p in _json_list(market.get("outcomePrices"))]
+    yes_price = prices[0] if prices else None
+    best_ask = _float(market.get("bestAsk"))
+    best_bid = _float(market.get("bestBid"))
+    # Buy prices are what the order book charges, falling back to the last price
+    buy_yes = best_ask if best_ask is not None else yes_price
+    buy_no = 1 - best_bid if best_bid is not None else (prices[1] if len(prices) > 1 else None)
+    return {
+        "title": title,
+        "volume": format_volume(market.get("volume")),
+        "percentage": format_percentage(yes_price),
+        "buy_yes_price": format_price("Buy Yes", buy_yes),
+        "buy_no_price": format_price("Buy No", buy_no),
+    }
+
+def event_to_details(event):
+    """Convert an embedded event object into the scraped details dict."""
+    markets = [m for m in event["markets"] if not m.get("closed")]
+    if len(markets) > 1:
+        outcomes = [
+            _market_outcome(m, m.get("groupItemTitle") or m.get("question"))
+            for m in markets
+        ]
+    elif markets:
+        outcome = _market_outcome(markets[0], event["title"])
+        outcome["volume"] = "N/A"  # Volume doesn't apply for single outcome
+        if outcome["percentage"]:
+            outcome["percentage"] += " chance"
+        outcomes = [outcome]
+    else:
+        outcomes = []
+    return {
+        "title": event["title"],
+        "volume": format_volume(event.get("volume")),
+        "end_date": format_end_date(event.get("endDate")),
+        "outcomes": outcomes,
+    }
+
+def make_session(pool_size=10):
+    """Return a requests session keeping up to ``pool_size`` connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    )
+    return session
+
+class HttpBackend(ScraperBackend):
+    """Reads the server-rendered page data with plain HTTP requests."""
+
+    name = "http"
+
+    def __init__(self, base_url=POLYMARKET_URL, session=None, timeout=10, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # A session passed in by the caller is shared and left open on close()
+        self._owns_session = session is None
+        if session is None:
+            session = make_session(pool_size)
+        self.session = session
+
+    def _get_page_data(self, url):
+        with tracer.span("http_get", url=url) as span:
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                tracer.incr("http_errors_total", backend=self.name)
+                raise BackendError(f"request to {url} failed: {e}")
+            span.set(status=response.status_code, bytes=len(response.content))
+            return parse_next_data(response.text)
+
+    def search(self, keyword):
+        search_url = f"{self.base_url}/markets?_q={quote(keyword)}"
+        print(f"\nFetching: {search_url}")
+        data = self._get_page_data(search_url)
+
+        market_titles = []
+        seen = set()
+        for event in iter_events(data):
+            if event["slug"] in seen:
+                continue
+            seen.add(event["slug"])
+            market_titles.append({
+                "title": event["title"],
+                "index": len(market_titles) + 1,
+                "url": urljoin(self.base_url + "/", f"event/{event['slug']}"),
+            })
+            print(f"Found market {len(market_titles)}: {event['title']}")
+        return market_titles
+
+    def fetch_market(self, market):
+        data = self._get_page_data(market["url"])
+        slug = urlparse(market["url"]).path.rstrip("/").rsplit("/", 1)[-1]
+        events = list(iter_events(data))
+        event = next((e for e in events if e["slug"] == slug), None)
+        if event is None and events:
+            event = events[0]
+        if event is None:
+            raise BackendError(f"no market data embedded in {market['url']}")
+        return event_to_details(event)
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
+
+class FallbackBackend(ScraperBackend):
+    """Uses ``primary`` and switches to ``fallback`` whenever it fails."""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    @property
+    def name(self):
+        return f"{self.primary.name}+{self.fallback.name}"
+
+    def search(self, keyword):
+        try:
+            market_titles = self.primary.search(keyword)
+            if market_titles:
+                return market_titles
+            debug(f"{self.primary.name} backend found no markets, falling back")
+        except BackendError as e:
+            debug(f"{self.primary.name} backend failed: {e}, falling back")
+        tracer.incr("retries_total", stage="search", backend=self.fallback.name)
+        return self.fallback.search(keyword)
+
+    def search_each(self, keywords, concurrency=4):
+        """Search with ``primary``, then only the keywords it failed or found nothing for with ``fallback``."""
+        results = self.primary.search_each(keywords, concurrency)
+        failed = [i for i, cards in enumerate(results) if not cards]
+        if failed:
+            debug(f"{self.primary.name} backend found no markets for {len(failed)} keywords, falling back")
+            tracer.incr("retries_total", len(failed), stage="search", backend=self.fallback.name)
+            retried = self.fallback.search_each([keywords[i] for i in failed], concurrency)
+            for i, cards in zip(failed, retried):
+                results[i] = cards if cards is not None else results[i]
+        return results
+
+    def fetch_market(self, market):
+        try:
+            details = self.primary.fetch_market(market)
+            if details:
+                return details
+        except BackendError as e:
+            debug(f"{self.primary.name} backend failed: {e}, falling back")
+        tracer.incr("retries_total", stage="details", backend=self.fallback.name)
+        return self.fallback.fetch_market(market)
+
+    def fetch_markets(self, markets, concurrency=4):
+        results = self.primary.fetch_markets(markets, concurrency)
+        failed = [i for i, details in enumerate(results) if not details]
+        if failed:
+            debug(f"{self.primary.name} backend failed for {len(failed)} markets, falling back")
+            tracer.incr("retries_total", len(failed), stage="details", backend=self.fallback.name)
+            retried = self.fallback.fetch_markets([markets[i] for i in failed], concurrency)
+            for i, details in zip(failed, retried):
+                results[i] = details
+        return results
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+def create_backend(kind="auto", base_url=POLYMARKET_URL, extraction_mode="bulk", pool=None, session=None):
+    """Build the backend named by ``kind``: "http", "selenium" or "auto".
+
+    Selenium backends borrow their browser from ``pool`` and HTTP backends
+    share ``session`` when one is given.
+    """
+    if kind == "http":
+        return HttpBackend(base_url, session=session)
+    if kind == "selenium":
+        return SeleniumBackend(base_url=base_url, extraction_mode=extraction_mode, pool=pool)
+    if kind == "auto":
+        return FallbackBackend(
+            HttpBackend(base_url, session=session),
+            SeleniumBackend(base_url=base_url, extraction_mode=extraction_mode, pool=pool),
+        )
+    raise ValueError(f"Unknown scraper backend: {kind}")
@@ -0,0 +1,163 @@
+"""Compare Chrome's default and lean profiles on the same pages.
+
+Loads every page with each profile and reports the bytes Chrome received,
+the requests it made and blocked, how long until the page was ready to
+read, and the memory of the whole Chrome process tree:
+
+    python app/bench_browser.py --repeat 3
+    python app/bench_browser.py https://polymarket.com/markets?_q=starship
+
+Without URLs the recorded pages in app/fixtures are served locally.
+
+Bytes come from Chrome's network log with the cache cleared before every
+load. A page is ready once its readiness condition holds (search cards or
+outcome rows). Memory is read from /proc: RSS counts pages shared between
+Chrome's processes once per process, PSS splits them, so PSS is the
+better guide to how many browsers fit on a host.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from readiness import wait_until
+from scraper import setup_driver
+
+PROFILES = ["default", "lean"]
+FIXTURE_PATHS = [
+    "/markets?_q=starship",
+    "/event/how-many-spacex-starship-launches-reach-space-in-2024",
+    "/event/will-starship-flight-7-launch-before-2025",
+]
+
+def process_tree(pid):
+    """Return ``pid`` and the pids of all its descendants."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid follows it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids = [pid]
+    for parent in pids:
+        pids.extend(children.get(parent, []))
+    return pids
+
+def _memory_kb(pid, path, field):
+    try:
+        with open(f"/proc/{pid}/{path}") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def tree_memory_mb(pid):
+    """Return ``(rss_mb, pss_mb, processes)`` for ``pid`` and its descendants."""
+    pids = process_tree(pid)
+    rss = sum(_memory_kb(p, "status", "VmRSS") for p in pids)
+    pss = sum(_memory_kb(p, "smaps_rollup", "Pss") for p in pids)
+    return round(rss / 1024, 1), round(pss / 1024, 1), len(pids)
+
+def network_usage(entries):
+    """Sum ``(bytes, requests, blocked)`` over Chrome performance log entries."""
+    received = requests = blocked = 0
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        method, params = message.get("method"), message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            requests += 1
+        elif method == "Network.loadingFinished":
+            received += params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            blocked += 1
+    return received, requests, blocked
+
+def ready_condition(url):
+    return "search_cards" if "/markets" in url else "outcome_rows"
+
+def measure(profile, urls, repeat, timeout=30):
+    """Load every URL ``repeat`` times with ``profile`` and return its totals."""
+    driver = setup_driver(profile=profile, log_network=True)
+    loads = []
+    try:
+        for url in urls:
+            for _ in range(repeat):
+                driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+                driver.get_log("performance")  # Drop entries from earlier loads
+                start = time.perf_counter()
+                driver.get(url)
+                ready = wait_until(driver, ready_condition(url), timeout=timeout)
+                ready_s = time.perf_counter() - start
+                received, requests, blocked = network_usage(driver.get_log("performance"))
+                loads.append({"url": url, "ready": ready, "ready_s": ready_s,
+                              "bytes": received, "requests": requests, "blocked": blocked})
+        # Measured after the loads, while every page's renderer is still alive
+        rss_mb, pss_mb, processes = tree_memory_mb(driver.service.process.pid)
+    finally:
+        driver.quit()
+    return {
+        "profile": profile,
+        "loads": len(loads),
+        "not_ready": sum(1 for load in loads if not load["ready"]),
+        "ready_p50_s": round(statistics.median(load["ready_s"] for load in loads), 3),
+        "kb_per_page": round(statistics.mean(load["bytes"] for load in loads) / 1024, 1),
+        "requests_per_page": round(statistics.mean(load["requests"] for load in loads), 1),
+        "blocked_per_page": round(statistics.mean(load["blocked"] for load in loads), 1),
+        "chrome_rss_mb": rss_mb,
+        "chrome_pss_mb": pss_mb,
+        "chrome_processes": processes,
+    }
+
+def print_report(results):
+    print(f"{'profile':<10}{'ready p50 s':>12}{'KB/page':>10}{'requests':>10}{'blocked':>9}"
+          f"{'RSS MB':>9}{'PSS MB':>9}{'procs':>7}")
+    for r in results:
+        print(f"{r['profile']:<10}{r['ready_p50_s']:>12.3f}{r['kb_per_page']:>10.1f}"
+              f"{r['requests_per_page']:>10.1f}{r['blocked_per_page']:>9.1f}"
+              f"{r['chrome_rss_mb']:>9.1f}{r['chrome_pss_mb']:>9.1f}{r['chrome_processes']:>7}")
+        if r["not_ready"]:
+            print(f"  {r['not_ready']} of {r['loads']} loads never became ready")
+    base = next((r for r in results if r["profile"] == "default"), None)
+    for r in results:
+        if base is None or r is base:
+            continue
+        for field, label in (("ready_p50_s", "ready time"), ("kb_per_page", "bytes"),
+                             ("chrome_pss_mb", "Chrome PSS")):
+            if base[field]:
+                print(f"{r['profile']} {label}: {r[field] / base[field]:.0%} of default")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="*", help="pages to load (polymarket.com search and market pages)")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="comma-separated profiles to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="loads per page and profile")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    urls = args.urls
+    if not urls:
+        from fixture_server import start_fixture_server
+        server = start_fixture_server()
+        urls = [server.base_url + path for path in FIXTURE_PATHS]
+    try:
+        results = [measure(profile, urls, args.repeat) for profile in args.profiles.split(",")]
+    finally:
+        if server:
+            server.shutdown()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare the per-selector and bulk market extraction paths offline.
+
+Loads the fixture pages from app/fixtures in headless Chrome and times both
+extraction paths on each one, listing the fields the bulk path reports as
+missing:
+
+    python app/bench_extraction.py --repeat 3
+"""
+import argparse
+import os
+import statistics
+import time
+
+from scraper import (
+    setup_driver,
+    extract_market_details,
+    extract_outcome_data,
+    extract_market_bulk,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MARKET_FIXTURES = ["market_multi.html", "market_single.html", "market_partial.html"]
+
+def run_selector_path(driver):
+    """Return ``(details, missing)``; the selector path does not report missing fields."""
+    details = extract_market_details(driver, driver)
+    details["outcomes"] = extract_outcome_data(driver, driver)
+    return details, None
+
+def run_bulk_path(driver):
+    return extract_market_bulk(driver)
+
+def time_path(driver, url, extract, repeat):
+    """Reload the fixture before each run and return (timings, last result)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        driver.get(url)
+        start = time.perf_counter()
+        result = extract(driver)
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per fixture and path")
+    args = parser.parse_args()
+
+    driver = setup_driver()
+    try:
+        print(f"{'fixture':<22}{'path':<10}{'median s':>10}{'outcomes':>10}  missing")
+        for name in MARKET_FIXTURES:
+            url = "file://" + os.path.join(FIXTURES_DIR, name)
+            medians = {}
+            for label, extract in (("selector", run_selector_path), ("bulk", run_bulk_path)):
+                timings, (details, missing) = time_path(driver, url, extract, args.repeat)
+                medians[label] = statistics.median(timings)
+                count = len(details["outcomes"]) if details else 0
+                missing = "n/a" if missing is None else ", ".join(missing) or "-"
+                print(f"{name:<22}{label:<10}{medians[label]:>10.3f}{count:>10}  {missing}")
+            if medians["bulk"]:
+                print(f"{'':<22}{'speedup':<10}{medians['selector'] / medians['bulk']:>9.1f}x")
+    finally:
+        driver.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""End-to-end benchmark of run_query against local fixtures and a fake LLM.
+
+Starts the fixture site (fixture_server.py) and an OpenAI-compatible stub
+(fake_llm_server.py), points main.py at both and runs N queries, then
+reports p50/p95 latency per stage and end to end, peak memory and queries
+per second:
+
+    python app/bench_pipeline.py -n 50 --concurrency 4 --llm-latency 0.2
+    python app/bench_pipeline.py -n 50 --output bench.json
+    python app/bench_pipeline.py -n 50 --compare bench.json
+
+With ``--compare`` the run fails (exit code 1) when a p95 latency is worse
+than the baseline by more than ``--tolerance``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_browser import tree_memory_mb
+from fake_llm_server import start_fake_llm_server
+from fixture_server import start_fixture_server
+
+DEFAULT_QUERIES = [
+    "how many starship launches reach space in 2024",
+    "will starship flight 7 launch before 2025",
+    "starship booster caught by the tower",
+    "starship launches in 2024",
+]
+
+def percentile(values, q):
+    """Linearly interpolated ``q``-th percentile (0-100) of ``values``."""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+def peak_rss_mb():
+    """Peak resident memory of this process alone."""
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024  # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+class TreeMemorySampler:
+    """Samples the RSS and PSS of this process and its descendants (Chrome and
+    chromedriver) while in use, keeping the peaks.
+
+    The peaks stay None where /proc is not available.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_rss_mb = None
+        self.peak_pss_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss, pss, _ = tree_memory_mb(os.getpid())
+        self.peak_rss_mb = max(rss, self.peak_rss_mb or 0)
+        self.peak_pss_mb = max(pss, self.peak_pss_mb or 0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        if os.path.isdir("/proc"):
+            self.sample()
+            self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.sample()
+        return False
+
+def stage_durations(span):
+    """Sum the durations of every span below a query span, by name."""
+    totals = defaultdict(float)
+    stack = list(span.children)
+    while stack:
+        child = stack.pop()
+        if child.duration is not None:
+            totals[child.name] += child.duration
+        stack.extend(child.children)
+    return totals
+
+def summarize(query_spans, elapsed, n_failed, memory):
+    end_to_end = [span.duration for span in query_spans]
+    per_stage = defaultdict(list)
+    for span in query_spans:
+        for name, duration in stage_durations(span).items():
+            per_stage[name].append(duration)
+    return {
+        "queries": len(query_spans),
+        "failed": n_failed,
+        "elapsed_s": round(elapsed, 3),
+        "qps": round(len(query_spans) / elapsed, 3) if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_tree_rss_mb": memory.peak_rss_mb,
+        "peak_tree_pss_mb": memory.peak_pss_mb,
+        "end_to_end": {
+            "p50_s": round(percentile(end_to_end, 50), 4),
+            "p95_s": round(percentile(end_to_end, 95), 4),
+        },
+        "stages": {
+            name: {
+                "count": len(values),
+                "p50_s": round(percentile(values, 50), 4),
+                "p95_s": round(percentile(values, 95), 4),
+            }
+            for name, values in sorted(per_stage.items())
+        },
+    }
+
+def print_report(report):
+    print(f"\n{report['queries']} queries ({report['failed']} failed) in {report['elapsed_s']}s, "
+          f"{report['qps']} queries/s")
+    print(f"Peak RSS: {report['peak_rss_mb']} MB")
+    if report["peak_tree_rss_mb"] is not None:
+        print(f"Peak process tree (with any browsers): {report['peak_tree_rss_mb']} MB RSS, "
+              f"{report['peak_tree_pss_mb']} MB PSS")
+    print(f"\n{'stage':<22}{'count':>7}{'p50 s':>10}{'p95 s':>10}")
+    e2e = report["end_to_end"]
+    print(f"{'end_to_end':<22}{report['queries']:>7}{e2e['p50_s']:>10.4f}{e2e['p95_s']:>10.4f}")
+    for name, s in report["stages"].items():
+        print(f"{name:<22}{s['count']:>7}{s['p50_s']:>10.4f}{s['p95_s']:>10.4f}")
+
+def compare(report, baseline, tolerance):
+    """Return a line per p95 latency that regressed beyond ``tolerance``."""
+    pairs = [("end_to_end", report["end_to_end"], baseline.get("end_to_end"))]
+    pairs += [(name, s, baseline.get("stages", {}).get(name)) for name, s in report["stages"].items()]
+    regressions = []
+    for name, current, base in pairs:
+        if not base or not base.get("p95_s"):
+            continue
+        if current["p95_s"] > base["p95_s"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_s']:.4f}s vs baseline {base['p95_s']:.4f}s")
+    if baseline.get("qps") and report["qps"] < baseline["qps"] * (1 - tolerance):
+        regressions.append(f"qps: {report['qps']} vs baseline {baseline['qps']}")
+    return regressions
+
+def run(queries, concurrency, backend_kind, warmup, verbose, stream=False, snapshots=False):
+    """Run ``queries`` through main.run_query and return the report."""
+    # Imported late: main reads its endpoints from the environment at import time
+    import main
+    from tracing import tracer
+
+    tracer.enabled = True
+    pool = None
+    if backend_kind != "http":
+        from driver_pool import DriverPool
+        pool = DriverPool(size=concurrency, origins=[main.POLYMARKET_URL])
+
+    def process(query):
+        if snapshots:
+            backend = main.open_backend(backend_kind, pool=pool)
+        else:
+            backend = main.create_backend(backend_kind, main.POLYMARKET_URL, main.EXTRACTION_MODE, pool=pool)
+        try:
+            return main.run_query(query, backend, (lambda key, value: None) if stream else None)
+        except Exception as e:
+            print(f"Error in query {query!r}: {str(e)}", file=sys.stderr)
+            return None
+        finally:
+            backend.close()
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    memory = TreeMemorySampler()
+    try:
+        with output, memory, ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(process, queries[:warmup]))
+            tracer.reset()
+            started = time.perf_counter()
+            results = list(executor.map(process, queries[warmup:]))
+            elapsed = time.perf_counter() - started
+    finally:
+        main.snapshot_store.drain()
+        if pool:
+            pool.close()
+
+    query_spans = [span for span in tracer.roots if span.name == "query"]
+    return summarize(query_spans, elapsed, sum(1 for r in results if not r), memory)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--queries", type=int, default=20, help="measured queries")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured queries run first")
+    parser.add_argument("--concurrency", type=int, default=1, help="queries run at the same time")
+    parser.add_argument("--backend", default="http", choices=["http", "selenium", "auto"])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM seconds per request")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="random +/- seconds on the latency")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of fake LLM requests answered with 429")
+    parser.add_argument("--llm-tail-rate", type=float, default=0.0, help="fraction of fake LLM requests that are slow")
+    parser.add_argument("--llm-tail-latency", type=float, default=2.0, help="seconds taken by slow fake LLM requests")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="fake LLM seconds between streamed chunks")
+    parser.add_argument("--stream", action="store_true", help="stream the final analysis as main.py --stream does")
+    parser.add_argument("--snapshots", action="store_true", help="reuse market snapshots as main.py does")
+    parser.add_argument("--use-cache", action="store_true", help="serve repeated prompts from the LLM cache")
+    parser.add_argument("--output", metavar="JSON", help="save the report, e.g. as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown against the baseline")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args()
+
+    fixtures = start_fixture_server()
+    llm = start_fake_llm_server(
+        latency=args.llm_latency, jitter=args.llm_jitter, chunk_delay=args.chunk_delay,
+        error_rate=args.llm_error_rate, tail_rate=args.llm_tail_rate, tail_latency=args.llm_tail_latency,
+    )
+    os.environ["POLYMARKET_URL"] = fixtures.base_url
+    os.environ["GLHF_BASE_URL"] = llm.base_url
+    os.environ.setdefault("GLHF_API_KEY", "bench")
+    if not args.use_cache:
+        os.environ["LLM_CACHE_BYPASS"] = "true"
+    # Start from empty stores so earlier runs cannot skew the numbers, and so
+    # the fake answers and fixture markets never reach the real ones
+    store_dir = tempfile.TemporaryDirectory()
+    os.environ["SNAPSHOT_PATH"] = os.path.join(store_dir.name, "snapshots.sqlite")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(store_dir.name, "llm_cache.sqlite")
+
+    total = args.warmup + args.queries
+    queries = [DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)] for i in range(total)]
+    try:
+        report = run(queries, args.concurrency, args.backend, args.warmup, args.verbose, args.stream, args.snapshots)
+    finally:
+        fixtures.shutdown()
+        llm.shutdown()
+        store_dir.cleanup()
+    report["config"] = {
+        "backend": args.backend,
+        "concurrency": args.concurrency,
+        "llm_latency_s": args.llm_latency,
+        "llm_jitter_s": args.llm_jitter,
+        "llm_error_rate": args.llm_error_rate,
+        "llm_tail_rate": args.llm_tail_rate,
+        "stream": args.stream,
+        "use_cache": args.use_cache,
+        "snapshots": args.snapshots,
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against " + args.compare + ":")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
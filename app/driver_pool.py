@@ -0,0 +1,143 @@
+"""Bounded pool of long-lived Chrome drivers shared across queries."""
+import queue
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from scraper import setup_driver
+from tracing import debug, tracer
+
+def driver_is_healthy(driver):
+    """Return True when the browser session still answers commands."""
+    try:
+        return driver.execute_script("return 1;") == 1
+    except Exception:
+        return False
+
+def origin_of(url):
+    """Return the ``scheme://host[:port]`` origin of ``url``."""
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def reset_driver(driver, origins=()):
+    """Clear cookies and storage so the next query starts from a clean state.
+
+    Storage is cleared through CDP for each of ``origins`` (site URLs), since
+    the tab may be showing about:blank, where page scripts cannot reach it.
+    """
+    try:
+        # CDP clears cookies for every domain, not just the current page's
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    except Exception:
+        driver.delete_all_cookies()
+    for origin in origins:
+        driver.execute_cdp_cmd(
+            "Storage.clearDataForOrigin", {"origin": origin_of(origin), "storageTypes": "all"}
+        )
+    driver.get("about:blank")
+
+class DriverPool:
+    """Hands out at most ``size`` warm drivers at a time.
+
+    A driver is health-checked before it is handed out, reset when it is
+    returned, and replaced after ``max_uses`` queries or once it stops
+    responding. Resetting clears the storage of the sites in ``origins``.
+    """
+
+    def __init__(self, size=2, max_uses=20, factory=setup_driver, origins=()):
+        self.size = size
+        self.max_uses = max_uses
+        self.factory = factory
+        self.origins = list(origins)
+        self.created = 0
+        self.recycled = 0
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._uses = {}
+        self._lock = threading.Lock()
+
+    def _create(self):
+        with tracer.span("driver_start"):
+            driver = self.factory()
+        with self._lock:
+            self.created += 1
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self.recycled += 1
+            self._uses.pop(id(driver), None)
+        tracer.incr("drivers_recycled_total")
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error quitting recycled driver: {str(e)}")
+
+    def warm(self, count=None):
+        """Start drivers ahead of time so the first queries skip Chrome startup."""
+        count = self.size if count is None else min(count, self.size)
+        for _ in range(count - self._idle.qsize()):
+            self._idle.put(self._create())
+
+    def acquire(self, timeout=None):
+        """Block until a slot is free and return a healthy driver."""
+        if self.closed:
+            raise RuntimeError("Driver pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No driver free after {timeout}s")
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._create()
+                if driver_is_healthy(driver):
+                    return driver
+                debug("Idle driver stopped responding, replacing it")
+                self._discard(driver)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver):
+        """Return ``driver`` to the pool, recycling it when worn out or broken."""
+        try:
+            with self._lock:
+                self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+                worn_out = self._uses[id(driver)] >= self.max_uses
+            # Drivers returned after close() would never be quit from the idle queue
+            if worn_out or self.closed:
+                self._discard(driver)
+                return
+            try:
+                reset_driver(driver, self.origins)
+            except Exception as e:
+                debug(f"Driver reset failed, recycling it: {str(e)}")
+                self._discard(driver)
+                return
+            self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """Quit every idle driver; drivers still in use are quit when released."""
+        self.closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"Error quitting driver: {str(e)}")
@@ -0,0 +1,218 @@
+"""Local OpenAI-compatible chat completions server for offline runs.
+
+Answers the keyword, relevance and final-analysis prompts from main.py with
+canned but well-formed JSON, after a configurable delay, so the pipeline can
+be timed without glhf.chat:
+
+    python app/fake_llm_server.py --port 8766 --latency 0.5
+    GLHF_BASE_URL=http://127.0.0.1:8766/v1 GLHF_API_KEY=x python app/main.py
+
+Both plain and streamed (``stream=True``) completions are supported, and
+responses carry a ``usage`` block with rough token counts (streamed ones
+only with ``stream_options={"include_usage": True}``).
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prompts import estimate_tokens
+from ranking import STOPWORDS
+from streaming import SECTION_KEYS
+
+def keyword_answer(user_prompt, count=3):
+    match = re.search(r"Query:\s*(.*)", user_prompt)
+    words = re.findall(r"[A-Za-z]+", match.group(1) if match else user_prompt)
+    words = list(dict.fromkeys(w.lower() for w in words if w.lower() not in STOPWORDS))
+    # Longest words first, as the most specific
+    return {"keywords": sorted(words, key=len, reverse=True)[:count] or ["market"]}
+
+def relevance_answer(user_prompt):
+    titles = re.findall(r"^\d+\. (.*)$", user_prompt, re.MULTILINE)
+    return {"relevant_market": titles[:1]}
+
+def final_answer(user_prompt):
+    match = re.search(r"^Market: (.*)$", user_prompt, re.MULTILINE)
+    subject = match.group(1) if match else "this market"
+    return {"analysis": {key: f"{key.replace('_', ' ').capitalize()} for {subject}." for key in SECTION_KEYS}}
+
+def answer(messages):
+    """Return the completion text for the prompt main.py would send."""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    if "keyword extractor" in system:
+        result = keyword_answer(user)
+    elif "relevance analyzer" in system:
+        result = relevance_answer(user)
+    else:
+        result = final_answer(user)
+    return json.dumps(result)
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    chunk_delay = 0.0
+    chunk_size = 16
+    error_rate = 0.0
+    tail_rate = 0.0
+    tail_latency = 0.0
+    fail_first = 0
+    slow_first = 0
+    retry_after = None
+    served = itertools.count()
+    rng = random.Random(0)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if status == 429 and self.retry_after is not None:
+            self.send_header("Retry-After", str(self.retry_after))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        number = next(self.served)
+
+        if number < self.fail_first or (self.error_rate and self.rng.random() < self.error_rate):
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}})
+            return
+        number -= self.fail_first
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if number < self.slow_first or (self.tail_rate and self.rng.random() < self.tail_rate):
+            delay = self.tail_latency
+        time.sleep(max(0.0, delay))
+
+        model = request.get("model", "fake")
+        messages = request.get("messages", [])
+        content = answer(messages)
+        usage = {
+            "prompt_tokens": sum(estimate_tokens(m.get("content") or "") for m in messages),
+            "completion_tokens": estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        # Server-sent events; the connection is closed after [DONE]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def event(choices, **extra):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        for start in range(0, len(content), self.chunk_size):
+            if start and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            delta = content[start:start + self.chunk_size]
+            event([{"index": 0, "delta": {"content": delta}, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        # Like OpenAI, streamed usage is only sent when the client asks for it
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up, e.g. a hedged request that lost
+
+    def log_message(self, format, *args):
+        pass
+
+def make_handler(latency=0.0, jitter=0.0, chunk_delay=0.0, error_rate=0.0,
+                 tail_rate=0.0, tail_latency=0.0, seed=0, fail_first=0, slow_first=0,
+                 retry_after=None):
+    """Return a handler class with its own delays and error rate.
+
+    A ``tail_rate`` fraction of requests takes ``tail_latency`` seconds
+    instead, to imitate a slow tail. For deterministic tests, the first
+    ``fail_first`` requests are answered with 429 (with a ``retry_after``
+    header when given) and the ``slow_first`` requests after them take
+    ``tail_latency``.
+    """
+    return type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "chunk_delay": chunk_delay,
+        "error_rate": error_rate,
+        "tail_rate": tail_rate,
+        "tail_latency": tail_latency,
+        "fail_first": fail_first,
+        "slow_first": slow_first,
+        "retry_after": retry_after,
+        "served": itertools.count(),
+        "rng": random.Random(seed),
+    })
+
+def start_fake_llm_server(host="127.0.0.1", port=0, **options):
+    """Serve fake completions from a background thread and return the server.
+
+    ``options`` are passed to make_handler. ``server.base_url`` is the
+    OpenAI ``base_url`` to use; call ``server.shutdown()`` when done.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(**options))
+    server.daemon_threads = True
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI-compatible chat completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds added to the latency")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of requests that take --tail-latency")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="seconds taken by slow-tail requests")
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency, args.jitter, args.chunk_delay, args.error_rate,
+                           args.tail_rate, args.tail_latency)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving fake completions on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
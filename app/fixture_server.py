@@ -0,0 +1,68 @@
+"""Local HTTP server that serves the recorded Polymarket pages in app/fixtures.
+
+Point a backend at it to run the scraper without touching polymarket.com:
+
+    python app/fixture_server.py --port 8765
+    POLYMARKET_URL=http://127.0.0.1:8765 SCRAPER_BACKEND=http python app/main.py
+"""
+import argparse
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Request path -> fixture file. Every search query gets the same results page.
+ROUTES = {
+    "/markets": "search.html",
+    "/event/how-many-spacex-starship-launches-reach-space-in-2024": "market_multi.html",
+    "/event/will-starship-flight-7-launch-before-2025": "market_single.html",
+    "/event/starship-booster-caught-by-the-tower-in-2024": "market_booster.html",
+}
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    routes = ROUTES
+    fixtures_dir = FIXTURES_DIR
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/") or "/"
+        name = self.routes.get(path)
+        if name is None:
+            self.send_error(404)
+            return
+        with open(os.path.join(self.fixtures_dir, name), "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(host="127.0.0.1", port=0):
+    """Serve the fixtures from a background thread and return the server.
+
+    ``server.base_url`` is the URL to pass to a backend; call
+    ``server.shutdown()`` when done.
+    """
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.daemon_threads = True
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded Polymarket pages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), FixtureHandler)
+    print(f"Serving {FIXTURES_DIR} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
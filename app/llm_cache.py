@@ -0,0 +1,108 @@
+"""Persistent, content-addressed cache for LLM completions.
+
+Entries are keyed by a hash of the API endpoint, model, system prompt,
+user prompt and prompt-template version, so identical prompts never hit the API twice
+while they are fresh. The cache is a single SQLite file that is safe to
+share between threads and between processes.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+class LLMCache:
+    """SQLite-backed completion cache with a TTL and LRU size bound.
+
+    ``bypass`` skips lookups but still stores fresh completions, so a
+    bypassed run refreshes the cache instead of ignoring it. ``endpoint``
+    (the API base URL) is part of every key, so answers from a local stub
+    are never served to runs against the real API.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=1000, bypass=False, endpoint=None):
+        self.path = path
+        self.endpoint = endpoint
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)"
+        )
+        self._conn.commit()
+
+    def key(self, model, system_prompt, user_prompt, template_version):
+        payload = json.dumps([self.endpoint, model, system_prompt, user_prompt, template_version])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model, system_prompt, user_prompt, template_version):
+        """Return the cached completion text, or None on a miss."""
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            return None
+        key = self.key(model, system_prompt, user_prompt, template_version)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, system_prompt, user_prompt, template_version, content):
+        """Store a completion and evict the least recently used entries over the limit."""
+        key = self.key(model, system_prompt, user_prompt, template_version)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def report(self):
+        s = self.stats()
+        return f"LLM cache: {s['hits']} hits, {s['misses']} misses, {s['entries']} entries"
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
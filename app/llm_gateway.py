@@ -0,0 +1,225 @@
+"""Shared async gateway for the chat completion calls.
+
+One AsyncOpenAI client runs on an event loop in a background thread, so
+synchronous callers (the pipeline, batch workers, the service) share its
+keep-alive connections instead of each opening their own:
+
+    gateway = LLMGateway(api_key, base_url)
+    content, usage = gateway.complete(model, messages)
+    results = gateway.complete_many([(model, messages), ...])
+
+Each request holds one of ``max_connections`` connection slots and one of
+its model's concurrency slots. 429s, 5xx responses, timeouts and dropped
+connections are retried with exponential backoff and jitter, honouring
+Retry-After. A non-streamed request still running after the model's recent
+p95 latency (or a fixed ``hedge_after``) gets a duplicate request, and
+whichever answers first wins; hedges are skipped while the model's slots
+are all taken so they never add load to a saturated endpoint.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+import openai
+from openai import AsyncOpenAI
+
+from tracing import debug, tracer
+
+class LLMError(Exception):
+    """Raised when a completion still fails after every retry."""
+
+def _status(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def is_retryable(error):
+    """True for rate limits, server errors, timeouts and connection failures."""
+    status = _status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError))
+
+class LLMGateway:
+    def __init__(self, api_key, base_url=None, max_connections=16, model_limits=None,
+                 default_model_limit=4, timeout=60, max_retries=3, backoff_base=0.5,
+                 backoff_max=8, hedge_after="auto", hedge_min_samples=5, history=50):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.model_limits = dict(model_limits or {})
+        self.default_model_limit = default_model_limit
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # "auto" hedges after the model's recent p95, a number after that many
+        # seconds, and None never hedges
+        self.hedge_after = hedge_after
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = defaultdict(lambda: deque(maxlen=history))
+        self._model_slots = {}
+        self._connections = None
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="llm-gateway", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def _get_client(self):
+        # Created on the loop thread so its connection pool belongs to that loop.
+        # The SDK's own retries are off; _with_retries handles them.
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0
+            )
+            self._connections = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    def _slots(self, model):
+        if model not in self._model_slots:
+            limit = self.model_limits.get(model, self.default_model_limit)
+            self._model_slots[model] = asyncio.Semaphore(limit)
+        return self._model_slots[model]
+
+    def hedge_delay(self, model):
+        """Seconds to wait before hedging a request to ``model``, or None."""
+        if self.hedge_after is None:
+            return None
+        if self.hedge_after != "auto":
+            return float(self.hedge_after)
+        samples = sorted(self._latencies[model])
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    async def _request(self, model, messages, on_text=None):
+        client = self._get_client()
+        async with self._slots(model), self._connections:
+            started = time.perf_counter()
+            if on_text is None:
+                completion = await client.chat.completions.create(model=model, messages=messages)
+                self._latencies[model].append(time.perf_counter() - started)
+                return completion.choices[0].message.content, completion.usage
+
+            parts = []
+            usage = None
+            # Without include_usage, streamed responses carry no token counts
+            stream = await client.chat.completions.create(
+                model=model, messages=messages, stream=True, stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    on_text(delta)
+                # Servers that report usage send it on the last chunk
+                usage = getattr(chunk, "usage", None) or usage
+            return "".join(parts), usage
+
+    async def _with_retries(self, model, messages, on_text=None):
+        emitted = False
+
+        def track(text):
+            nonlocal emitted
+            emitted = True
+            on_text(text)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._request(model, messages, track if on_text else None)
+            except Exception as e:
+                # Text already handed to the caller cannot be taken back
+                if emitted or attempt == self.max_retries or not is_retryable(e):
+                    raise LLMError(f"{model} request failed after {attempt + 1} attempts: {e}") from e
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = self.backoff_base * 2 ** attempt * random.uniform(0.5, 1.0)
+                delay = min(delay, self.backoff_max)
+                tracer.incr("llm_retries_total", model=model, status=str(_status(e) or type(e).__name__))
+                debug(f"{model} request failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def acomplete(self, model, messages, on_text=None):
+        """Return ``(content, usage)``, hedging non-streamed requests."""
+        delay = None if on_text else self.hedge_delay(model)
+        primary = asyncio.ensure_future(self._with_retries(model, messages, on_text))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or self._slots(model).locked():
+            return await primary
+
+        tracer.incr("llm_hedges_total", model=model)
+        debug(f"{model} request still running after {delay:.2f}s, sending a hedge")
+        hedge = asyncio.ensure_future(self._with_retries(model, messages))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            tracer.incr("llm_hedge_wins_total", model=model)
+                        return task.result()
+            return primary.result()  # Both failed; raise the primary's error
+        finally:
+            for task in (primary, hedge):
+                task.cancel()
+
+    async def acomplete_many(self, requests):
+        """Run ``(model, messages)`` pairs concurrently with ``asyncio.gather``.
+
+        Returns ``(content, usage)`` per request, in order, or the exception
+        it raised.
+        """
+        return await asyncio.gather(
+            *(self.acomplete(model, messages) for model, messages in requests), return_exceptions=True
+        )
+
+    def complete(self, model, messages, on_text=None):
+        """Blocking ``acomplete`` for threads outside the gateway's loop.
+
+        ``on_text`` is called on the gateway thread as streamed text arrives.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.acomplete(model, messages, on_text), self._ensure_loop()
+        )
+        return future.result()
+
+    def complete_many(self, requests):
+        """Blocking ``acomplete_many``."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.acomplete_many(list(requests)), self._ensure_loop()
+        )
+        return future.result()
+
+    def close(self):
+        """Close the client's connections and stop the loop thread."""
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
@@ -1,461 +1,670 @@
 import os
 import json
-from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.keys import Keys
-from openai import OpenAI
 import time
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementNotInteractableException
-from dataclasses import dataclass
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables before the app modules, some of which (scraper's
+# BROWSER_PROFILE, PAGE_LOAD_STRATEGY and BLOCKED_URLS) read them on import
 load_dotenv()
 
-# Initialize OpenAI client as shown in documentation
+from backends import POLYMARKET_URL as DEFAULT_POLYMARKET_URL, create_backend, make_session
+from driver_pool import DriverPool
+from readiness import readiness
+from llm_cache import LLMCache
+from llm_gateway import LLMGateway
+from snapshot_store import SnapshotBackend, SnapshotStore
+from ranking import MarketIndex
+from prompts import encode_markets, encode_titles, estimate_tokens
+from analytics import compute_metrics
+from tracing import debug, tracer
+from streaming import (
+    SECTION_KEYS,
+    AnalysisStreamParser,
+    NdjsonSink,
+    extract_analysis,
+    fan_out,
+    print_section,
+    recover_json,
+)
+
 api_key = os.getenv("GLHF_API_KEY")
 if not api_key:
     raise ValueError("GLHF_API_KEY environment variable not set.")
 
-client = OpenAI(
-    api_key=api_key,
-    base_url="https://glhf.chat/api/openai/v1"
+# One shared async client for every LLM call. Any OpenAI-compatible endpoint
+# works, e.g. app/fake_llm_server.py offline. LLM_HEDGE_AFTER is "auto"
+# (hedge after the model's recent p95 latency), a number of seconds or "off".
+hedge_after = os.getenv("LLM_HEDGE_AFTER", "auto")
+gateway = LLMGateway(
+    api_key,
+    base_url=os.getenv("GLHF_BASE_URL", "https://glhf.chat/api/openai/v1"),
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "16")),
+    default_model_limit=int(os.getenv("LLM_MODEL_CONCURRENCY", "4")),
+    timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    hedge_after=None if hedge_after == "off" else hedge_after if hedge_after == "auto" else float(hedge_after),
 )
 
-def transform_query_to_keywords(query):
-    """Transform user query into search keywords using Gemma LLM."""
-    system_prompt = """You are a search keyword extractor. Your task is to transform a user's query into a single relevant keyword 
-    that can be used to search on Polymarket. You must respond in the following JSON format:
-    {
-        "keyword": "your extracted keyword here" (ONLY ONE WORD)
-    }
-    Be concise and focus on the most important concept. Return ONLY the JSON, nothing else."""
+# "bulk" reads each market page with one execute_script call,
+# "selector" uses the original one-wait-per-field path
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "bulk")
+
+# "auto" reads the server-rendered page data over HTTP and falls back to
+# Selenium when that fails, "http" and "selenium" force one backend
+SCRAPER_BACKEND = os.getenv("SCRAPER_BACKEND", "auto")
+POLYMARKET_URL = os.getenv("POLYMARKET_URL", DEFAULT_POLYMARKET_URL)
+
+# Local title ranking: a title scoring PRERANK_MARGIN times the runner-up
+# skips the relevance LLM call (set to "inf" to always ask the LLM);
+# otherwise only the PRERANK_TOP_K best titles are sent to it
+PRERANK_MARGIN = float(os.getenv("PRERANK_MARGIN", "1.5"))
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "5"))
+
+# Maximum number of market pages fetched at the same time per query
+DETAIL_CONCURRENCY = int(os.getenv("DETAIL_CONCURRENCY", "4"))
+
+# The keyword stage returns up to SEARCH_KEYWORDS ranked keywords; their
+# searches run SEARCH_CONCURRENCY at a time and are merged by market URL
+SEARCH_KEYWORDS = int(os.getenv("SEARCH_KEYWORDS", "3"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "3"))
+
+GEMMA_MODEL = "hf:google/gemma-2-9b-it"
+NEMOTRON_MODEL = "hf:nvidia/Llama-3.1-Nemotron-70B-Instruct-HF"
+
+# Bump a version when its prompt template or response parsing changes so
+# completions cached under the old template are no longer served
+PROMPT_VERSIONS = {"keywords": 2, "relevance": 2, "final": 3}
+
+# Estimated prompt tokens (system and user prompt) allowed per model; the
+# least relevant markets and lowest-volume outcomes are dropped to fit
+PROMPT_TOKEN_BUDGETS = {
+    GEMMA_MODEL: int(os.getenv("GEMMA_PROMPT_TOKENS", "2000")),
+    NEMOTRON_MODEL: int(os.getenv("NEMOTRON_PROMPT_TOKENS", "6000")),
+}
+
+# Per-stage spans are written as a JSON trace to TRACE_FILE and as
+# Prometheus text to METRICS_FILE; tracing is off when neither is set
+TRACE_FILE = os.getenv("TRACE_FILE")
+METRICS_FILE = os.getenv("METRICS_FILE")
+if TRACE_FILE or METRICS_FILE:
+    tracer.enabled = True
+
+llm_cache = LLMCache(
+    os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite"),
+    ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+    bypass=os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes"),
+    endpoint=gateway.base_url,
+)
+
+# Scraped market details are reused for SNAPSHOT_FRESH_FOR seconds, then
+# served while a background scrape refreshes them for SNAPSHOT_STALE_FOR more
+snapshot_store = SnapshotStore(
+    os.getenv("SNAPSHOT_PATH", ".snapshots.sqlite"),
+    fresh_for=float(os.getenv("SNAPSHOT_FRESH_FOR", "60")),
+    stale_for=float(os.getenv("SNAPSHOT_STALE_FOR", "600")),
+)
+
+def open_backend(kind=None, pool=None, session=None):
+    """Return a scraper backend (SCRAPER_BACKEND by default) that reads
+    market details through the snapshot store.
+
+    Stale snapshots are only refreshed in the background when a driver pool
+    or session is shared, so a refresh never starts a browser of its own;
+    call ``snapshot_store.drain()`` before closing them.
+    """
+    kind = kind or SCRAPER_BACKEND
     
-    user_prompt = f""" important: Extract ONLY ONE keyword that is most relevant for searching. Just return the main concept as the keyword.
+    def make():
+        return create_backend(kind, POLYMARKET_URL, EXTRACTION_MODE, pool=pool, session=session)
+    
+    def refresh():
+        return None if pool is not None and pool.closed else make()
+    
+    shared = pool is not None or session is not None
+    return SnapshotBackend(make(), snapshot_store, refresh if shared else None)
+
+def _is_json(content):
+    try:
+        json.loads(content)
+        return True
+    except (TypeError, json.JSONDecodeError):
+        return False
+
+def log_prompt_size(model, system_prompt, user_prompt, span=None):
+    """Record the estimated prompt tokens of one LLM call."""
+    tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+    debug(f"{model} prompt: ~{tokens} tokens, {len(system_prompt) + len(user_prompt)} chars")
+    tracer.incr("llm_prompt_tokens_estimated_total", tokens, model=model)
+    if span is not None:
+        # prompt_tokens is left for the count the server reports
+        span.set(prompt_tokens_estimated=tokens)
+    return tokens
+
+def prompt_budget(model, *fixed_parts):
+    """Tokens left for the data of a prompt to ``model`` after ``fixed_parts``."""
+    return PROMPT_TOKEN_BUDGETS.get(model, 4000) - sum(estimate_tokens(part) for part in fixed_parts)
+
+def chat_completion(model, system_prompt, user_prompt, template_version, on_text=None):
+    """Return the completion text for a prompt, using the LLM cache.
+
+    Only responses that parse as JSON are cached, so a malformed answer is
+    retried on the next run instead of being replayed. Passing ``on_text``
+    streams the completion: it is called with each piece of text as it
+    arrives (or once with the whole text on a cache hit).
+    """
+    with tracer.span("llm", model=model) as span:
+        log_prompt_size(model, system_prompt, user_prompt, span)
+        content = llm_cache.get(model, system_prompt, user_prompt, template_version)
+        if content is not None:
+            debug("LLM cache hit")
+            span.set(cache="hit")
+            tracer.incr("llm_requests_total", model=model, cache="hit")
+            if on_text:
+                on_text(content)
+            return content
+        
+        span.set(cache="miss")
+        tracer.incr("llm_requests_total", model=model, cache="miss")
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        if on_text is None:
+            content, usage = gateway.complete(model, messages)
+        else:
+            started = time.perf_counter()
+            first_token = []
+            
+            def forward(text):
+                if not first_token:
+                    first_token.append(time.perf_counter() - started)
+                on_text(text)
+            
+            content, usage = gateway.complete(model, messages, on_text=forward)
+            if first_token:
+                span.set(first_token_s=round(first_token[0], 3))
+        tracer.record_usage(model, usage)
+        
+        if _is_json(content):
+            llm_cache.put(model, system_prompt, user_prompt, template_version, content)
+        return content
+
+def chat_completions(requests):
+    """Batch form of chat_completion for ``(model, system_prompt, user_prompt,
+    template_version)`` tuples.
+
+    Cache misses go to the gateway as one batch that runs concurrently on its
+    event loop. Token usage is recorded per request, so the ``llm_batch`` span
+    carries the totals of the batch. Returns the content for each request,
+    or None where the request failed.
+    """
+    with tracer.span("llm_batch", size=len(requests)) as span:
+        contents = [llm_cache.get(*request) for request in requests]
+        misses = [i for i, content in enumerate(contents) if content is None]
+        span.set(cache_hits=len(requests) - len(misses))
+        for (model, system_prompt, user_prompt, _), content in zip(requests, contents):
+            log_prompt_size(model, system_prompt, user_prompt)
+            tracer.incr("llm_requests_total", model=model, cache="miss" if content is None else "hit")
+        
+        answers = gateway.complete_many([
+            (model, [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}])
+            for model, system_prompt, user_prompt, _ in (requests[i] for i in misses)
+        ])
+        for i, answer in zip(misses, answers):
+            if isinstance(answer, Exception):
+                print(f"Error in batched LLM request: {answer}")
+                continue
+            content, usage = answer
+            tracer.record_usage(requests[i][0], usage)
+            contents[i] = content
+            if _is_json(content):
+                llm_cache.put(*requests[i], content)
+        return contents
+
+def keyword_request(query):
+    """Return the ``(model, system_prompt, user_prompt, template_version)`` for a query's keywords."""
+    system_prompt = f"""You are a search keyword extractor. Your task is to transform a user's query into up to {SEARCH_KEYWORDS} 
+    search keywords that can be used to search on Polymarket, most relevant first. You must respond in the following JSON format:
+    {{
+        "keywords": ["most relevant keyword", "next keyword"] (ONE WORD EACH)
+    }}
+    Each keyword should cover a different concept of the query. Return ONLY the JSON, nothing else."""
+    
+    user_prompt = f""" important: Extract at most {SEARCH_KEYWORDS} keywords for searching, ranked from most to least relevant. Use one word per keyword.
       Query: {query}
 
 Note 1: You must respond in the following JSON format:
 {{
-    "keyword": "your extracted keyword here" (ONLY ONE WORD)
+    "keywords": ["most relevant keyword", "next keyword"] (ONE WORD EACH)
 }}
 
-Note 2: Extract ONLY ONE keyword that is most relevant for searching. Just return the main concept as the keyword.
+Note 2: A query about a single concept needs only one keyword. Do not repeat a keyword.
 
 Note 3: Return ONLY the JSON, no other text, no markdown formatting."""
     
+    return GEMMA_MODEL, system_prompt, user_prompt, PROMPT_VERSIONS["keywords"]
+
+def parse_keywords(content):
+    """Return the ranked keywords in a keyword response, or None.
+
+    Responses with a single ``"keyword"`` are accepted too.
+    """
+    debug(f"Content: {content}")
     try:
-        print("\nDEBUG - Sending request to Gemma API:")
-        completion = client.chat.completions.create(
-            model="hf:google/gemma-2-9b-it",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        
-        print("\nDEBUG - Raw API Response:")
-        print(completion.choices[0].message)
-        
-        content = completion.choices[0].message.content
-        print("\nDEBUG - Content:", content)
-        
-        try:
-            result = json.loads(content)
-            keyword = result.get("keyword", "").strip()
-            # Ensure we only take the first word if multiple are returned
-            keyword = keyword.split()[0] if keyword else None
-            return keyword
-        except json.JSONDecodeError as e:
-            print(f"DEBUG - JSON parsing error: {e}")
-            return None
-            
+        result = json.loads(content)
+        keywords = result.get("keywords")
+        if keywords is None:
+            keywords = [result.get("keyword", "")]
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        ranked = []
+        for keyword in keywords:
+            # Ensure we only take the first word of each keyword
+            words = str(keyword).split()
+            if words and words[0].lower() not in (k.lower() for k in ranked):
+                ranked.append(words[0])
+        return ranked[:SEARCH_KEYWORDS] or None
+    except (json.JSONDecodeError, TypeError, AttributeError) as e:
+        debug(f"JSON parsing error: {e}")
+        return None
+
+def transform_query_to_keywords(query):
+    """Transform user query into ranked search keywords using Gemma LLM."""
+    try:
+        debug("Sending request to Gemma API:")
+        return parse_keywords(chat_completion(*keyword_request(query)))
     except Exception as e:
         print(f"Error transforming query: {e}")
         return None
 
+def transform_queries_to_keywords(queries):
+    """Extract the keywords of many queries with concurrent LLM calls."""
+    try:
+        contents = chat_completions([keyword_request(query) for query in queries])
+    except Exception as e:
+        print(f"Error transforming queries: {e}")
+        return [None] * len(queries)
+    return [parse_keywords(content) if content else None for content in contents]
+
 def analyze_market_relevance(query, markets):
-    """Analyze market relevance using Gemma LLM."""
-    system_prompt = """You are a market relevance analyzer. Given a user's original query and a list of market data, 
-    determine which markets are relevant to the query. You must respond in the following JSON format:
-    {
-        "relevant_market": [
-            "market title 1"
-        ]
-    }
-    Return ONLY the JSON with the list of relevant market titles, nothing else. Only return one market title, the most relevant one to the query."""
+    """Analyze market relevance using Gemma LLM.
+
+    ``markets`` are search cards, best candidate first; the last ones are
+    left out if their titles would not fit the model's prompt budget.
+    """
+    system_prompt = """You are a market relevance analyzer. Given a user's query and a numbered list of market titles, 
+    pick the one market most relevant to the query. Respond with ONLY this JSON, nothing else:
+    {"relevant_market": ["exact market title"]}"""
     
     try:
-        print("\nDEBUG - Sending request to Gemma API:")
-        completion = client.chat.completions.create(
-            model="hf:google/gemma-2-9b-it",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Query: {query}\nMarkets: {json.dumps(markets, indent=2)}"}
-            ]
-        )
+        debug("Sending request to Gemma API:")
+        header = f"Query: {query}\nMarkets:\n"
+        titles, dropped = encode_titles(markets, prompt_budget(GEMMA_MODEL, system_prompt, header))
+        if dropped:
+            debug(f"Left {dropped} market titles out of the relevance prompt")
+        user_prompt = header + titles
+        content = chat_completion(GEMMA_MODEL, system_prompt, user_prompt, PROMPT_VERSIONS["relevance"])
         
-        print("\nDEBUG - Raw API Response:")
-        print(completion.choices[0].message)
-        
-        content = completion.choices[0].message.content
-        print("\nDEBUG - Content:", content)
+        debug(f"Content: {content}")
         
         try:
             result = json.loads(content)
             return result.get("relevant_market", [])
         except json.JSONDecodeError as e:
-            print(f"DEBUG - JSON parsing error: {e}")
+            debug(f"JSON parsing error: {e}")
             return []
             
     except Exception as e:
         print(f"Error analyzing market relevance: {e}")
         return []
 
-def analyze_final(query, market_details):
-    """Final analysis using Nemotron LLM."""
-    system_prompt = """ IMPORTANT: Return ONLY the JSON, nothing else, no markdown formatting nor backticks, nor bold asterisks or other formatting.
-    You are a financial market analyst specializing in prediction markets. Given a user's query and detailed market data, 
-    provide a thorough analysis in formal but simple language. You must respond in the following JSON format:
-    {
-        "analysis": {
-            "bet_description": "What the bet is about and what outcomes are possible",
-            "probabilities": "Current probabilities and what they mean",
-            "volume_and_liquidity": "Trading volume and market liquidity analysis",
-            "opportunities": "Most profitable opportunities if any",
-            "risks": "Risks and uncertainties",
-            "additional_info": "Any other relevant information",
-            "summary": "A concise summary of the analysis"
-        }
-    }
-    Make your explanation detailed but easy to understand for someone who can only see your description.
-    Return ONLY the JSON, nothing else, no markdown formatting nor backticks, nor bold asterisks or other formatting. """
+def analyze_final(query, market_details, metrics=None, on_section=None):
+    """Final analysis using Nemotron LLM.
+
+    ``metrics`` are the locally computed numbers from analytics.compute_metrics;
+    the model is told to quote them rather than derive its own. With
+    ``on_section`` the completion is streamed and ``on_section(key, text)``
+    is called as soon as each analysis section is complete. Markets are sent
+    as compact tables (prompts.encode_markets), summarizing the lowest-volume
+    outcomes when the prompt would exceed the model's PROMPT_TOKEN_BUDGETS.
+    """
+    system_prompt = """You are a financial market analyst specializing in prediction markets. Given a user's query and market data, 
+    provide a thorough analysis in formal but simple language, detailed but easy to understand for someone who can only see your description.
+    Respond with ONLY this JSON, no markdown formatting nor backticks, nor bold asterisks or other formatting:
+    {"analysis": {"bet_description": "What the bet is about and what outcomes are possible", "probabilities": "Current probabilities and what they mean", "volume_and_liquidity": "Trading volume and market liquidity analysis", "opportunities": "Most profitable opportunities if any", "risks": "Risks and uncertainties", "additional_info": "Any other relevant information", "summary": "A concise summary of the analysis"}}
+    Each market is a "Market:" line, a line of market fields and a table of its outcomes with "|" between columns and "-" for unknown values.
+    Use the numbers given instead of calculating your own: prob is the displayed probability, implied the fair probability after removing
+    the bid/ask spread, yes and no the prices of buying Yes and No, spread the cost of buying both, volume in dollars, share the outcome's
+    share of the listed outcome volume, ret_yes/ret_no the return per dollar of buying at the current price if the implied probability
+    is right, and overround the bookmaker margin. A "+N more" line sums the lower-volume outcomes that were left out."""
+    
+    parser = AnalysisStreamParser() if on_section else None
+    
+    def emit_sections(text):
+        for key, value in parser.feed(text):
+            on_section(key, value)
     
     try:
-        print("\nDEBUG - Sending request to Nemotron API:")
-        completion = client.chat.completions.create(
-            model="hf:nvidia/Llama-3.1-Nemotron-70B-Instruct-HF",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Query: {query}\nMarket Details: {json.dumps(market_details, indent=2)} ; Return ONLY the JSON, nothing else, no markdown formatting nor backticks, nor bold asterisks or other formatting."}
-            ]
+        debug("Sending request to Nemotron API:")
+        header = f"Query: {query}\n\n"
+        tables, dropped = encode_markets(
+            market_details, metrics, prompt_budget(NEMOTRON_MODEL, system_prompt, header)
+        )
+        if dropped:
+            debug(f"Summarized {dropped} lower-volume outcomes to fit the prompt budget")
+        user_prompt = header + tables
+        content = chat_completion(
+            NEMOTRON_MODEL, system_prompt, user_prompt, PROMPT_VERSIONS["final"],
+            on_text=emit_sections if parser else None
         )
         
-        print("\nDEBUG - Raw API Response:")
-        print(completion.choices[0].message)
-        
-        content = completion.choices[0].message.content
-        print("\nDEBUG - Content:", content)
-        
-        try:
-            result = json.loads(content)
-            return result.get("analysis")
-        except json.JSONDecodeError as e:
-            print(f"DEBUG - JSON parsing error: {e}")
-            return None
+        debug(f"Content: {content}")
             
     except Exception as e:
         print(f"Error in final analysis: {e}")
+        if not parser or not parser.sections:
+            return None
+        # Keep what was streamed before the connection dropped
+        content = parser.buffer
+    
+    # Tolerate markdown fences and truncated output instead of discarding the call
+    analysis = extract_analysis(recover_json(content))
+    if analysis is None and parser and parser.sections:
+        # Still return the sections that were streamed whole
+        analysis = dict(parser.sections)
+    if analysis is None:
+        debug("JSON parsing error: no analysis object in the response")
         return None
+    if parser:
+        # Sections that only became parseable once the JSON was repaired
+        for key, value in analysis.items():
+            if key not in parser.sections:
+                on_section(key, value)
+    return analysis
 
-@dataclass
-class Outcome:
-    title: str
-    volume: str
-    percentage: str
-    buy_yes_price: str
-    buy_no_price: str
+# Optional caps on how many queries run a stage at once, e.g.
+# {"search": threading.BoundedSemaphore(2)}; the service (service.py) sets them
+stage_limits = {}
 
-def get_element_text(driver, selector, timeout=15):
-    """Helper function to get element text safely"""
-    try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-        )
-        return element.text.strip()
-    except Exception as e:
-        print(f"Error getting text for selector {selector}: {str(e)}")
-        return None
+@contextmanager
+def stage(name, **attrs):
+    """Trace a pipeline stage, holding one of its slots if the stage is capped."""
+    limit = stage_limits.get(name)
+    if limit is None:
+        with tracer.span(name, **attrs) as span:
+            yield span
+        return
+    waiting = time.perf_counter()
+    with limit:
+        with tracer.span(name, **attrs) as span:
+            span.set(slot_wait_s=round(time.perf_counter() - waiting, 4))
+            yield span
 
-def extract_market_details(driver, market_card):
-    """Extract title, volume, and end date from market card"""
-    try:
-        # Use the new selectors for market details
-        title = get_element_text(driver, ".c-dqzIym.c-gYmnSl.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-dxJWYY-weight-bold")
-        volume = get_element_text(driver, ".c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-hzzdKO-size-md.c-dqzIym-iUwoCw-css")
-        end_date = get_element_text(driver, "p.c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-hzzdKO-size-md.c-dqzIym-idjDWCM-css.c-PJLV span")
-        
-        return {
-            "title": title,
-            "volume": volume,
-            "end_date": end_date
-        }
-    except Exception as e:
-        print(f"Error extracting market details: {str(e)}")
-        return None
+def run_query(user_query, backend, on_section=None, search_keywords=None):
+    """Run keyword extraction, search, relevance, details and final analysis.
 
-def extract_outcome_data(driver, market_card):
-    """Extract outcome data using the working approach from test_scraper"""
-    try:
-        outcomes = []
-        base_path = "body > div:nth-child(1) > div:nth-child(3) > main:nth-child(3) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2)"
-        
-        # First try to find multiple outcomes
-        try:
-            # Original multiple outcomes logic
-            for outcome_index in range(3, 5):
-                try:
-                    outcome_base = f"{base_path} > div:nth-child({outcome_index})"
-                    
-                    # Construct selectors for each element
-                    selectors = {
-                        "title": f"{outcome_base} > div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1) > div:nth-child(1) > p:nth-child(1)",
-                        "volume": f"{outcome_base} > div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > p:nth-child(1)",
-                        "percentage": f"{outcome_base} > div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > p:nth-child(1)",
-                        "buy_yes": f"{outcome_base} > div:nth-child(3) > div:nth-child(1)",
-                        "buy_no": f"{outcome_base} > div:nth-child(3) > div:nth-child(2)"
-                    }
-                    
-                    print(f"\nProcessing Outcome {outcome_index-2}")
-                    
-                    try:
-                        title_element = driver.find_element(By.CSS_SELECTOR, selectors["title"])
-                        driver.execute_script("arguments[0].scrollIntoView(true);", title_element)
-                        time.sleep(1)
-                    except Exception as scroll_error:
-                        print(f"Scroll error: {scroll_error}")
-                        raise  # Propagate the error to trigger single outcome logic
-                    
-                    # Extract all data
-                    title = get_element_text(driver, selectors["title"])
-                    volume = get_element_text(driver, selectors["volume"])
-                    percentage = get_element_text(driver, selectors["percentage"])
-                    buy_yes = get_element_text(driver, selectors["buy_yes"])
-                    buy_no = get_element_text(driver, selectors["buy_no"])
-                    
-                    if title:
-                        outcome = Outcome(
-                            title=title,
-                            volume=volume,
-                            percentage=percentage,
-                            buy_yes_price=buy_yes,
-                            buy_no_price=buy_no
-                        )
-                        outcomes.append(outcome)
-                        print(f"Successfully extracted outcome {outcome_index-2}")
-                    
-                except Exception as e:
-                    print(f"Error processing outcome {outcome_index-2}: {str(e)}")
-                    raise  # Propagate the error to trigger single outcome logic
-                    
-        except Exception as multi_outcome_error:
-            print("Attempting to process single outcome case...")
-            # Single outcome selectors
-            single_selectors = {
-                "percentage": ".c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-idXFcBQ-css",
-                "type": ".c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-euRFQq-size-sm.c-dqzIym-igYhVgt-css",
-                "buy_yes": ".c-gBrBnR.c-dETnmA.c-gBrBnR-iicKxNF-css",
-                "buy_no": ".c-gBrBnR.c-dETnmA.c-gBrBnR-iggWduY-css"
-            }
-            
-            # Get market title (reuse from market details)
-            title = get_element_text(driver, ".c-dqzIym.c-gYmnSl.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-dxJWYY-weight-bold")
-            percentage = get_element_text(driver, single_selectors["percentage"])
-            outcome_type = get_element_text(driver, single_selectors["type"])
-            buy_yes = get_element_text(driver, single_selectors["buy_yes"])
-            buy_no = get_element_text(driver, single_selectors["buy_no"])
-            
-            if title and percentage:
-                outcome = Outcome(
-                    title=title,
-                    volume="N/A",  # Volume doesn't apply for single outcome
-                    percentage=percentage,
-                    buy_yes_price=buy_yes,
-                    buy_no_price=buy_no
-                )
-                outcomes.append(outcome)
-                print("Successfully extracted single outcome")
-        
-        return [vars(outcome) for outcome in outcomes]  # Convert dataclass instances to dicts
-        
-    except Exception as e:
-        print(f"Error in outcome extraction: {str(e)}")
-        return []
+    Returns the final results dict, or None when a stage produced nothing.
+    ``on_section`` streams the final analysis (see analyze_final).
+    ``search_keywords`` (a keyword or a ranked list of them) skips keyword
+    extraction when already known, e.g. from transform_queries_to_keywords.
+    """
+    with tracer.span("query", query=user_query) as span:
+        results = _run_query(user_query, backend, on_section, search_keywords)
+        span.set(ok=results is not None)
+        tracer.incr("queries_total", status="ok" if results else "failed")
+        return results
 
-def setup_driver():
-    """Setup Chrome driver with tablet-like dimensions in headless mode"""
-    chrome_options = Options()
+def _run_query(user_query, backend, on_section, search_keywords):
+    # Step 1: Transform query to keywords using LLM
+    if not search_keywords:
+        print("\nTransforming query to keywords...")
+        with stage("keywords"):
+            search_keywords = transform_query_to_keywords(user_query)
+    if not search_keywords:
+        print("Failed to transform query to keywords")
+        return
+    if isinstance(search_keywords, str):
+        search_keywords = [search_keywords]
+    print(f"Search keywords: {', '.join(search_keywords)}")
     
-    # Headless mode configuration
-    chrome_options.add_argument("--headless=new")  # New headless mode
-    chrome_options.add_argument("--window-size=820,1180")  # Tablet-like dimensions
-    chrome_options.add_argument("--disable-gpu")  # Required for some systems
-    chrome_options.add_argument("--no-sandbox")  # Required for some systems
-    chrome_options.add_argument("--disable-dev-shm-usage")  # Memory optimization
+    # Get titles for relevance analysis
+    with stage("search", keywords=",".join(search_keywords), backend=backend.name) as span:
+        market_titles = backend.search_many(search_keywords, SEARCH_CONCURRENCY)
+        span.set(results=len(market_titles))
+    if not market_titles:
+        print("No relevant markets found")
+        return
     
-    # Create and return the driver
-    return webdriver.Chrome(options=chrome_options)
-
-def click_market_card(driver, card_index):
-    """Click on a specific market card using precise CSS selector"""
-    try:
-        # Construct the selector for the specific card's title link
-        card_selector = f"body > div:nth-child(1) > div:nth-child(3) > main:nth-child(3) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > div:nth-child(4) > div:nth-child(1) > div:nth-child({card_index}) > div:nth-child(1) > div:nth-child(2) > a:nth-child(1) > p:nth-child(1)"
-        
-        # Find and scroll to the element
-        card_element = driver.find_element(By.CSS_SELECTOR, card_selector)
-        driver.execute_script("arguments[0].scrollIntoView(true);", card_element)
-        time.sleep(1)  # Wait for scroll
-        
-        # Click using JavaScript to avoid any overlay issues
-        driver.execute_script("arguments[0].click();", card_element)
-        time.sleep(3)  # Wait for page load
-        
-        return True
-    except Exception as e:
-        print(f"Error clicking market card {card_index}: {str(e)}")
-        return False
-
-def main():
-    driver = None
-    try:
-        # Test query
-        user_query = "starship launches in 2024"
-        
-        print("Initializing WebDriver...")
-        driver = setup_driver()
-        
-        # Step 1: Transform query to keywords using LLM
-        print("\nTransforming query to keywords...")
-        search_keywords = transform_query_to_keywords(user_query)
-        if not search_keywords:
-            print("Failed to transform query to keywords")
-            return
-        print(f"Search keywords: {search_keywords}")
-        
-        # Navigate to the search URL with transformed keywords
-        search_url = f"https://polymarket.com/markets?_q={search_keywords}"
-        print(f"\nNavigating to: {search_url}")
-        driver.get(search_url)
-        time.sleep(5)  # Wait for page load
-        
-        # Find market cards using the precise selectors
-        cards_selector = "div:nth-child(1) > div:nth-child(3) > main:nth-child(3) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > div:nth-child(4) > div:nth-child(1) > div"
-        market_cards = driver.find_elements(By.CSS_SELECTOR, cards_selector)
-        print(f"\nFound {len(market_cards)} market cards")
-        
-        # Get titles for relevance analysis
-        market_titles = []
-        for idx, card in enumerate(market_cards, 1):
-            try:
-                title_selector = "div:nth-child(1) > div:nth-child(2) > a:nth-child(1) > p:nth-child(1)"
-                title = card.find_element(By.CSS_SELECTOR, title_selector).text
-                market_titles.append({"title": title, "index": idx})
-                print(f"Found market {idx}: {title}")
-            except Exception as e:
-                print(f"Error extracting card title: {str(e)}")
-                continue
-        
-        # Step 2: Analyze market relevance using LLM
-        print("\nAnalyzing market relevance...")
-        llm_response = analyze_market_relevance(user_query, market_titles)
-        
-        # Parse the LLM response to get relevant markets
-        relevant_markets = []
+    # Step 2: Rank titles locally; only ask the LLM when there is no clear winner
+    with tracer.span("rank") as span:
+        market_index = MarketIndex(market_titles)
+        winner, candidates = market_index.prerank(user_query, PRERANK_TOP_K, PRERANK_MARGIN)
+        span.set(decided=winner is not None, candidates=len(candidates))
+    
+    if winner:
+        print(f"\nLocal ranking picked: {winner['title']}")
+        relevant_markets = [winner]
+    else:
+        print(f"\nAnalyzing market relevance of top {len(candidates)} markets...")
+        with stage("relevance"):
+            llm_response = analyze_market_relevance(
+                user_query, [{"title": m["title"], "index": m["index"]} for m in candidates]
+            )
         
         # Handle the response as a list
         relevant_titles = llm_response if isinstance(llm_response, list) else []
         
-        # Match the returned titles with our market_titles list
+        # Match the returned titles to cards, tolerating case and small edits
+        relevant_markets = []
         for title in relevant_titles:
-            for market in market_titles:
-                if title.lower().strip() == market["title"].lower().strip():
-                    relevant_markets.append(market)
-                    break
+            market = market_index.lookup(title) if isinstance(title, str) else None
+            if market and market not in relevant_markets:
+                relevant_markets.append(market)
+    
+    if not relevant_markets:
+        print("No relevant markets found")
+        print("Available market titles were:", [m["title"] for m in market_titles])
+        return
         
-        if not relevant_markets:
-            print("No relevant markets found")
-            print("Available market titles were:", [m["title"] for m in market_titles])
-            return
-            
-        print(f"\nFound {len(relevant_markets)} relevant markets:")
-        for market in relevant_markets:
-            print(f"- {market['title']}")
+    print(f"\nFound {len(relevant_markets)} relevant markets:")
+    for market in relevant_markets:
+        print(f"- {market['title']}")
+    
+    # Fetch relevant market pages concurrently, in relevance order
+    results = []
+    with stage("details", markets=len(relevant_markets)) as span:
+        fetched = backend.fetch_markets(relevant_markets, DETAIL_CONCURRENCY)
+        span.set(fetched=sum(1 for details in fetched if details))
+    for details in fetched:
+        if not details:
+            continue
         
-        # Process relevant markets
-        results = []
-        for market in relevant_markets:
-            try:
-                # Click on the market card
-                if not click_market_card(driver, market['index']):
-                    continue
-                
-                # Extract market details
-                details = extract_market_details(driver, driver)
-                if not details:
-                    continue
-                
-                # Extract outcomes
-                outcomes = extract_outcome_data(driver, driver)
-                details['outcomes'] = outcomes
-                
-                results.append(details)
-                print(f"\nProcessed market: {details['title']}")
-                
-                # Go back to search results
-                driver.back()
-                time.sleep(3)
-                
-            except Exception as e:
-                print(f"Error processing market card: {str(e)}")
-                driver.get(search_url)
-                time.sleep(3)
-                continue
+        results.append(details)
+        print(f"\nProcessed market: {details['title']}")
+    
+    # Step 3: Compute the numbers locally, then final analysis using Nemotron
+    print("\nPerforming final analysis...")
+    with tracer.span("metrics"):
+        metrics = compute_metrics(results)
+    with stage("final_analysis"):
+        analysis = analyze_final(user_query, results, metrics, on_section)
+    
+    if not analysis:
+        print("Failed to generate final analysis")
+        return None
+    
+    return {
+        "query": user_query,
+        "search_keywords": search_keywords,
+        "market_details": results,
+        "metrics": metrics,
+        "analysis": analysis
+    }
+
+def main(user_query="starship launches in 2024", stream=False, stream_output=None):
+    """Analyze one query and save the results to market_analysis.json.
+
+    ``stream`` prints analysis sections as they are generated and
+    ``stream_output`` appends them to an NDJSON file.
+    """
+    backend = None
+    sink = NdjsonSink(stream_output) if stream_output else None
+    callbacks = [cb for cb in (print_section if stream else None, sink) if cb]
+    try:
+        backend = open_backend()
+        final_results = run_query(user_query, backend, fan_out(*callbacks) if callbacks else None)
+        if not final_results:
+            return None
         
-        # Step 3: Final analysis using Nemotron
-        print("\nPerforming final analysis...")
-        analysis = analyze_final(user_query, results)
+        output_file = 'market_analysis.json'
+        with open(output_file, 'w') as f:
+            json.dump(final_results, f, indent=4)
+        print(f"\nResults saved to {output_file}")
         
-        if analysis:
-            final_results = {
-                "query": user_query,
-                "search_keywords": search_keywords,
-                "market_details": results,
-                "analysis": analysis
-            }
-            
-            output_file = 'market_analysis.json'
-            with open(output_file, 'w') as f:
-                json.dump(final_results, f, indent=4)
-            print(f"\nResults saved to {output_file}")
-            
-            # Print analysis summary in paragraphs
+        # Print analysis summary in paragraphs, unless it was already streamed
+        if not stream:
+            analysis = final_results["analysis"]
             print("\nAnalysis Summary:")
-            print("\n" + analysis['bet_description'])
-            print("\n" + analysis['probabilities'])
-            print("\n" + analysis['volume_and_liquidity'])
-            print("\n" + analysis['opportunities'])
-            print("\n" + analysis['risks'])
-            print("\n" + analysis['additional_info'])
-            print("\n" + analysis['summary'])
-            
-            return final_results
-        else:
-            print("Failed to generate final analysis")
-            return None
+            for key in SECTION_KEYS:
+                if analysis.get(key):
+                    print("\n" + str(analysis[key]))
+        
+        return final_results
         
     except Exception as e:
         print(f"Error in main: {str(e)}")
         return None
     finally:
-        if driver:
-            driver.quit()
+        if backend:
+            backend.close()
+        if sink:
+            sink.close()
+        if readiness.report():
+            print("\n" + readiness.report())
+        print(llm_cache.report())
+        print(snapshot_store.report())
+
+def write_trace(trace_file=None, metrics_file=None):
+    """Write the run's spans and counters if tracing was requested."""
+    trace_file = trace_file or TRACE_FILE
+    metrics_file = metrics_file or METRICS_FILE
+    if trace_file:
+        tracer.write_json(trace_file)
+        print(f"Trace saved to {trace_file}")
+    if metrics_file:
+        tracer.write_prometheus(metrics_file)
+        print(f"Metrics saved to {metrics_file}")
+
+def read_queries(path):
+    """Yield ``{"id", "query"}`` items from a JSONL file.
+
+    Each line is either a JSON string or an object with a ``query`` (or
+    ``title``) field and an optional ``id`` (or ``request_id``).
+    """
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"query": item}
+            query = item.get("query") or item.get("title")
+            if not query:
+                debug(f"Skipping line {line_no} of {path}: no query")
+                continue
+            yield {"id": item.get("id") or item.get("request_id") or line_no, "query": query}
+
+def run_batch(input_path, output_path, workers=2, max_uses=20):
+    """Run every query in ``input_path`` on a pool of warm WebDrivers.
+
+    One JSON line per query is appended to ``output_path`` as soon as it
+    finishes; throughput is printed at the end.
+    """
+    queries = list(read_queries(input_path))
+    pool = DriverPool(size=workers, max_uses=max_uses, origins=[POLYMARKET_URL])
+    # One session for every query, so HTTP fetches reuse their connections
+    session = make_session(pool_size=max(10, workers * 4))
+    
+    # Extract every query's keyword up front with concurrent LLM calls
+    print(f"Transforming {len(queries)} queries to keywords...")
+    for item, keywords in zip(queries, transform_queries_to_keywords([item["query"] for item in queries])):
+        item["keywords"] = keywords
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "failed": 0}
+
+    def process(item):
+        started = time.perf_counter()
+        record = {"id": item["id"], "query": item["query"]}
+        backend = open_backend(pool=pool, session=session)
+        try:
+            result = run_query(item["query"], backend, search_keywords=item["keywords"])
+            record["status"] = "ok" if result else "failed"
+            record["result"] = result
+        except Exception as e:
+            print(f"Error in query {item['id']}: {str(e)}")
+            record["status"] = "failed"
+            record["error"] = str(e)
+        finally:
+            backend.close()
+        record["elapsed_s"] = round(time.perf_counter() - started, 3)
+        with write_lock:
+            counts[record["status"]] += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+    started = time.perf_counter()
+    try:
+        with open(output_path, "w") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(process, queries))
+    finally:
+        snapshot_store.drain()
+        session.close()
+        pool.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"\nProcessed {len(queries)} queries in {elapsed:.1f}s "
+          f"({len(queries) / elapsed if elapsed else 0:.2f} queries/s): "
+          f"{counts['ok']} ok, {counts['failed']} failed")
+    print(f"Drivers started: {pool.created}, recycled: {pool.recycled}")
+    if readiness.report():
+        print(readiness.report())
+    print(llm_cache.report())
+    print(snapshot_store.report())
+    print(f"Results saved to {output_path}")
+    return counts
 
 if __name__ == "__main__":
-    results = main()
-    if results:
-        print("\nFinal Results:", json.dumps(results, indent=2)) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze Polymarket markets for a query")
+    parser.add_argument("query", nargs="?", default="starship launches in 2024")
+    parser.add_argument("--batch", metavar="JSONL", help="run every query in a JSONL file")
+    parser.add_argument("--output", default="results.jsonl", help="batch results file")
+    parser.add_argument("--workers", type=int, default=2, help="concurrent queries and warm browsers")
+    parser.add_argument("--max-uses", type=int, default=20, help="queries per browser before it is recycled")
+    parser.add_argument("--stream", action="store_true", help="print analysis sections as they are generated")
+    parser.add_argument("--stream-output", metavar="NDJSON", help="append streamed analysis sections to a file")
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached LLM responses (fresh ones are still stored)")
+    parser.add_argument("--trace", metavar="JSON", help="write per-stage timing spans to a file")
+    parser.add_argument("--metrics", metavar="PROM", help="write counters and stage timings in Prometheus text format")
+    args = parser.parse_args()
+    
+    if args.no_cache:
+        llm_cache.bypass = True
+    if args.trace or args.metrics:
+        tracer.enabled = True
+
+    try:
+        if args.batch:
+            run_batch(args.batch, args.output, args.workers, args.max_uses)
+        else:
+            results = main(args.query, args.stream, args.stream_output)
+            if results:
+                print("\nFinal Results:", json.dumps(results, indent=2))
+    finally:
+        write_trace(args.trace, args.metrics)
@@ -0,0 +1,118 @@
+"""Numeric representation of scraped market data.
+
+The scrapers return display strings such as ``"$592,563 Vol."``, ``"96%"``
+and ``"Buy Yes 97.0¢"``. These helpers parse them once into slotted
+records and column arrays so probabilities and prices can be computed
+locally instead of being left to the LLM.
+"""
+import math
+import re
+from array import array
+from dataclasses import dataclass
+
+NAN = float("nan")
+
+_NUMBER_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([kmb])?", re.IGNORECASE)
+_SCALE = {"k": 1e3, "m": 1e6, "b": 1e9}
+
+def parse_money(text):
+    """``"$592,563 Vol."`` -> 592563.0, ``"$1.2m Vol."`` -> 1200000.0."""
+    if not text:
+        return None
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    return value * _SCALE.get((match.group(2) or "").lower(), 1)
+
+def parse_percentage(text):
+    """``"96%"`` -> 0.96; ``"<1%"`` and ``">99%"`` map to 0.005 and 0.995."""
+    if not text:
+        return None
+    match = re.search(r"([<>])?\s*(\d+(?:\.\d+)?)\s*%", text)
+    if not match:
+        return None
+    value = float(match.group(2)) / 100
+    if match.group(1) == "<":
+        return value / 2
+    if match.group(1) == ">":
+        return (value + 1) / 2
+    return value
+
+def parse_cents(text):
+    """``"Buy Yes 97.0¢"`` -> 0.97."""
+    if not text:
+        return None
+    match = re.search(r"(\d+(?:\.\d+)?)\s*¢", text)
+    return float(match.group(1)) / 100 if match else None
+
+@dataclass(slots=True)
+class ParsedOutcome:
+    title: str
+    volume: float | None
+    probability: float | None
+    buy_yes: float | None
+    buy_no: float | None
+
+@dataclass(slots=True)
+class ParsedMarket:
+    title: str
+    volume: float | None
+    end_date: str | None
+    outcomes: list
+
+    @property
+    def is_multi_outcome(self):
+        return len(self.outcomes) > 1
+
+    def columns(self):
+        return OutcomeColumns.from_outcomes(self.outcomes)
+
+class OutcomeColumns:
+    """Outcome fields as parallel ``array('d')`` columns, NaN where missing."""
+
+    __slots__ = ("titles", "volume", "probability", "buy_yes", "buy_no")
+
+    def __init__(self, titles, volume, probability, buy_yes, buy_no):
+        self.titles = titles
+        self.volume = volume
+        self.probability = probability
+        self.buy_yes = buy_yes
+        self.buy_no = buy_no
+
+    @classmethod
+    def from_outcomes(cls, outcomes):
+        def column(name):
+            return array("d", (NAN if getattr(o, name) is None else getattr(o, name) for o in outcomes))
+
+        return cls(
+            [o.title for o in outcomes],
+            column("volume"),
+            column("probability"),
+            column("buy_yes"),
+            column("buy_no"),
+        )
+
+    def __len__(self):
+        return len(self.titles)
+
+def parse_outcome(outcome):
+    return ParsedOutcome(
+        title=outcome.get("title"),
+        volume=parse_money(outcome.get("volume")),
+        probability=parse_percentage(outcome.get("percentage")),
+        buy_yes=parse_cents(outcome.get("buy_yes_price")),
+        buy_no=parse_cents(outcome.get("buy_no_price")),
+    )
+
+def parse_market(details):
+    """Parse a scraped details dict (with ``outcomes``) into a ParsedMarket."""
+    return ParsedMarket(
+        title=details.get("title"),
+        volume=parse_money(details.get("volume")),
+        end_date=details.get("end_date"),
+        outcomes=[parse_outcome(o) for o in details.get("outcomes") or []],
+    )
+
+def is_missing(value):
+    return value is None or math.isnan(value)
@@ -0,0 +1,36 @@
+"""CSS selectors for the Polymarket pages scraped by the app.
+
+Kept in one place so the per-selector Selenium path and the bulk
+JavaScript extraction read the exact same DOM locations.
+"""
+
+# Search results page
+SEARCH_CARDS = "div:nth-child(1) > div:nth-child(3) > main:nth-child(3) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > div:nth-child(4) > div:nth-child(1) > div"
+CARD_TITLE = "div:nth-child(1) > div:nth-child(2) > a:nth-child(1) > p:nth-child(1)"
+CARD_LINK = "div:nth-child(1) > div:nth-child(2) > a:nth-child(1)"
+CARD_TITLE_BY_INDEX = "body > div:nth-child(1) > div:nth-child(3) > main:nth-child(3) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > div:nth-child(4) > div:nth-child(1) > div:nth-child({card_index}) > div:nth-child(1) > div:nth-child(2) > a:nth-child(1) > p:nth-child(1)"
+
+# Market page header
+MARKET_TITLE = ".c-dqzIym.c-gYmnSl.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-dxJWYY-weight-bold"
+MARKET_VOLUME = ".c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-hzzdKO-size-md.c-dqzIym-iUwoCw-css"
+MARKET_END_DATE = "p.c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-hzzdKO-size-md.c-dqzIym-idjDWCM-css.c-PJLV span"
+
+# Multi-outcome market rows, relative to OUTCOME_ROW (first row is nth-child(3))
+OUTCOMES_BASE = "body > div:nth-child(1) > div:nth-child(3) > main:nth-child(3) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) > div:nth-child(2)"
+OUTCOME_ROW = OUTCOMES_BASE + " > div:nth-child({outcome_index})"
+FIRST_OUTCOME_INDEX = 3
+OUTCOME_FIELDS = {
+    "title": "div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1) > div:nth-child(1) > p:nth-child(1)",
+    "volume": "div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > p:nth-child(1)",
+    "percentage": "div:nth-child(2) > div:nth-child(1) > div:nth-child(2) > div:nth-child(2) > p:nth-child(1)",
+    "buy_yes": "div:nth-child(3) > div:nth-child(1)",
+    "buy_no": "div:nth-child(3) > div:nth-child(2)",
+}
+
+# Single-outcome (binary) market
+SINGLE_OUTCOME_FIELDS = {
+    "percentage": ".c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-idXFcBQ-css",
+    "type": ".c-dqzIym.c-dqzIym-fxyRaa-color-normal.c-dqzIym-cTvRMP-spacing-normal.c-dqzIym-jalaKP-weight-normal.c-dqzIym-euRFQq-size-sm.c-dqzIym-igYhVgt-css",
+    "buy_yes": ".c-gBrBnR.c-dETnmA.c-gBrBnR-iicKxNF-css",
+    "buy_no": ".c-gBrBnR.c-dETnmA.c-gBrBnR-iggWduY-css",
+}
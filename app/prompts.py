@@ -0,0 +1,170 @@
+"""Compact encoding of market data for the LLM prompts, within a token budget.
+
+Markets used to be embedded as indented JSON, repeating every key for
+every outcome. Here each market is one header line plus a ``|``-separated
+table of its outcomes, with the keys written once as the table header:
+
+    Market: How many SpaceX Starship launches reach space in 2024?
+    volume=592563 overround=0.025 end=Dec 31, 2024
+    outcome|prob|implied|yes|no|spread|volume|share|ret_yes|ret_no
+    4|0.96|0.9564|0.97|0.041|0.011|145048|0.2448|-0.0141|0.0641
+
+Token counts are estimated locally. When a prompt would exceed its budget
+the lowest-volume outcomes are dropped first and summarised in one
+``+N more`` line per market; each market's largest outcome always stays.
+"""
+import math
+import re
+
+from market_model import is_missing, parse_market
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Outcome table columns: (header, field in analytics.market_metrics outcomes)
+METRIC_COLUMNS = [
+    ("outcome", "title"),
+    ("prob", "displayed_probability"),
+    ("implied", "implied_probability"),
+    ("yes", "buy_yes"),
+    ("no", "buy_no"),
+    ("spread", "spread"),
+    ("volume", "volume"),
+    ("share", "volume_share"),
+    ("ret_yes", "expected_return_yes"),
+    ("ret_no", "expected_return_no"),
+]
+# Without metrics, the parsed scraped values
+PARSED_COLUMNS = [
+    ("outcome", "title"),
+    ("prob", "probability"),
+    ("yes", "buy_yes"),
+    ("no", "buy_no"),
+    ("volume", "volume"),
+]
+# Market header fields: (name, field in analytics.market_metrics)
+HEADER_FIELDS = [
+    ("volume", "volume"),
+    ("outcome_volume", "outcome_volume"),
+    ("unattributed_volume", "unattributed_volume"),
+    ("overround", "overround"),
+    ("probability_sum", "probability_sum"),
+]
+
+def estimate_tokens(text):
+    """Rough token count: one per short word or symbol, one per 4 letters of long words.
+
+    Close enough to the Llama and Gemma tokenizers for budgeting without
+    downloading either.
+    """
+    return sum(max(1, math.ceil(len(token) / 4)) for token in _TOKEN_RE.findall(text or ""))
+
+def format_value(value):
+    """Format a cell: "-" when missing, whole numbers from 1000 up, else 4 significant digits."""
+    if value is None or (isinstance(value, float) and is_missing(value)):
+        return "-"
+    if isinstance(value, (int, float)):
+        return f"{value:.0f}" if abs(value) >= 1000 else f"{value:.4g}"
+    # Cell separators and newlines inside titles would break the table
+    return " ".join(str(value).replace("|", "/").split())
+
+def fit(build, count, max_tokens):
+    """Return ``(text, dropped)`` for the smallest ``dropped`` whose ``build(dropped)`` fits.
+
+    ``build(k)`` must encode the items without the ``k`` least important
+    ones, for ``k`` from 0 to ``count``. Without ``max_tokens`` nothing is
+    dropped; when even ``build(count)`` is too long it is returned anyway.
+    """
+    text = build(0)
+    if max_tokens is None or count == 0 or estimate_tokens(text) <= max_tokens:
+        return text, 0
+    low, high = 1, count
+    while low < high:
+        middle = (low + high) // 2
+        if estimate_tokens(build(middle)) <= max_tokens:
+            high = middle
+        else:
+            low = middle + 1
+    return build(low), low
+
+def encode_titles(markets, max_tokens=None):
+    """Encode search cards as numbered titles, dropping the last ones to fit.
+
+    Returns ``(text, dropped)``; ``markets`` should be best first and the
+    first one is always kept.
+    """
+    titles = [format_value(market["title"]) for market in markets]
+
+    def build(dropped):
+        kept = titles[:len(titles) - dropped]
+        return "\n".join(f"{i}. {title}" for i, title in enumerate(kept, 1))
+
+    return fit(build, max(0, len(titles) - 1), max_tokens)
+
+def _market_table(details, metrics):
+    # Header values and outcome rows from the metrics, or parsed from the details
+    if metrics:
+        header = {name: metrics.get(field) for name, field in HEADER_FIELDS}
+        columns = METRIC_COLUMNS
+        outcomes = metrics["outcomes"]
+        title = metrics.get("title") or details.get("title")
+    else:
+        market = parse_market(details)
+        header = {"volume": market.volume}
+        columns = PARSED_COLUMNS
+        outcomes = [
+            {"title": o.title, "probability": o.probability, "buy_yes": o.buy_yes,
+             "buy_no": o.buy_no, "volume": o.volume}
+            for o in market.outcomes
+        ]
+        title = market.title
+    header["end"] = details.get("end_date")
+    rows = [[o.get(field) for _, field in columns] for o in outcomes]
+    return title, header, columns, rows
+
+def encode_markets(market_details, metrics=None, max_tokens=None):
+    """Encode markets as header lines plus outcome tables.
+
+    ``metrics`` (from analytics.compute_metrics, in the same order) supply
+    the table when given. Outcomes are dropped lowest volume first until
+    the text fits ``max_tokens``, keeping at least each market's largest
+    outcome. Returns ``(text, dropped_outcomes)``.
+    """
+    metrics = metrics or [None] * len(market_details)
+    tables = [_market_table(details, m) for details, m in zip(market_details, metrics)]
+
+    # Every outcome but each market's largest, lowest volume (or unknown) first
+    order = []
+    for i, (_, _, columns, rows) in enumerate(tables):
+        volume_at = [name for name, _ in columns].index("volume")
+        volumes = [(0.0 if is_missing(row[volume_at]) else row[volume_at], i, j) for j, row in enumerate(rows)]
+        order.extend(sorted(volumes)[:-1])
+    order.sort()
+
+    def build(dropped):
+        hidden = {(i, j) for _, i, j in order[:dropped]}
+        blocks = []
+        for i, (title, header, columns, rows) in enumerate(tables):
+            lines = [f"Market: {format_value(title)}"]
+            fields = " ".join(f"{name}={format_value(value)}" for name, value in header.items()
+                              if value is not None)
+            if fields:
+                lines.append(fields)
+            shown = [row for j, row in enumerate(rows) if (i, j) not in hidden]
+            if shown:
+                lines.append("|".join(name for name, _ in columns))
+                lines.extend("|".join(format_value(value) for value in row) for row in shown)
+            if len(shown) < len(rows):
+                lines.append(_summary(columns, [row for j, row in enumerate(rows) if (i, j) in hidden]))
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+    return fit(build, len(order), max_tokens)
+
+def _summary(columns, rows):
+    names = [name for name, _ in columns]
+    volume = sum(row[names.index("volume")] for row in rows if not is_missing(row[names.index("volume")]))
+    probabilities = [row[names.index("prob")] for row in rows if not is_missing(row[names.index("prob")])]
+    line = f"+{len(rows)} more lower-volume outcomes: volume={format_value(volume)}"
+    if probabilities:
+        line += f" prob_sum={format_value(sum(probabilities))}"
+    return line
@@ -0,0 +1,106 @@
+"""Local lexical ranking of search-result titles against the user's query.
+
+A BM25 index over the card titles of one search page lets the pipeline
+skip the relevance LLM call when one title clearly wins, and otherwise
+send only the best few candidates. The same index maps the titles the
+LLM returns back to cards, tolerating case, punctuation and small edits.
+"""
+import difflib
+import math
+import re
+from collections import Counter
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "before", "by", "for", "from",
+    "how", "in", "is", "it", "many", "of", "on", "or", "the", "this", "to",
+    "what", "when", "will", "with",
+}
+
+def normalize_title(title):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.findall(r"\w+", title.lower()))
+
+def _stem(token):
+    # Light suffix stripping so "launches" matches "launch" and "elections" "election"
+    for suffix in ("ches", "shes", "sses", "xes"):
+        if token.endswith(suffix):
+            return token[:-2]
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    return [_stem(t) for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+class MarketIndex:
+    """BM25 index and fuzzy title lookup over ``[{"title", ...}]`` cards."""
+
+    def __init__(self, markets, k1=1.2, b=0.75):
+        self.markets = list(markets)
+        self.k1 = k1
+        self.b = b
+        self._docs = [Counter(tokenize(m["title"])) for m in self.markets]
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0
+        document_frequency = Counter(term for doc in self._docs for term in doc)
+        n = len(self._docs)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+        self._by_title = {}
+        for market in self.markets:
+            self._by_title.setdefault(normalize_title(market["title"]), market)
+
+    def scores(self, query):
+        terms = set(tokenize(query))
+        scores = []
+        for doc, length in zip(self._docs, self._lengths):
+            score = 0.0
+            for term in terms & doc.keys():
+                tf = doc[term]
+                norm = self.k1 * (1 - self.b + self.b * length / (self._avg_length or 1))
+                score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def rank(self, query):
+        """Return ``[(score, market)]`` best first, ties kept in page order."""
+        scored = zip(self.scores(query), range(len(self.markets)), self.markets)
+        return [(score, market) for score, _, market in sorted(scored, key=lambda s: (-s[0], s[1]))]
+
+    def prerank(self, query, top_k=5, margin=1.5, min_coverage=0.5):
+        """Split the page into a clear winner or a short list for the LLM.
+
+        Returns ``(winner, candidates)``. ``winner`` is set when the best
+        title scores at least ``margin`` times the runner-up and contains at
+        least ``min_coverage`` of the query's terms; ``candidates`` holds
+        the ``top_k`` best titles with a non-zero score (or the first
+        ``top_k`` cards when nothing matches at all).
+        """
+        ranked = self.rank(query)
+        matching = [market for score, market in ranked if score > 0]
+        candidates = (matching or [market for _, market in ranked])[:top_k]
+        if not matching:
+            return None, candidates
+
+        best_score, best = ranked[0]
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+        terms = set(tokenize(query))
+        coverage = len(terms & set(tokenize(best["title"]))) / len(terms) if terms else 0
+        if best_score >= margin * runner_up and coverage >= min_coverage:
+            return best, candidates
+        return None, candidates
+
+    def lookup(self, title, cutoff=0.8):
+        """Return the card whose title matches ``title`` after normalisation.
+
+        Falls back to the closest title by edit similarity above ``cutoff``.
+        """
+        key = normalize_title(title)
+        if key in self._by_title:
+            return self._by_title[key]
+        close = difflib.get_close_matches(key, self._by_title.keys(), n=1, cutoff=cutoff)
+        return self._by_title[close[0]] if close else None
@@ -0,0 +1,249 @@
+"""Event-driven page readiness checks that replace fixed sleeps.
+
+Each named condition is a small script run in the page. The page is ready
+once the script returns a truthy value that stays unchanged for the
+condition's ``stable_ms``. Timeouts adapt to the load times observed for
+that condition, and every wait is recorded so slow pages show up in the
+stats instead of being hidden behind a sleep.
+"""
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import page_selectors as sel
+from tracing import debug, tracer
+
+@dataclass
+class Condition:
+    name: str
+    script: str
+    args: tuple = ()
+    stable_ms: int = 0
+    # Optional conditions often never hold (e.g. no more cards to load), so
+    # a miss is not counted as a timeout
+    optional: bool = False
+
+CONDITIONS = {
+    condition.name: condition
+    for condition in [
+        Condition(
+            "search_cards",
+            "return document.querySelectorAll(arguments[0]).length || null;",
+            args=(sel.SEARCH_CARDS,),
+            stable_ms=500,
+        ),
+        Condition(
+            # The last card differs from the one seen before scrolling
+            "more_search_cards",
+            """
+            var cards = document.querySelectorAll(arguments[0]);
+            if (!cards.length) return null;
+            var link = cards[cards.length - 1].querySelector(arguments[1]);
+            var url = link ? link.href : null;
+            return url && url !== arguments[2] ? url : null;
+            """,
+            args=(sel.SEARCH_CARDS, sel.CARD_LINK),
+            stable_ms=300,
+            optional=True,
+        ),
+        Condition(
+            "market_header",
+            "var el = document.querySelector(arguments[0]);"
+            "return el && el.textContent.trim() ? 1 : null;",
+            args=(sel.MARKET_TITLE,),
+        ),
+        Condition(
+            "outcome_rows",
+            """
+            var base = document.querySelector(arguments[0]);
+            var rows = 0;
+            if (base) {
+                for (var i = arguments[1] - 1; i < base.children.length; i++) {
+                    if (!base.children[i].querySelector(':scope > ' + arguments[2])) break;
+                    rows++;
+                }
+            }
+            if (rows) return 'multi:' + rows;
+            return document.querySelector(arguments[3]) ? 'single' : null;
+            """,
+            args=(
+                sel.OUTCOMES_BASE,
+                sel.FIRST_OUTCOME_INDEX,
+                sel.OUTCOME_FIELDS["title"],
+                sel.SINGLE_OUTCOME_FIELDS["percentage"],
+            ),
+            stable_ms=300,
+        ),
+        Condition(
+            "in_viewport",
+            "var r = arguments[0].getBoundingClientRect();"
+            "return r.bottom > 0 && r.top < window.innerHeight ? 1 : null;",
+        ),
+    ]
+}
+
+class Readiness:
+    """Waits for named conditions and learns a timeout for each of them.
+
+    Until ``min_samples`` waits have been seen for a condition it uses
+    ``default_timeout``; after that the timeout is ``timeout_factor`` times
+    the 95th percentile of recent successful waits, clamped to
+    ``[min_timeout, max_timeout]``. Timed-out waits are not learned, since
+    their duration is the timeout rather than a load time.
+    """
+
+    def __init__(self, conditions=CONDITIONS, poll_interval=0.1, default_timeout=15,
+                 min_timeout=2, max_timeout=30, timeout_factor=3, history=20, min_samples=3):
+        self.conditions = conditions
+        self.poll_interval = poll_interval
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self.history = history
+        self.min_samples = min_samples
+        self._samples = {}
+        self._waits = {}
+        self._lock = threading.Lock()
+
+    def timeout_for(self, name):
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        if len(samples) < self.min_samples:
+            return self.default_timeout
+        # Inclusive quantiles stay within the observed waits
+        p95 = statistics.quantiles(samples, n=20, method="inclusive")[-1] if len(samples) > 1 else samples[0]
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.timeout_factor))
+
+    def _record(self, condition, elapsed, ready):
+        name = condition.name
+        missed = not ready and condition.optional
+        with self._lock:
+            if ready:
+                self._samples.setdefault(name, deque(maxlen=self.history)).append(elapsed)
+            waits = self._waits.setdefault(name, {"count": 0, "timeouts": 0, "total_s": 0.0, "max_s": 0.0})
+            waits["count"] += 1
+            waits["timeouts"] += 0 if ready or missed else 1
+            waits["total_s"] += elapsed
+            waits["max_s"] = max(waits["max_s"], elapsed)
+
+    def wait(self, driver, name, *args, timeout=None):
+        """Block until condition ``name`` holds and return True, or False on timeout.
+
+        Extra ``args`` are passed to the condition script after its own.
+        """
+        condition = self.conditions[name]
+        timeout = timeout if timeout is not None else self.timeout_for(name)
+        with tracer.span(f"ready:{name}", timeout_s=round(timeout, 3)) as span:
+            ready = self._poll(driver, condition, args, timeout)
+            span.set(ready=ready)
+        if not ready and not condition.optional:
+            tracer.incr("timeouts_total", stage=f"ready:{name}")
+        return ready
+
+    def wait_tabs(self, driver, tab_args, name, timeout=None):
+        """Wait for condition ``name`` in several tabs at once.
+
+        ``tab_args`` maps window handles to the extra args for that tab's
+        condition script. The tabs are polled in turn, so their waits overlap
+        instead of adding up. Returns ``{handle: ready}``; the driver is left
+        on whichever tab was polled last.
+        """
+        condition = self.conditions[name]
+        timeout = timeout if timeout is not None else self.timeout_for(name)
+        results = {}
+        with tracer.span(f"ready:{name}", timeout_s=round(timeout, 3), tabs=len(tab_args)) as span:
+            start = time.monotonic()
+            deadline = start + timeout
+            # handle -> [last value, when it was first seen]
+            pending = {handle: [None, start] for handle in tab_args}
+            while pending:
+                for handle in list(pending):
+                    state = pending[handle]
+                    try:
+                        driver.switch_to.window(handle)
+                        value = driver.execute_script(condition.script, *condition.args, *tab_args[handle])
+                    except Exception:
+                        value = None
+                    now = time.monotonic()
+                    if not value:
+                        state[0] = None
+                        continue
+                    if value != state[0]:
+                        state[0], state[1] = value, now
+                    if (now - state[1]) * 1000 >= condition.stable_ms:
+                        del pending[handle]
+                        results[handle] = True
+                        self._record(condition, now - start, True)
+                if pending and time.monotonic() >= deadline:
+                    if not condition.optional:
+                        debug(f"Timed out after {timeout:.1f}s waiting for {name} in {len(pending)} tabs")
+                        tracer.incr("timeouts_total", len(pending), stage=f"ready:{name}")
+                    for handle in pending:
+                        results[handle] = False
+                        self._record(condition, time.monotonic() - start, False)
+                    break
+                if pending:
+                    time.sleep(self.poll_interval)
+            span.set(ready=sum(results.values()))
+        return results
+
+    def _poll(self, driver, condition, args, timeout):
+        name = condition.name
+        start = time.monotonic()
+        deadline = start + timeout
+        last_value = None
+        since = start
+        while True:
+            try:
+                value = driver.execute_script(condition.script, *condition.args, *args)
+            except Exception:
+                value = None  # Page is mid-navigation or the element went stale
+            now = time.monotonic()
+            if value:
+                if value != last_value:
+                    last_value = value
+                    since = now
+                if (now - since) * 1000 >= condition.stable_ms:
+                    self._record(condition, now - start, True)
+                    return True
+            else:
+                last_value = None
+            if now >= deadline:
+                if not condition.optional:
+                    debug(f"Timed out after {timeout:.1f}s waiting for {name}")
+                self._record(condition, now - start, False)
+                return False
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        """Return per-condition wait counts, timeouts and timings in seconds."""
+        with self._lock:
+            names = list(self._waits)
+            waits = {name: dict(self._waits[name]) for name in names}
+        return {
+            name: {
+                "count": w["count"],
+                "timeouts": w["timeouts"],
+                "mean_s": round(w["total_s"] / w["count"], 3),
+                "max_s": round(w["max_s"], 3),
+                "timeout_s": round(self.timeout_for(name), 3),
+            }
+            for name, w in waits.items()
+        }
+
+    def report(self):
+        lines = [
+            f"  {name}: {s['count']} waits, mean {s['mean_s']}s, max {s['max_s']}s, "
+            f"{s['timeouts']} timeouts, next timeout {s['timeout_s']}s"
+            for name, s in self.stats().items()
+        ]
+        return "Page readiness waits:\n" + "\n".join(lines) if lines else ""
+
+# Shared engine so every driver in the process learns from the same history
+readiness = Readiness()
+
+def wait_until(driver, name, *args, timeout=None):
+    return readiness.wait(driver, name, *args, timeout=timeout)
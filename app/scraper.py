@@ -0,0 +1,349 @@
+import os
+from dataclasses import dataclass
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
+
+import page_selectors as sel
+from readiness import wait_until
+from tracing import tracer
+
+# "normal" waits for the full page load on navigation, "eager" only for the DOM
+PAGE_LOAD_STRATEGY = os.getenv("PAGE_LOAD_STRATEGY", "normal")
+
+# "lean" starts Chrome without images, fonts, media or trackers and with a
+# smaller memory footprint (see setup_driver); "default" loads everything
+BROWSER_PROFILE = os.getenv("BROWSER_PROFILE", "default")
+
+# Requests blocked by the lean profile, as CDP URL patterns. Only text nodes
+# are read, so images, fonts, media and analytics are never needed.
+LEAN_BLOCKED_URLS = [
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*",
+    "*/_next/image*",
+    "*.woff*", "*.ttf*", "*.otf*",
+    "*.mp4*", "*.webm*", "*.mp3*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*segment.com*", "*segment.io*", "*mixpanel.com*", "*amplitude.com*",
+    "*hotjar.com*", "*intercom.io*", "*sentry.io*", "*datadoghq.com*",
+    "*facebook.net*", "*clarity.ms*",
+]
+# Comma-separated patterns blocked on top of LEAN_BLOCKED_URLS
+EXTRA_BLOCKED_URLS = [p.strip() for p in os.getenv("BLOCKED_URLS", "").split(",") if p.strip()]
+
+LEAN_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--mute-audio",
+    "--metrics-recording-only",
+    # Fewer renderer processes: tabs share them instead of one per site
+    "--renderer-process-limit=2",
+    "--disable-site-isolation-trials",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,site-per-process,IsolateOrigins",
+]
+
+@dataclass
+class Outcome:
+    title: str
+    volume: str
+    percentage: str
+    buy_yes_price: str
+    buy_no_price: str
+
+def get_element_text(driver, selector, timeout=15):
+    """Helper function to get element text safely"""
+    with tracer.span("selector_wait", selector=selector):
+        try:
+            element = WebDriverWait(driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+            )
+            return element.text.strip()
+        except Exception as e:
+            if isinstance(e, TimeoutException):
+                tracer.incr("timeouts_total", stage="selector_wait")
+            print(f"Error getting text for selector {selector}: {str(e)}")
+            return None
+
+def extract_market_details(driver, market_card):
+    """Extract title, volume, and end date from market card"""
+    try:
+        # Use the new selectors for market details
+        title = get_element_text(driver, sel.MARKET_TITLE)
+        volume = get_element_text(driver, sel.MARKET_VOLUME)
+        end_date = get_element_text(driver, sel.MARKET_END_DATE)
+
+        return {
+            "title": title,
+            "volume": volume,
+            "end_date": end_date
+        }
+    except Exception as e:
+        print(f"Error extracting market details: {str(e)}")
+        return None
+
+def extract_outcome_data(driver, market_card):
+    """Extract outcome data using the working approach from test_scraper"""
+    try:
+        outcomes = []
+
+        # First try to find multiple outcomes
+        try:
+            # Original multiple outcomes logic
+            for outcome_index in range(sel.FIRST_OUTCOME_INDEX, sel.FIRST_OUTCOME_INDEX + 2):
+                try:
+                    outcome_base = sel.OUTCOME_ROW.format(outcome_index=outcome_index)
+
+                    # Construct selectors for each element
+                    selectors = {
+                        field: f"{outcome_base} > {relative}"
+                        for field, relative in sel.OUTCOME_FIELDS.items()
+                    }
+
+                    print(f"\nProcessing Outcome {outcome_index-2}")
+
+                    try:
+                        title_element = driver.find_element(By.CSS_SELECTOR, selectors["title"])
+                        driver.execute_script("arguments[0].scrollIntoView(true);", title_element)
+                        wait_until(driver, "in_viewport", title_element)
+                    except Exception as scroll_error:
+                        print(f"Scroll error: {scroll_error}")
+                        raise  # Propagate the error to trigger single outcome logic
+
+                    # Extract all data
+                    title = get_element_text(driver, selectors["title"])
+                    volume = get_element_text(driver, selectors["volume"])
+                    percentage = get_element_text(driver, selectors["percentage"])
+                    buy_yes = get_element_text(driver, selectors["buy_yes"])
+                    buy_no = get_element_text(driver, selectors["buy_no"])
+
+                    if title:
+                        outcome = Outcome(
+                            title=title,
+                            volume=volume,
+                            percentage=percentage,
+                            buy_yes_price=buy_yes,
+                            buy_no_price=buy_no
+                        )
+                        outcomes.append(outcome)
+                        print(f"Successfully extracted outcome {outcome_index-2}")
+
+                except Exception as e:
+                    print(f"Error processing outcome {outcome_index-2}: {str(e)}")
+                    raise  # Propagate the error to trigger single outcome logic
+
+        except Exception as multi_outcome_error:
+            print("Attempting to process single outcome case...")
+            # Single outcome selectors
+            single_selectors = sel.SINGLE_OUTCOME_FIELDS
+
+            # Get market title (reuse from market details)
+            title = get_element_text(driver, sel.MARKET_TITLE)
+            percentage = get_element_text(driver, single_selectors["percentage"])
+            outcome_type = get_element_text(driver, single_selectors["type"])
+            buy_yes = get_element_text(driver, single_selectors["buy_yes"])
+            buy_no = get_element_text(driver, single_selectors["buy_no"])
+
+            if title and percentage:
+                outcome = Outcome(
+                    title=title,
+                    volume="N/A",  # Volume doesn't apply for single outcome
+                    percentage=percentage,
+                    buy_yes_price=buy_yes,
+                    buy_no_price=buy_no
+                )
+                outcomes.append(outcome)
+                print("Successfully extracted single outcome")
+
+        return [vars(outcome) for outcome in outcomes]  # Convert dataclass instances to dicts
+
+    except Exception as e:
+        print(f"Error in outcome extraction: {str(e)}")
+        return []
+
+# Reads the market header and every outcome row in a single round trip.
+# Missing fields are reported by path instead of being waited on.
+EXTRACT_MARKET_JS = """
+var sel = arguments[0];
+var missing = [];
+
+function text(root, css) {
+    var el = root.querySelector(css);
+    if (!el) return null;
+    var value = (el.innerText || el.textContent || '').trim();
+    return value || null;
+}
+
+function field(root, css, path) {
+    var value = text(root, css);
+    if (value === null) missing.push(path);
+    return value;
+}
+
+var result = {
+    title: field(document, sel.market_title, 'title'),
+    volume: field(document, sel.market_volume, 'volume'),
+    end_date: field(document, sel.market_end_date, 'end_date'),
+    outcomes: [],
+    layout: null,
+    missing: missing
+};
+
+var base = document.querySelector(sel.outcomes_base);
+var rows = base ? base.children : [];
+for (var i = sel.first_outcome_index - 1; i < rows.length; i++) {
+    var row = rows[i];
+    // The outcome list ends at the first child that is not an outcome row
+    if (text(row, ':scope > ' + sel.outcome_fields.title) === null) break;
+    var path = 'outcomes[' + result.outcomes.length + ']';
+    result.outcomes.push({
+        title: field(row, ':scope > ' + sel.outcome_fields.title, path + '.title'),
+        volume: field(row, ':scope > ' + sel.outcome_fields.volume, path + '.volume'),
+        percentage: field(row, ':scope > ' + sel.outcome_fields.percentage, path + '.percentage'),
+        buy_yes_price: field(row, ':scope > ' + sel.outcome_fields.buy_yes, path + '.buy_yes_price'),
+        buy_no_price: field(row, ':scope > ' + sel.outcome_fields.buy_no, path + '.buy_no_price')
+    });
+}
+
+if (result.outcomes.length) {
+    result.layout = 'multi';
+} else {
+    var single = sel.single_outcome_fields;
+    var percentage = field(document, single.percentage, 'outcomes[0].percentage');
+    if (result.title && percentage) {
+        result.layout = 'single';
+        result.outcomes.push({
+            title: result.title,
+            volume: 'N/A',
+            percentage: percentage,
+            buy_yes_price: field(document, single.buy_yes, 'outcomes[0].buy_yes_price'),
+            buy_no_price: field(document, single.buy_no, 'outcomes[0].buy_no_price')
+        });
+    }
+}
+
+return result;
+"""
+
+BULK_SELECTORS = {
+    "market_title": sel.MARKET_TITLE,
+    "market_volume": sel.MARKET_VOLUME,
+    "market_end_date": sel.MARKET_END_DATE,
+    "outcomes_base": sel.OUTCOMES_BASE,
+    "first_outcome_index": sel.FIRST_OUTCOME_INDEX,
+    "outcome_fields": sel.OUTCOME_FIELDS,
+    "single_outcome_fields": sel.SINGLE_OUTCOME_FIELDS,
+}
+
+def extract_market_bulk(driver, timeout=15, poll_frequency=0.25):
+    """Extract market details and all outcomes with one execute_script call.
+
+    The script is re-run only while the page header has not rendered yet, so a
+    ready page costs a single round trip. Returns ``(details, missing)`` where
+    ``details`` has the same shape as ``extract_market_details`` plus an
+    ``outcomes`` list, and ``missing`` lists the fields that were not found.
+    """
+    last = {}
+
+    def header_rendered(d):
+        last.update(d.execute_script(EXTRACT_MARKET_JS, BULK_SELECTORS) or {})
+        return bool(last.get("title"))
+
+    with tracer.span("extract_bulk") as span:
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(header_rendered)
+        except TimeoutException:
+            tracer.incr("timeouts_total", stage="extract_bulk")
+            print(f"Market header not rendered after {timeout}s, returning partial data")
+        except Exception as e:
+            print(f"Error in bulk extraction: {str(e)}")
+            return None, ["page"]
+        span.set(outcomes=len(last.get("outcomes", [])), missing=len(last.get("missing", [])))
+
+    missing = last.get("missing", [])
+    details = {
+        "title": last.get("title"),
+        "volume": last.get("volume"),
+        "end_date": last.get("end_date"),
+        "outcomes": last.get("outcomes", []),
+    }
+    return details, missing
+
+def setup_driver(page_load_strategy=None, profile=None, log_network=False):
+    """Setup Chrome driver with tablet-like dimensions in headless mode
+
+    ``page_load_strategy="eager"`` returns from navigation once the DOM is
+    parsed instead of waiting for every image and script; readiness
+    conditions then decide when the content we read is there.
+
+    ``profile="lean"`` (BROWSER_PROFILE by default) disables images, blocks
+    the LEAN_BLOCKED_URLS requests, defaults to the eager strategy and trims
+    Chrome's processes and background work. ``log_network`` keeps Chrome's
+    performance log so network traffic can be measured.
+    """
+    lean = (profile or BROWSER_PROFILE) == "lean"
+    chrome_options = Options()
+    chrome_options.page_load_strategy = page_load_strategy or ("eager" if lean else PAGE_LOAD_STRATEGY)
+
+    # Headless mode configuration
+    chrome_options.add_argument("--headless=new")  # New headless mode
+    chrome_options.add_argument("--window-size=820,1180")  # Tablet-like dimensions
+    chrome_options.add_argument("--disable-gpu")  # Required for some systems
+    chrome_options.add_argument("--no-sandbox")  # Required for some systems
+    chrome_options.add_argument("--disable-dev-shm-usage")  # Memory optimization
+    # Keep background tabs loading at full speed for parallel market fetches
+    chrome_options.add_argument("--disable-background-timer-throttling")
+    chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+    chrome_options.add_argument("--disable-renderer-backgrounding")
+
+    if lean:
+        for argument in LEAN_ARGUMENTS:
+            chrome_options.add_argument(argument)
+        # Images stay off in every tab, including ones opened before blocking applies
+        chrome_options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+    if log_network:
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    # Create and return the driver
+    driver = webdriver.Chrome(options=chrome_options)
+    if lean:
+        block_urls(driver, LEAN_BLOCKED_URLS + EXTRA_BLOCKED_URLS)
+    return driver
+
+def block_urls(driver, patterns):
+    """Block requests matching ``patterns`` in the driver's current tab.
+
+    CDP blocking is per tab: tabs opened later need their own call before
+    they navigate, so the patterns are kept on ``driver.blocked_urls``.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    driver.blocked_urls = patterns
+
+def click_market_card(driver, card_index):
+    """Click on a specific market card using precise CSS selector"""
+    try:
+        # Construct the selector for the specific card's title link
+        card_selector = sel.CARD_TITLE_BY_INDEX.format(card_index=card_index)
+
+        # Find and scroll to the element
+        card_element = driver.find_element(By.CSS_SELECTOR, card_selector)
+        driver.execute_script("arguments[0].scrollIntoView(true);", card_element)
+        wait_until(driver, "in_viewport", card_element)
+
+        # Click using JavaScript to avoid any overlay issues
+        driver.execute_script("arguments[0].click();", card_element)
+        wait_until(driver, "market_header")
+
+        return True
+    except Exception as e:
+        print(f"Error clicking market card {card_index}: {str(e)}")
+        return False
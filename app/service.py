@@ -0,0 +1,319 @@
+"""HTTP service that runs the analysis pipeline for many concurrent users.
+
+    python app/service.py --port 8080 --workers 4 --queue 16
+    curl -X POST localhost:8080/analyze -d '{"query": "starship launches in 2024"}'
+
+Queries run on a bounded worker pool that shares one LLM client, one HTTP
+session and a pool of warm browsers. At most ``workers + queue`` distinct
+queries are admitted at a time; beyond that requests get a 429 with a
+Retry-After header. A query that is already in flight is not run twice:
+identical requests wait for the same result. Pipeline stages can be capped
+separately (``--search-limit`` and friends), so slow browser work cannot
+starve the LLM calls or the other way round.
+
+``--offline`` starts the fixture site and the fake LLM server in-process and
+points the pipeline at them, so the service runs without network access.
+
+Endpoints:
+
+- ``POST /analyze`` with ``{"query": ...}`` (or ``GET /analyze?q=...``)
+- ``GET /health``: liveness and queue state
+- ``GET /stats``: admission counters as JSON
+- ``GET /metrics``: the tracer's Prometheus text
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class ServiceBusy(Exception):
+    """Raised when the queue is full and a query cannot be admitted."""
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+class AnalysisService:
+    """Admits queries onto a bounded worker pool with single-flight de-duplication.
+
+    ``run`` is called with the query text on a worker thread and its return
+    value becomes the result of every request for that query.
+    """
+
+    def __init__(self, run, workers=4, max_queue=16):
+        self.run = run
+        self.workers = workers
+        self.max_queue = max_queue
+        self.admitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.deduplicated = 0
+        self._pending = 0
+        self._inflight = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+
+    def submit(self, query):
+        """Return ``(future, shared)`` for ``query``; ``shared`` means it joined a running one.
+
+        Raises ServiceBusy when ``workers + max_queue`` queries are already admitted.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future, True
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ServiceBusy(f"{self._pending} queries already admitted")
+            future = Future()
+            self._inflight[key] = future
+            self._pending += 1
+            self.admitted += 1
+        self._executor.submit(self._run, key, query, future)
+        return future, False
+
+    def _run(self, key, query, future):
+        try:
+            result = self.run(query)
+        except Exception as e:
+            result = None
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._inflight.pop(key, None)
+                if result:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            running = min(self._pending, self.workers)
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": running,
+                "queued": self._pending - running,
+                "admitted": self.admitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "deduplicated": self.deduplicated,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service = None
+    request_timeout = 120
+    retry_after = 5
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _analyze(self, query):
+        if not isinstance(query, str) or not query.strip():
+            self._send_json(400, {"error": "expected a non-empty \"query\""})
+            return
+        started = time.perf_counter()
+        try:
+            future, shared = self.service.submit(query)
+        except ServiceBusy as e:
+            self._send_json(429, {"error": f"Too many queries in flight: {e}"},
+                            {"Retry-After": str(self.retry_after)})
+            return
+        try:
+            result = future.result(timeout=self.request_timeout)
+        except FutureTimeoutError:
+            self._send_json(504, {"error": f"No result after {self.request_timeout}s", "query": query})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": str(e), "query": query})
+            return
+        elapsed = round(time.perf_counter() - started, 3)
+        if not result:
+            self._send_json(422, {"status": "failed", "query": query, "shared": shared, "elapsed_s": elapsed})
+            return
+        self._send_json(200, {"status": "ok", "shared": shared, "elapsed_s": elapsed, "result": result})
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/analyze":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "body is not valid JSON"})
+            return
+        self._analyze(body.get("query") if isinstance(body, dict) else None)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        if path == "/analyze":
+            self._analyze(parse_qs(url.query).get("q", [None])[0])
+        elif path == "/health":
+            self._send_json(200, {"status": "ok", **self.service.stats()})
+        elif path == "/stats":
+            self._send_json(200, self.service.stats())
+        elif path == "/metrics":
+            from tracing import tracer
+            body = tracer.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_pipeline(backend_kind=None, browsers=2, max_uses=20, warm=True,
+                  llm_limit=0, search_limit=0, details_limit=0):
+    """Return ``(run, close)`` for the keyword -> analysis pipeline in main.py.
+
+    Every query shares main's LLM client, one pooled HTTP session and a pool
+    of ``browsers`` Chrome drivers, started up front when ``warm`` is set and
+    a Selenium backend is in use. The limits cap how many queries are in the
+    LLM stages (together), searching or fetching market pages at once; 0
+    leaves a stage uncapped.
+    """
+    # Imported late: main reads its endpoints from the environment at import time
+    import main
+    from backends import make_session
+    from driver_pool import DriverPool
+
+    backend_kind = backend_kind or main.SCRAPER_BACKEND
+    if llm_limit:
+        llm_slots = threading.BoundedSemaphore(llm_limit)
+        for name in ("keywords", "relevance", "final_analysis"):
+            main.stage_limits[name] = llm_slots
+    if search_limit:
+        main.stage_limits["search"] = threading.BoundedSemaphore(search_limit)
+    if details_limit:
+        main.stage_limits["details"] = threading.BoundedSemaphore(details_limit)
+
+    session = make_session(pool_size=max(10, browsers * 4))
+    pool = None
+    if backend_kind != "http":
+        pool = DriverPool(size=browsers, max_uses=max_uses, origins=[main.POLYMARKET_URL])
+        if warm:
+            print(f"Starting {browsers} browsers...")
+            pool.warm()
+
+    def run(query):
+        backend = main.open_backend(backend_kind, pool=pool, session=session)
+        try:
+            return main.run_query(query, backend)
+        finally:
+            backend.close()
+
+    def close():
+        main.snapshot_store.drain()
+        session.close()
+        if pool:
+            pool.close()
+
+    return run, close
+
+def make_server(run, host="127.0.0.1", port=0, workers=4, max_queue=16, request_timeout=120):
+    """Return an HTTP server for ``run``; ``server.service`` is its AnalysisService."""
+    service = AnalysisService(run, workers, max_queue)
+    handler = type("ConfiguredServiceHandler", (ServiceHandler,), {
+        "service": service,
+        "request_timeout": request_timeout,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    return server
+
+def start_service(run, **options):
+    """Serve ``run`` from a background thread and return the HTTP server.
+
+    ``options`` are passed to make_server. Call ``server.shutdown()`` when done.
+    """
+    server = make_server(run, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve market analyses over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="queries analyzed at the same time")
+    parser.add_argument("--queue", type=int, default=16, help="queries waiting for a worker before 429s")
+    parser.add_argument("--browsers", type=int, default=2, help="warm Chrome drivers shared by the workers")
+    parser.add_argument("--max-uses", type=int, default=20, help="queries per browser before it is recycled")
+    parser.add_argument("--backend", choices=["http", "selenium", "auto"], help="defaults to SCRAPER_BACKEND")
+    parser.add_argument("--llm-limit", type=int, default=0, help="queries in the LLM stages at once (0: no cap)")
+    parser.add_argument("--search-limit", type=int, default=0, help="queries searching at once (0: no cap)")
+    parser.add_argument("--details-limit", type=int, default=0, help="queries fetching market pages at once (0: no cap)")
+    parser.add_argument("--request-timeout", type=float, default=120, help="seconds a request waits for its result")
+    parser.add_argument("--offline", action="store_true", help="use the fixture site and the fake LLM server")
+    args = parser.parse_args()
+
+    stubs = []
+    store_dir = None
+    if args.offline:
+        from fake_llm_server import start_fake_llm_server
+        from fixture_server import start_fixture_server
+        stubs = [start_fixture_server(), start_fake_llm_server(latency=0.2)]
+        os.environ["POLYMARKET_URL"] = stubs[0].base_url
+        os.environ["GLHF_BASE_URL"] = stubs[1].base_url
+        os.environ.setdefault("GLHF_API_KEY", "offline")
+        # Fixture markets use real slugs, so keep their snapshots and the
+        # fake completions out of the stores used against the real site
+        store_dir = tempfile.TemporaryDirectory()
+        os.environ["SNAPSHOT_PATH"] = os.path.join(store_dir.name, "snapshots.sqlite")
+        os.environ["LLM_CACHE_PATH"] = os.path.join(store_dir.name, "llm_cache.sqlite")
+        args.backend = args.backend or "http"
+
+    from tracing import tracer
+    tracer.enabled = True
+    tracer.keep_recent(100)  # /metrics only needs the counters
+
+    run, close = make_pipeline(
+        args.backend, args.browsers, args.max_uses,
+        llm_limit=args.llm_limit, search_limit=args.search_limit, details_limit=args.details_limit,
+    )
+    server = make_server(run, args.host, args.port, args.workers, args.queue, args.request_timeout)
+    print(f"Serving analyses on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+        close()
+        for stub in stubs:
+            stub.shutdown()
+        if store_dir:
+            store_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Local store of scraped market snapshots with freshness-aware reuse.
+
+The latest details of every market are kept in SQLite keyed by the market
+slug, with the time they were captured. SnapshotBackend wraps a scraper
+backend and, per market:
+
+- serves snapshots younger than ``fresh_for`` seconds without scraping,
+- serves snapshots up to ``fresh_for + stale_for`` seconds old as they are
+  and refreshes them in the background (stale-while-revalidate),
+- scrapes anything older, or never seen, before returning.
+
+Scrapes are single-flight: concurrent queries for the same market wait for
+one scrape instead of starting their own, so a popular market is scraped
+once per freshness window rather than once per query.
+
+Every capture whose numbers changed is also appended to a compact time
+series (one row per outcome, numbers only) that ``history`` returns per
+market.
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from backends import ScraperBackend
+from market_model import parse_market
+from ranking import normalize_title
+from tracing import debug, tracer
+
+def market_key(market):
+    """Slug of the market's URL, or its normalised title when it has no URL."""
+    if market.get("url"):
+        return urlparse(market["url"]).path.rstrip("/").rsplit("/", 1)[-1]
+    return normalize_title(market["title"])
+
+class SnapshotStore:
+    """SQLite store of the latest market details plus their numeric history."""
+
+    def __init__(self, path, fresh_for=60, stale_for=600):
+        self.path = path
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.hits = {"fresh": 0, "stale": 0, "miss": 0, "shared": 0}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._refresher = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS snapshots (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                details TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                captured_at REAL NOT NULL
+            )"""
+        )
+        # outcome is NULL for the market-level row
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS history (
+                key TEXT NOT NULL,
+                captured_at REAL NOT NULL,
+                outcome TEXT,
+                volume REAL,
+                probability REAL,
+                buy_yes REAL,
+                buy_no REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_key_time ON history (key, captured_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return ``(details, age_s)`` for the latest snapshot, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT details, captured_at FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def freshness(self, age):
+        """Classify a snapshot age as "fresh", "stale" or "expired"."""
+        if age <= self.fresh_for:
+            return "fresh"
+        if age <= self.fresh_for + self.stale_for:
+            return "stale"
+        return "expired"
+
+    def put(self, key, details, url=None, captured_at=None):
+        """Save ``details`` as the latest snapshot of ``key``.
+
+        A history point is only added when the details changed since the
+        previous capture.
+        """
+        captured_at = captured_at or time.time()
+        content = json.dumps(details, sort_keys=True)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM snapshots WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots (key, url, details, digest, captured_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, url, content, digest, captured_at),
+            )
+            if row is None or row[0] != digest:
+                market = parse_market(details)
+                rows = [(key, captured_at, None, market.volume, None, None, None)]
+                rows += [
+                    (key, captured_at, o.title, o.volume, o.probability, o.buy_yes, o.buy_no)
+                    for o in market.outcomes
+                ]
+                self._conn.executemany("INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def history(self, key, since=None):
+        """Return the captures of ``key`` oldest first.
+
+        Each point is ``{"captured_at", "volume", "outcomes": {title: {...}}}``
+        with the outcome's volume, probability and Yes/No prices.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT captured_at, outcome, volume, probability, buy_yes, buy_no FROM history "
+                "WHERE key = ? AND captured_at >= ? ORDER BY captured_at, rowid",
+                (key, since or 0),
+            ).fetchall()
+        points = []
+        for captured_at, outcome, volume, probability, buy_yes, buy_no in rows:
+            if not points or points[-1]["captured_at"] != captured_at:
+                points.append({"captured_at": captured_at, "volume": None, "outcomes": {}})
+            if outcome is None:
+                points[-1]["volume"] = volume
+            else:
+                points[-1]["outcomes"][outcome] = {
+                    "volume": volume,
+                    "probability": probability,
+                    "buy_yes": buy_yes,
+                    "buy_no": buy_no,
+                }
+        return points
+
+    def markets(self):
+        """Return ``{key: captured_at}`` for every stored market."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, captured_at FROM snapshots").fetchall())
+
+    def claim(self, key):
+        """Start a single-flight scrape of ``key``.
+
+        Returns ``(future, owner)``. The owner must call ``resolve``; everyone
+        else waits on the future for the owner's result.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def resolve(self, key, details, url=None):
+        """Store a finished scrape (None when it failed) and wake its waiters."""
+        if details:
+            self.put(key, details, url)
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(details)
+
+    def refresh(self, fn):
+        """Run ``fn`` on the store's background refresh threads."""
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="snapshot-refresh")
+            return self._refresher.submit(fn)
+
+    def drain(self):
+        """Wait for the background refreshes to finish and stop their threads.
+
+        Call this before closing the drivers or sessions the refreshes use; a
+        later ``refresh`` starts new threads.
+        """
+        with self._lock:
+            refresher, self._refresher = self._refresher, None
+        if refresher is not None:
+            refresher.shutdown(wait=True)
+
+    def record(self, state):
+        with self._lock:
+            self.hits[state] += 1
+        tracer.incr("snapshot_requests_total", state=state)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+            points = self._conn.execute("SELECT COUNT(*) FROM history WHERE outcome IS NULL").fetchone()[0]
+            return {**self.hits, "markets": entries, "history_points": points}
+
+    def report(self):
+        s = self.stats()
+        return (f"Snapshots: {s['fresh']} fresh, {s['stale']} stale, {s['miss']} scraped, "
+                f"{s['shared']} shared scrapes, {s['markets']} markets, {s['history_points']} history points")
+
+    def close(self):
+        self.drain()
+        with self._lock:
+            self._conn.close()
+
+class SnapshotBackend(ScraperBackend):
+    """Serves market details from a SnapshotStore, scraping with ``backend`` when needed.
+
+    Stale snapshots are refreshed on the store's background threads with a
+    backend from ``refresh_factory`` (the wrapped one may not be
+    thread-safe); without a factory they are scraped before returning, like
+    expired ones. The factory may return None when refreshing is no longer
+    possible, e.g. once the driver pool it borrows from is closed; the
+    stale snapshot is then served without a refresh.
+    """
+
+    def __init__(self, backend, store, refresh_factory=None):
+        self.backend = backend
+        self.store = store
+        self.refresh_factory = refresh_factory
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def search(self, keyword):
+        return self.backend.search(keyword)
+
+    def search_each(self, keywords, concurrency=4):
+        return self.backend.search_each(keywords, concurrency)
+
+    def fetch_market(self, market):
+        return self.fetch_markets([market], 1)[0]
+
+    def fetch_markets(self, markets, concurrency=4):
+        results = [None] * len(markets)
+        owned = []
+        waiting = []
+        for i, market in enumerate(markets):
+            key = market_key(market)
+            snapshot = self.store.get(key)
+            state = self.store.freshness(snapshot[1]) if snapshot else "expired"
+            if state == "stale" and self.refresh_factory is None:
+                state = "expired"
+            if state != "expired":
+                self.store.record(state)
+                debug(f"Serving {state} snapshot of {key} ({snapshot[1]:.0f}s old)")
+                results[i] = snapshot[0]
+                if state == "stale":
+                    self._revalidate(key, market)
+                continue
+            future, owner = self.store.claim(key)
+            self.store.record("miss" if owner else "shared")
+            (owned if owner else waiting).append((i, key, future))
+
+        if owned:
+            try:
+                fetched = self.backend.fetch_markets([markets[i] for i, _, _ in owned], concurrency)
+            except Exception as e:
+                print(f"Error fetching markets: {str(e)}")
+                fetched = [None] * len(owned)
+            for (i, key, _), details in zip(owned, fetched):
+                self.store.resolve(key, details, markets[i].get("url"))
+                results[i] = details
+        for i, key, future in waiting:
+            results[i] = future.result()
+        return results
+
+    def _revalidate(self, key, market):
+        backend = self.refresh_factory()
+        if backend is None:
+            debug(f"Not refreshing the snapshot of {key}")
+            return
+        future, owner = self.store.claim(key)
+        if not owner:
+            backend.close()
+            return  # Already being refreshed
+
+        def refresh():
+            details = None
+            try:
+                details = backend.fetch_market(market)
+            except Exception as e:
+                print(f"Error refreshing snapshot of {key}: {str(e)}")
+            finally:
+                backend.close()
+                self.store.resolve(key, details, market.get("url"))
+
+        self.store.refresh(refresh)
+
+    def close(self):
+        self.backend.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List stored markets or print one market's history")
+    parser.add_argument("key", nargs="?", help="market slug; omit to list every market")
+    parser.add_argument("--path", default=".snapshots.sqlite")
+    parser.add_argument("--since", type=float, help="only captures after this Unix time")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.path)
+    if args.key:
+        for point in store.history(args.key, args.since):
+            print(json.dumps(point))
+    else:
+        for key, captured_at in sorted(store.markets().items()):
+            print(f"{key}  last captured {time.time() - captured_at:.0f}s ago")
+    store.close()
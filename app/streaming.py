@@ -0,0 +1,203 @@
+"""Incremental parsing of the streamed final-analysis JSON.
+
+The final analysis is one JSON object, ``{"analysis": {"bet_description":
+"...", ...}}``. AnalysisStreamParser is fed the completion as it streams
+and hands back each section as soon as its value is complete, so a reader
+sees the bet description long before the summary has been generated.
+recover_json salvages answers wrapped in markdown fences or cut off
+mid-object instead of discarding them.
+"""
+import json
+import time
+
+SECTION_KEYS = (
+    "bet_description",
+    "probabilities",
+    "volume_and_liquidity",
+    "opportunities",
+    "risks",
+    "additional_info",
+    "summary",
+)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+class AnalysisStreamParser:
+    """Yields ``(key, value)`` pairs of the analysis object as they complete.
+
+    Works on the top-level object, descending into an ``"analysis"`` object
+    when the model wraps the sections in one (as the prompt asks). Text
+    before the first ``{``, such as a markdown fence, is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.sections = {}
+        self._pos = None
+        self._done = False
+
+    def _skip(self, chars):
+        while self._pos < len(self.buffer) and self.buffer[self._pos] in chars:
+            self._pos += 1
+
+    def feed(self, text):
+        """Add streamed text and return the sections it completed."""
+        self.buffer += text
+        completed = []
+        if self._done:
+            return completed
+        if self._pos is None:
+            start = self.buffer.find("{")
+            if start < 0:
+                return completed
+            self._pos = start + 1
+
+        while True:
+            self._skip(_WHITESPACE + ",")
+            if self._pos >= len(self.buffer):
+                return completed
+            if self.buffer[self._pos] == "}":
+                self._done = True
+                return completed
+            try:
+                key, key_end = _decoder.raw_decode(self.buffer, self._pos)
+            except json.JSONDecodeError:
+                return completed  # Key not fully streamed yet
+            value_start = key_end
+            while value_start < len(self.buffer) and self.buffer[value_start] in _WHITESPACE + ":":
+                value_start += 1
+            if value_start >= len(self.buffer):
+                return completed
+            if key == "analysis" and self.buffer[value_start] == "{":
+                self._pos = value_start + 1
+                continue
+            try:
+                value, value_end = _decoder.raw_decode(self.buffer, value_start)
+            except json.JSONDecodeError:
+                return completed  # Value not fully streamed yet
+            if not isinstance(value, (str, dict, list)) and (
+                value_end >= len(self.buffer) or self.buffer[value_end] not in _WHITESPACE + ",}"
+            ):
+                return completed  # A number or literal may still be growing, e.g. "0" of "0.5"
+            self._pos = value_end
+            self.sections[key] = value
+            completed.append((key, value))
+
+def strip_fences(text):
+    """Remove a surrounding ```json ... ``` markdown fence if present."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+def _close_truncated(text):
+    """Append the quotes and brackets a truncated JSON document is missing.
+
+    An object member cut off before its value (``"key"`` or ``"key":``) is
+    dropped, as is the dangling part of a number such as ``0.``.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    string_start = None
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            string_start = i
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if escaped:
+        text = text[:-1]
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip("-.").rstrip()
+    if stack and stack[-1] == "}":
+        member = text[:-1].rstrip() if text.endswith(":") else text
+        # A string right after "{" or "," in an object is a key without a value
+        if member.endswith('"') and string_start is not None:
+            before = text[:string_start].rstrip()
+            if before.endswith(("{", ",")):
+                text = before
+    text = text.rstrip().rstrip(",")
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+def recover_json(text):
+    """Parse ``text`` as JSON, tolerating markdown fences, surrounding prose
+    and truncation. Returns the parsed value, or None if nothing usable is left.
+    """
+    if not text:
+        return None
+    text = strip_fences(text)
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+    try:
+        value, _ = _decoder.raw_decode(text)
+        return value
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_close_truncated(text))
+    except json.JSONDecodeError:
+        return None
+
+def extract_analysis(result):
+    """Return the analysis sections from a parsed response, wrapped or not."""
+    if not isinstance(result, dict):
+        return None
+    if isinstance(result.get("analysis"), dict):
+        return result["analysis"]
+    if any(key in result for key in SECTION_KEYS):
+        return result
+    return None
+
+def print_section(key, value):
+    """Section callback that prints each section as it arrives."""
+    print(f"\n[{key}]\n{value}", flush=True)
+
+class NdjsonSink:
+    """Section callback that appends one JSON line per section to a file."""
+
+    def __init__(self, path_or_file):
+        if hasattr(path_or_file, "write"):
+            self._file = path_or_file
+            self._owns_file = False
+        else:
+            self._file = open(path_or_file, "a")
+            self._owns_file = True
+        self._started = time.perf_counter()
+
+    def __call__(self, key, value):
+        record = {
+            "section": key,
+            "content": value,
+            "elapsed_s": round(time.perf_counter() - self._started, 3),
+        }
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+def fan_out(*callbacks):
+    """Combine several section callbacks into one."""
+    def emit(key, value):
+        for callback in callbacks:
+            callback(key, value)
+    return emit
@@ -0,0 +1,251 @@
+"""Per-stage timing spans, counters and LLM token usage for a run.
+
+Spans nest per thread, so each query in a batch gets its own tree:
+
+    with tracer.span("search", keyword=keyword):
+        ...
+
+Work handed to a thread pool joins the submitting thread's tree when the
+function is wrapped with ``tracer.propagate`` before it is submitted.
+
+When the tracer is disabled ``span`` returns a shared no-op object and
+``incr``/``record_usage`` return immediately, so instrumented code costs a
+function call and an attribute check. Enabled, the run can be written as
+a JSON trace (``write_json``) and as Prometheus text (``write_prometheus``).
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "start", "duration", "children", "events", "error")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+        self.duration = None
+        self.children = []
+        self.events = []
+        self.error = None
+
+    def set(self, **attrs):
+        """Attach attributes discovered while the span is running."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        if stack:
+            stack[-1].children.append(self)
+        else:
+            with self.tracer._lock:
+                self.tracer.roots.append(self)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._stack().pop()
+        self.tracer._observe(self.name, self.duration, self.error is not None)
+        return False
+
+    def to_dict(self, origin):
+        data = {
+            "name": self.name,
+            "start_s": round(self.start - origin, 6),
+            "duration_s": round(self.duration, 6) if self.duration is not None else None,
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.error:
+            data["error"] = self.error
+        if self.events:
+            data["events"] = self.events
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+class Tracer:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.roots = deque()
+        self.counters = defaultdict(float)
+        self.durations = defaultdict(lambda: {"count": 0, "sum": 0.0, "max": 0.0, "errors": 0})
+        self._origin = time.perf_counter()
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _observe(self, name, duration, failed):
+        with self._lock:
+            d = self.durations[name]
+            d["count"] += 1
+            d["sum"] += duration
+            d["max"] = max(d["max"], duration)
+            d["errors"] += 1 if failed else 0
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def current(self):
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else None
+
+    def propagate(self, fn):
+        """Wrap ``fn`` so spans it opens on another thread nest under the current span."""
+        parent = self.current()
+        if parent is None:
+            return fn
+
+        def run(*args, **kwargs):
+            stack = self._stack()
+            stack.append(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stack.pop()
+
+        return run
+
+    def incr(self, name, value=1, **labels):
+        """Add ``value`` to the counter ``name`` with the given labels."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def record_usage(self, model, usage):
+        """Count prompt and completion tokens from an OpenAI ``usage`` object.
+
+        The tokens are added to the current span's totals, so a span around
+        several requests (a batch) carries their sum.
+        """
+        if not self.enabled or usage is None:
+            return
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        self.incr("llm_prompt_tokens_total", prompt, model=model)
+        self.incr("llm_completion_tokens_total", completion, model=model)
+        span = self.current()
+        if span is not None:
+            span.set(
+                prompt_tokens=span.attrs.get("prompt_tokens", 0) + prompt,
+                completion_tokens=span.attrs.get("completion_tokens", 0) + completion,
+            )
+
+    def keep_recent(self, count):
+        """Keep only the ``count`` most recent root spans, for long-running processes."""
+        with self._lock:
+            self.roots = deque(self.roots, maxlen=count)
+
+    def reset(self):
+        """Drop every recorded span and counter, e.g. after a warm-up run."""
+        with self._lock:
+            self.roots = deque(maxlen=self.roots.maxlen)
+            self.counters.clear()
+            self.durations.clear()
+
+    def to_dict(self):
+        with self._lock:
+            roots = list(self.roots)
+            counters = dict(self.counters)
+            durations = {name: dict(d) for name, d in self.durations.items()}
+        return {
+            "started_at": self._started_at,
+            "spans": [root.to_dict(self._origin) for root in roots],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+            "stages": durations,
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def prometheus_text(self):
+        """Render counters and per-stage durations in Prometheus text format."""
+        with self._lock:
+            counters = dict(self.counters)
+            durations = {name: dict(d) for name, d in self.durations.items()}
+
+        lines = []
+        by_name = defaultdict(list)
+        for (name, labels), value in sorted(counters.items()):
+            by_name[name].append((labels, value))
+        for name, series in by_name.items():
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        if durations:
+            lines.append("# TYPE stage_duration_seconds summary")
+            for stage, d in sorted(durations.items()):
+                label = _labels((("stage", stage),))
+                lines.append(f"stage_duration_seconds_sum{label} {d['sum']:.6f}")
+                lines.append(f"stage_duration_seconds_count{label} {d['count']}")
+            lines.append("# TYPE stage_duration_seconds_max gauge")
+            for stage, d in sorted(durations.items()):
+                lines.append(f"stage_duration_seconds_max{_labels((('stage', stage),))} {d['max']:.6f}")
+            lines.append("# TYPE stage_errors_total counter")
+            for stage, d in sorted(durations.items()):
+                lines.append(f"stage_errors_total{_labels((('stage', stage),))} {d['errors']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w") as f:
+            f.write(self.prometheus_text())
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+# Process-wide tracer; main.py enables it when a trace or metrics file is requested
+tracer = Tracer(enabled=bool(os.getenv("TRACE_FILE") or os.getenv("METRICS_FILE")))
+
+def debug_enabled():
+    # Read on each call so a DEBUG loaded from .env after import still counts
+    return os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+
+def debug(message):
+    """Print a DEBUG line when DEBUG is set and attach it to the current span."""
+    if debug_enabled():
+        print(f"DEBUG - {message}")
+    span = tracer.current()
+    if span is not None:
+        span.events.append({"t_s": round(time.perf_counter() - span.start, 6), "message": str(message)[:500]})
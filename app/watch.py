@@ -0,0 +1,234 @@
+"""Watch a fixed set of markets and re-analyze them only when they move.
+
+    python app/watch.py will-starship-flight-7-launch-before-2025 --interval 60
+    python app/watch.py --markets-file watched.txt --price-threshold 0.03 --feed events.ndjson
+
+Every poll scrapes the watched markets, records them in the snapshot
+store's history and diffs prices and volumes against the previous poll
+(a ``change`` event) and against the details the current analysis was
+based on. ``analyze_final`` runs again only when a difference crosses a
+threshold: an outcome's probability or Yes/No price moved by at least
+``--price-threshold``, a volume changed by at least ``--volume-threshold``
+(relative), or an outcome appeared or disappeared. Otherwise the previous
+analysis is kept, so LLM cost follows how often the markets change rather
+than how often they are polled.
+
+Markets are given as event URLs or slugs, one per line in
+``--markets-file``; a JSON line ``{"url": ..., "query": ...}`` also sets
+the question the analysis answers (the market title by default).
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass
+from urllib.parse import urljoin
+
+import main
+from analytics import compute_metrics
+from market_model import is_missing, parse_market
+from snapshot_store import market_key
+from tracing import tracer
+
+PRICE_FIELDS = ("probability", "buy_yes", "buy_no")
+
+@dataclass
+class Thresholds:
+    price: float = 0.02
+    volume: float = 0.10
+
+def _change(outcome, field, old, new):
+    return {"outcome": outcome, "field": field, "old": old, "new": new}
+
+def diff_markets(old, new):
+    """Return the numeric changes between two details dicts of one market.
+
+    ``outcome`` is None for market-level fields. Added and removed outcomes
+    are reported with ``field`` "added" or "removed".
+    """
+    old_market, new_market = parse_market(old), parse_market(new)
+    changes = []
+    if _differs(old_market.volume, new_market.volume):
+        changes.append(_change(None, "volume", old_market.volume, new_market.volume))
+
+    old_outcomes = {o.title: o for o in old_market.outcomes}
+    new_outcomes = {o.title: o for o in new_market.outcomes}
+    for title, outcome in new_outcomes.items():
+        previous = old_outcomes.get(title)
+        if previous is None:
+            changes.append(_change(title, "added", None, None))
+            continue
+        for field in PRICE_FIELDS + ("volume",):
+            before, after = getattr(previous, field), getattr(outcome, field)
+            if _differs(before, after):
+                changes.append(_change(title, field, before, after))
+    for title in old_outcomes.keys() - new_outcomes.keys():
+        changes.append(_change(title, "removed", None, None))
+    return changes
+
+def _differs(old, new):
+    if is_missing(old) or is_missing(new):
+        return is_missing(old) != is_missing(new)
+    return old != new
+
+def crosses(change, thresholds):
+    """True when ``change`` is large enough to warrant a new analysis."""
+    field, old, new = change["field"], change["old"], change["new"]
+    if field in ("added", "removed") or is_missing(old) or is_missing(new):
+        return True
+    # The epsilon keeps a move of exactly the threshold from losing to rounding
+    if field in PRICE_FIELDS:
+        return abs(new - old) >= thresholds.price - 1e-9
+    if not old:
+        return bool(new)
+    return abs(new - old) / old >= thresholds.volume - 1e-9
+
+def read_markets(path):
+    """Read watched markets from a file of URLs, slugs or JSON lines."""
+    markets = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            markets.append(json.loads(line) if line.startswith("{") else {"url": line})
+    return markets
+
+def normalize_market(market, base_url):
+    url = market["url"]
+    if not url.startswith(("http://", "https://")):
+        url = urljoin(base_url.rstrip("/") + "/", f"event/{url.strip('/')}")
+    return {**market, "url": url, "title": market.get("title") or url}
+
+class Watcher:
+    """Polls ``markets`` and keeps one analysis per market up to date.
+
+    Events are appended as JSON lines to ``feed`` (a path or file). With
+    ``state_path`` the analyses and their baselines survive restarts.
+    """
+
+    def __init__(self, markets, backend, thresholds=None, feed=None, state_path=None, concurrency=4):
+        self.markets = markets
+        self.backend = backend
+        self.thresholds = thresholds or Thresholds()
+        self.state_path = state_path
+        self.concurrency = concurrency
+        self.polls = 0
+        self.analyses = 0
+        self.reused = 0
+        self.state = {}
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as f:
+                self.state = json.load(f)
+        if feed is None or hasattr(feed, "write"):
+            self._feed = feed
+            self._owns_feed = False
+        else:
+            self._feed = open(feed, "a")
+            self._owns_feed = True
+
+    def emit(self, event_type, key, **fields):
+        event = {"type": event_type, "market": key, "at": round(time.time(), 3), **fields}
+        tracer.incr("watch_events_total", type=event_type)
+        if self._feed:
+            self._feed.write(json.dumps(event) + "\n")
+            self._feed.flush()
+        return event
+
+    def poll(self):
+        """Scrape every watched market once and re-analyze the ones that moved."""
+        self.polls += 1
+        with tracer.span("watch_poll", markets=len(self.markets)):
+            fetched = self.backend.fetch_markets(self.markets, self.concurrency)
+            for market, details in zip(self.markets, fetched):
+                self._update(market, details)
+        if self.state_path:
+            with open(self.state_path, "w") as f:
+                json.dump(self.state, f)
+
+    def _update(self, market, details):
+        key = market_key(market)
+        if not details:
+            self.emit("error", key, error="market could not be fetched")
+            return
+        main.snapshot_store.put(key, details, market["url"])
+        state = self.state.setdefault(key, {})
+
+        if state.get("last"):
+            changes = diff_markets(state["last"], details)
+            if changes:
+                self.emit("change", key, title=details["title"], changes=changes)
+        state["last"] = details
+
+        if state.get("baseline") and state.get("analysis"):
+            triggers = [c for c in diff_markets(state["baseline"], details) if crosses(c, self.thresholds)]
+            if not triggers:
+                self.reused += 1
+                return
+        else:
+            triggers = []
+
+        query = market.get("query") or details["title"]
+        analysis = main.analyze_final(query, [details], compute_metrics([details]))
+        if not analysis:
+            self.emit("error", key, error="analysis failed, keeping the previous one")
+            return
+        self.analyses += 1
+        state.update(baseline=details, analysis=analysis, analyzed_at=time.time())
+        self.emit("analysis", key, title=details["title"], query=query, triggers=triggers, analysis=analysis)
+        print(f"\n[{details['title']}] re-analyzed"
+              + (f" after {len(triggers)} changes over threshold" if triggers else ""))
+        print(analysis.get("summary", ""))
+
+    def run(self, interval=60, polls=None):
+        """Poll every ``interval`` seconds, ``polls`` times or until interrupted."""
+        next_poll = time.monotonic()
+        try:
+            while polls is None or self.polls < polls:
+                self.poll()
+                print(f"Poll {self.polls}: {self.analyses} analyses, {self.reused} reused so far")
+                if polls is not None and self.polls >= polls:
+                    break
+                next_poll += interval
+                time.sleep(max(0.0, next_poll - time.monotonic()))
+        except KeyboardInterrupt:
+            pass
+
+    def close(self):
+        if self._owns_feed:
+            self._feed.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch markets and re-analyze them when they move")
+    parser.add_argument("markets", nargs="*", help="event URLs or slugs")
+    parser.add_argument("--markets-file", help="file with one URL, slug or JSON object per line")
+    parser.add_argument("--interval", type=float, default=60, help="seconds between polls")
+    parser.add_argument("--polls", type=int, help="stop after this many polls")
+    parser.add_argument("--price-threshold", type=float, default=0.02,
+                        help="probability or price move (0-1) that triggers a new analysis")
+    parser.add_argument("--volume-threshold", type=float, default=0.10,
+                        help="relative volume change that triggers a new analysis")
+    parser.add_argument("--feed", default="watch_events.ndjson", help="NDJSON file for change events")
+    parser.add_argument("--state", help="JSON file keeping analyses across restarts")
+    args = parser.parse_args()
+
+    watched = [{"url": m} for m in args.markets]
+    if args.markets_file:
+        watched += read_markets(args.markets_file)
+    if not watched:
+        parser.error("give at least one market or --markets-file")
+    watched = [normalize_market(m, main.POLYMARKET_URL) for m in watched]
+
+    backend = main.create_backend(main.SCRAPER_BACKEND, main.POLYMARKET_URL, main.EXTRACTION_MODE)
+    watcher = Watcher(
+        watched, backend, Thresholds(args.price_threshold, args.volume_threshold),
+        feed=args.feed, state_path=args.state, concurrency=main.DETAIL_CONCURRENCY,
+    )
+    try:
+        watcher.run(args.interval, args.polls)
+    finally:
+        backend.close()
+        watcher.close()
+        print(f"\n{watcher.polls} polls, {watcher.analyses} analyses, {watcher.reused} reused")
+        print(main.llm_cache.report())
+        print(f"Events saved to {args.feed}")
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The app modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+# main needs an API key and opens its stores on import; keep them out of the repo
+_stores = tempfile.mkdtemp()
+os.environ.setdefault("GLHF_API_KEY", "test")
+os.environ.setdefault("SNAPSHOT_PATH", os.path.join(_stores, "snapshots.sqlite"))
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_stores, "llm_cache.sqlite"))
@@ -0,0 +1,66 @@
+import pytest
+
+from analytics import compute_metrics
+
+# Scraped details of app/fixtures/market_multi.html and market_single.html
+MULTI = {
+    "title": "How many SpaceX Starship launches reach space in 2024?",
+    "volume": "$592,563 Vol.",
+    "end_date": "Dec 31, 2024",
+    "outcomes": [
+        {"title": "2 or less", "volume": "$84,310 Vol.", "percentage": "<1%",
+         "buy_yes_price": "Buy Yes 0.4¢", "buy_no_price": "Buy No 99.7¢"},
+        {"title": "3", "volume": "$128,976 Vol.", "percentage": "1%",
+         "buy_yes_price": "Buy Yes 1.2¢", "buy_no_price": "Buy No 98.9¢"},
+        {"title": "4", "volume": "$145,048 Vol.", "percentage": "96%",
+         "buy_yes_price": "Buy Yes 97.0¢", "buy_no_price": "Buy No 4.1¢"},
+        {"title": "5+", "volume": "$234,229 Vol.", "percentage": "3%",
+         "buy_yes_price": "Buy Yes 3.9¢", "buy_no_price": "Buy No 98.1¢"},
+    ],
+}
+SINGLE = {
+    "title": "Will Starship Flight 7 launch before 2025?",
+    "volume": "$1,204,117 Vol.",
+    "end_date": "Dec 31, 2024",
+    "outcomes": [
+        {"title": "Will Starship Flight 7 launch before 2025?", "volume": "N/A", "percentage": "12% chance",
+         "buy_yes_price": "Buy Yes 12.5¢", "buy_no_price": "Buy No 88.1¢"},
+    ],
+}
+
+def test_multi_outcome_implied_probabilities_are_normalised_midpoints():
+    [metrics] = compute_metrics([MULTI])
+    # Midpoints (y + 1 - n) / 2 sum to 1.0085
+    implied = [o["implied_probability"] for o in metrics["outcomes"]]
+    assert implied == pytest.approx([0.0035 / 1.0085, 0.0115 / 1.0085, 0.9645 / 1.0085, 0.029 / 1.0085], abs=1e-4)
+    assert sum(implied) == pytest.approx(1, abs=1e-3)
+
+def test_multi_outcome_market_metrics():
+    [metrics] = compute_metrics([MULTI])
+    assert metrics["overround"] == pytest.approx(0.025)
+    assert metrics["outcome_volume"] == 592563
+    assert metrics["unattributed_volume"] == 0
+    assert metrics["probability_sum"] == pytest.approx(1.005)
+
+def test_multi_outcome_spreads_shares_and_returns():
+    [metrics] = compute_metrics([MULTI])
+    outcomes = {o["title"]: o for o in metrics["outcomes"]}
+    assert [o["spread"] for o in metrics["outcomes"]] == pytest.approx([0.001, 0.001, 0.011, 0.02])
+    assert outcomes["4"]["volume_share"] == pytest.approx(145048 / 592563, abs=1e-4)
+    assert sum(o["volume_share"] for o in metrics["outcomes"]) == pytest.approx(1, abs=1e-3)
+    assert outcomes["4"]["expected_return_yes"] == pytest.approx(0.9645 / 1.0085 / 0.97 - 1, abs=1e-4)
+    assert outcomes["4"]["expected_return_no"] == pytest.approx((1 - 0.9645 / 1.0085) / 0.041 - 1, abs=1e-4)
+
+def test_single_outcome_metrics():
+    [metrics] = compute_metrics([SINGLE])
+    [outcome] = metrics["outcomes"]
+    assert outcome["implied_probability"] == pytest.approx(0.122)
+    assert outcome["displayed_probability"] == pytest.approx(0.12)
+    assert outcome["spread"] == pytest.approx(0.006)
+    assert metrics["overround"] == pytest.approx(0.006)
+    assert metrics["volume"] == 1204117
+    # The outcome has no volume of its own, so nothing can be attributed
+    assert outcome["volume"] is None
+    assert outcome["volume_share"] is None
+    assert metrics["outcome_volume"] is None
+    assert metrics["unattributed_volume"] is None
@@ -0,0 +1,169 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from backends import (
+    BackendError,
+    FallbackBackend,
+    HttpBackend,
+    ScraperBackend,
+    SeleniumBackend,
+    merge_searches,
+    parse_next_data,
+)
+from fixture_server import start_fixture_server
+
+MULTI_SLUG = "how-many-spacex-starship-launches-reach-space-in-2024"
+SINGLE_SLUG = "will-starship-flight-7-launch-before-2025"
+
+@pytest.fixture(scope="module")
+def site():
+    server = start_fixture_server()
+    yield server.base_url
+    server.shutdown()
+
+@pytest.fixture
+def http(site):
+    backend = HttpBackend(site)
+    yield backend
+    backend.close()
+
+class StubBackend(ScraperBackend):
+    name = "stub"
+
+    def __init__(self, cards=(), details=None):
+        self.cards = cards if isinstance(cards, dict) else list(cards)
+        self.details = details
+        self.searched = []
+        self.fetched = []
+
+    def search(self, keyword):
+        self.searched.append(keyword)
+        if isinstance(self.cards, dict):
+            if keyword not in self.cards:
+                raise BackendError(f"no results page for {keyword}")
+            return self.cards[keyword]
+        return self.cards
+
+    def fetch_market(self, market):
+        self.fetched.append(market["url"])
+        return self.details
+
+class FailingBackend(ScraperBackend):
+    name = "failing"
+
+    def search(self, keyword):
+        raise BackendError("unreachable")
+
+    def fetch_market(self, market):
+        raise BackendError("unreachable")
+
+def test_search_reads_cards_from_page_data(http, site):
+    cards = http.search("starship")
+    assert [card["index"] for card in cards] == [1, 2, 3]
+    assert cards[0] == {
+        "title": "How many SpaceX Starship launches reach space in 2024?",
+        "index": 1,
+        "url": f"{site}/event/{MULTI_SLUG}",
+    }
+    assert cards[1]["title"] == "Will Starship Flight 7 launch before 2025?"
+    assert cards[1]["url"] == f"{site}/event/{SINGLE_SLUG}"
+
+def test_fetch_markets_keeps_order_and_formats_outcomes(http, site):
+    multi, single = http.fetch_markets(
+        [{"url": f"{site}/event/{MULTI_SLUG}"}, {"url": f"{site}/event/{SINGLE_SLUG}"}]
+    )
+    assert multi["title"] == "How many SpaceX Starship launches reach space in 2024?"
+    assert multi["volume"] == "$592,563 Vol."
+    assert multi["end_date"] == "Dec 31, 2024"
+    assert [o["title"] for o in multi["outcomes"]] == ["2 or less", "3", "4", "5+"]
+    assert multi["outcomes"][0] == {
+        "title": "2 or less", "volume": "$84,310 Vol.", "percentage": "<1%",
+        "buy_yes_price": "Buy Yes 0.4¢", "buy_no_price": "Buy No 99.7¢",
+    }
+
+    assert single["title"] == "Will Starship Flight 7 launch before 2025?"
+    assert single["volume"] == "$1,204,117 Vol."
+    assert single["outcomes"] == [{
+        "title": "Will Starship Flight 7 launch before 2025?", "volume": "N/A",
+        "percentage": "12% chance", "buy_yes_price": "Buy Yes 12.5¢", "buy_no_price": "Buy No 88.1¢",
+    }]
+
+def test_missing_page_raises_backend_error(http, site):
+    with pytest.raises(BackendError):
+        http.fetch_market({"url": f"{site}/event/no-such-market"})
+    assert http.fetch_markets([{"url": f"{site}/event/no-such-market"}]) == [None]
+
+def test_parse_next_data_requires_payload():
+    assert parse_next_data('<script id="__NEXT_DATA__" type="application/json">{"a": 1}</script>') == {"a": 1}
+    with pytest.raises(BackendError):
+        parse_next_data("<html></html>")
+    with pytest.raises(BackendError):
+        parse_next_data('<script id="__NEXT_DATA__">{not json</script>')
+
+def test_fallback_searches_secondary_when_primary_fails():
+    cards = [{"title": "Starship", "index": 1, "url": "http://example/event/starship"}]
+    secondary = StubBackend(cards)
+    backend = FallbackBackend(FailingBackend(), secondary)
+    assert backend.search("starship") == cards
+    assert secondary.searched == ["starship"]
+
+def test_fallback_fetches_only_failed_markets_from_secondary(http, site):
+    secondary = StubBackend(details={"title": "from secondary", "outcomes": []})
+    backend = FallbackBackend(http, secondary)
+    missing = f"{site}/event/no-such-market"
+    found, fallback = backend.fetch_markets([{"url": f"{site}/event/{SINGLE_SLUG}"}, {"url": missing}])
+    assert found["title"] == "Will Starship Flight 7 launch before 2025?"
+    assert fallback == {"title": "from secondary", "outcomes": []}
+    assert secondary.fetched == [missing]
+
+def test_fallback_fetch_market_uses_secondary_on_error():
+    secondary = StubBackend(details={"title": "from secondary", "outcomes": []})
+    backend = FallbackBackend(FailingBackend(), secondary)
+    assert backend.fetch_market({"url": "http://example/event/x"})["title"] == "from secondary"
+
+class CrashingDriver:
+    current_window_handle = "main"
+
+    def get(self, url):
+        raise WebDriverException("chrome not reachable")
+
+def card(title, index, url=None):
+    return {"title": title, "index": index, "url": url}
+
+def test_merge_searches_dedups_by_url_then_title_in_first_seen_order():
+    first = [card("Starship flight 7", 1, "https://x/event/flight-7"), card("Booster catch", 2)]
+    second = [
+        card("Starship Flight 7 (renamed)", 1, "https://x/event/flight-7"),
+        card("  booster CATCH ", 2),
+        card("Launches in 2024", 3, "https://x/event/launches"),
+    ]
+    merged = merge_searches([first, None, second])
+    assert [(c["title"], c["index"]) for c in merged] == [
+        ("Starship flight 7", 1), ("Booster catch", 2), ("Launches in 2024", 3),
+    ]
+    # Renumbered cards keep their position on their own search page
+    assert merged[2]["card_index"] == 3
+
+def test_search_many_skips_failing_keywords():
+    backend = StubBackend({"starship": [card("Starship flight 7", 1, "https://x/event/flight-7")]})
+    for concurrency in (1, 4):
+        merged = backend.search_many(["booster", "starship"], concurrency)
+        assert [c["title"] for c in merged] == ["Starship flight 7"]
+
+def test_selenium_search_wraps_webdriver_errors():
+    backend = SeleniumBackend(driver=CrashingDriver(), base_url="http://127.0.0.1:1")
+    with pytest.raises(BackendError, match="chrome not reachable"):
+        backend.search("starship")
+    assert backend.search_many(["starship", "booster"], concurrency=1) == []
+
+def test_fallback_searches_only_failed_keywords_and_keeps_keyword_order():
+    flight = card("Starship flight 7", 1, "https://x/event/flight-7")
+    booster = card("Booster catch", 1, "https://x/event/booster")
+    launches = card("Launches in 2024", 1, "https://x/event/launches")
+    primary = StubBackend({"starship": [flight], "launches": [launches], "tower": []})
+    secondary = StubBackend({"booster": [booster], "tower": [flight]})
+    backend = FallbackBackend(primary, secondary)
+    merged = backend.search_many(["starship", "booster", "tower", "launches"], concurrency=1)
+    assert sorted(secondary.searched) == ["booster", "tower"]
+    assert [c["title"] for c in merged] == ["Starship flight 7", "Booster catch", "Launches in 2024"]
+    assert [c["index"] for c in merged] == [1, 2, 3]
@@ -0,0 +1,47 @@
+import pytest
+
+from driver_pool import DriverPool, reset_driver
+
+class FakeDriver:
+    def __init__(self):
+        self.commands = []
+        self.url = "https://polymarket.com/markets?_q=starship"
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def get(self, url):
+        self.url = url
+
+    def quit(self):
+        self.url = None
+
+def test_reset_clears_storage_of_each_origin_through_cdp():
+    driver = FakeDriver()
+    reset_driver(driver, ["https://polymarket.com/markets", "http://127.0.0.1:8765"])
+    assert driver.commands == [
+        ("Network.clearBrowserCookies", {}),
+        ("Storage.clearDataForOrigin", {"origin": "https://polymarket.com", "storageTypes": "all"}),
+        ("Storage.clearDataForOrigin", {"origin": "http://127.0.0.1:8765", "storageTypes": "all"}),
+    ]
+    assert driver.url == "about:blank"
+
+def test_released_driver_is_reset_for_the_pool_origins():
+    pool = DriverPool(size=1, factory=FakeDriver, origins=["https://polymarket.com"])
+    with pool.driver() as driver:
+        pass
+    assert ("Storage.clearDataForOrigin", {"origin": "https://polymarket.com", "storageTypes": "all"}) in driver.commands
+    assert pool.acquire() is driver
+
+def test_driver_released_after_close_is_quit():
+    pool = DriverPool(size=1, factory=FakeDriver)
+    driver = pool.acquire()
+    pool.close()
+    pool.release(driver)
+    assert driver.url is None
+    assert pool._idle.empty()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,22 @@
+from llm_cache import LLMCache
+
+PROMPT = ("hf:model", "system", "user", 1)
+
+def test_cache_serves_stored_completion(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), endpoint="https://api.example/v1")
+    cache.put(*PROMPT, '{"keywords": ["starship"]}')
+    assert cache.get(*PROMPT) == '{"keywords": ["starship"]}'
+
+def test_cache_keeps_endpoints_apart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    stub = LLMCache(path, endpoint="http://127.0.0.1:8766/v1")
+    stub.put(*PROMPT, '{"keywords": ["fake"]}')
+    real = LLMCache(path, endpoint="https://api.example/v1")
+    assert real.get(*PROMPT) is None
+    assert stub.get(*PROMPT) == '{"keywords": ["fake"]}'
+
+def test_bypass_skips_lookups(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), bypass=True)
+    cache.put(*PROMPT, "{}")
+    assert cache.get(*PROMPT) is None
+    assert cache.stats()["entries"] == 1
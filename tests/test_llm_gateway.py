@@ -0,0 +1,131 @@
+import json
+import time
+
+import pytest
+
+import llm_gateway
+from fake_llm_server import start_fake_llm_server
+from llm_gateway import LLMError, LLMGateway
+from tracing import Tracer
+
+MESSAGES = [
+    {"role": "system", "content": "You are a search keyword extractor."},
+    {"role": "user", "content": "Query: starship launch"},
+]
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = Tracer(enabled=True)
+    monkeypatch.setattr(llm_gateway, "tracer", tracer)
+    return tracer
+
+@pytest.fixture
+def serve():
+    servers, gateways = [], []
+
+    def start(gateway_options=None, **server_options):
+        server = start_fake_llm_server(**server_options)
+        servers.append(server)
+        gateway = LLMGateway("x", server.base_url, **(gateway_options or {}))
+        gateways.append(gateway)
+        return server, gateway
+
+    yield start
+    for gateway in gateways:
+        gateway.close()
+    for server in servers:
+        server.shutdown()
+
+def counter(tracer, name):
+    return sum(value for (key, _), value in tracer.counters.items() if key == name)
+
+def test_retries_429_honouring_retry_after(serve, tracer):
+    server, gateway = serve(fail_first=2, retry_after=0)
+    content, usage = gateway.complete("fake", MESSAGES)
+    assert json.loads(content)["keywords"]
+    assert usage.total_tokens > 0
+    assert counter(tracer, "llm_retries_total") == 2
+    assert tracer.counters[("llm_retries_total", (("model", "fake"), ("status", "429")))] == 2
+
+def test_retries_429_with_backoff(serve, tracer):
+    server, gateway = serve({"backoff_base": 0.01}, fail_first=1)
+    content, _ = gateway.complete("fake", MESSAGES)
+    assert json.loads(content)["keywords"]
+    assert counter(tracer, "llm_retries_total") == 1
+
+def test_gives_up_after_max_retries(serve, tracer):
+    server, gateway = serve({"max_retries": 2}, fail_first=10, retry_after=0)
+    with pytest.raises(LLMError, match="after 3 attempts"):
+        gateway.complete("fake", MESSAGES)
+    assert counter(tracer, "llm_retries_total") == 2
+
+def test_hedges_a_slow_request(serve, tracer):
+    server, gateway = serve({"hedge_after": 0.1}, slow_first=1, tail_latency=2.0)
+    started = time.perf_counter()
+    content, _ = gateway.complete("fake", MESSAGES)
+    assert time.perf_counter() - started < 1.0
+    assert json.loads(content)["keywords"]
+    assert counter(tracer, "llm_hedges_total") == 1
+    assert counter(tracer, "llm_hedge_wins_total") == 1
+
+def test_no_hedge_before_threshold(serve, tracer):
+    server, gateway = serve({"hedge_after": 1.0}, latency=0.05)
+    gateway.complete("fake", MESSAGES)
+    assert counter(tracer, "llm_hedges_total") == 0
+
+def test_no_hedge_while_model_slots_are_taken(serve, tracer):
+    server, gateway = serve({"hedge_after": 0.1, "default_model_limit": 1}, slow_first=1, tail_latency=0.5)
+    gateway.complete("fake", MESSAGES)
+    assert counter(tracer, "llm_hedges_total") == 0
+
+def test_auto_hedge_delay_waits_for_samples():
+    gateway = LLMGateway("x", hedge_min_samples=5)
+    gateway._latencies["fake"].extend([0.1, 0.2, 0.3, 0.4])
+    assert gateway.hedge_delay("fake") is None
+    gateway._latencies["fake"].append(1.0)
+    assert gateway.hedge_delay("fake") == 1.0
+    assert LLMGateway("x", hedge_after=None).hedge_delay("fake") is None
+
+def test_complete_many_returns_results_in_order_with_errors_inline(serve, tracer):
+    server, gateway = serve({"max_retries": 0}, fail_first=1)
+    other = [MESSAGES[0], {"role": "user", "content": "Query: booster catch"}]
+    results = gateway.complete_many([("fake", MESSAGES), ("fake", other), ("fake", MESSAGES)])
+    errors = [r for r in results if isinstance(r, Exception)]
+    assert len(errors) == 1 and isinstance(errors[0], LLMError)
+    for request, result in zip((MESSAGES, other, MESSAGES), results):
+        if isinstance(result, Exception):
+            continue
+        content, usage = result
+        assert json.loads(content)["keywords"][0] in request[1]["content"]
+        assert usage.total_tokens > 0
+
+def test_chat_completions_batches_misses_and_records_usage_per_request(serve, monkeypatch, tmp_path):
+    import main
+    from llm_cache import LLMCache
+    from tracing import tracer
+
+    server, gateway = serve()
+    monkeypatch.setattr(main, "gateway", gateway)
+    monkeypatch.setattr(main, "llm_cache", LLMCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(tracer, "enabled", True)
+    tracer.reset()
+    queries = ("starship launches", "booster catch", "flight seven")
+    requests = [main.keyword_request(query) for query in queries]
+    main.llm_cache.put(*requests[1], '{"keywords": ["cached"]}')
+
+    calls = []
+    complete_many = gateway.complete_many
+    monkeypatch.setattr(gateway, "complete_many", lambda batch: calls.append(len(batch)) or complete_many(batch))
+    contents = main.chat_completions(requests)
+
+    assert calls == [2]
+    assert json.loads(contents[0])["keywords"][0] in queries[0]
+    assert contents[1] == '{"keywords": ["cached"]}'
+    assert json.loads(contents[2])["keywords"][0] in queries[2]
+    batch = tracer.roots[-1]
+    assert batch.name == "llm_batch" and batch.attrs["cache_hits"] == 1
+    # Both misses are counted, not just the last one to finish
+    prompt = tracer.counters[("llm_prompt_tokens_total", (("model", requests[0][0]),))]
+    assert batch.attrs["prompt_tokens"] == prompt
+    assert prompt > main.estimate_tokens(requests[0][1] + requests[0][2])
+    tracer.reset()
@@ -0,0 +1,51 @@
+import pytest
+
+from market_model import parse_cents, parse_market, parse_money, parse_percentage
+
+@pytest.mark.parametrize("text, expected", [
+    ("$592,563 Vol.", 592563.0),
+    ("$1,204,117 Vol.", 1204117.0),
+    ("$1.2m Vol.", 1200000.0),
+    ("$84k Vol.", 84000.0),
+    ("N/A", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_money(text, expected):
+    assert parse_money(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("96%", 0.96),
+    ("12% chance", 0.12),
+    ("<1%", 0.005),
+    (">99%", 0.995),
+])
+def test_parse_percentage(text, expected):
+    assert parse_percentage(text) == pytest.approx(expected)
+
+@pytest.mark.parametrize("text, expected", [
+    ("Buy Yes 97.0¢", 0.97),
+    ("Buy No 4.1¢", 0.041),
+    ("Buy Yes 0.4¢", 0.004),
+])
+def test_parse_cents(text, expected):
+    assert parse_cents(text) == pytest.approx(expected)
+
+@pytest.mark.parametrize("text", ["N/A", "Buy No", "", None])
+def test_unparsable_display_strings_are_none(text):
+    assert parse_percentage(text) is None
+    assert parse_cents(text) is None
+
+def test_parse_market_keeps_missing_fields_as_none():
+    market = parse_market({
+        "title": "Will Starship Flight 7 launch before 2025?",
+        "volume": "$1,204,117 Vol.",
+        "end_date": "Dec 31, 2024",
+        "outcomes": [{"title": "Will Starship Flight 7 launch before 2025?", "volume": "N/A",
+                      "percentage": "12% chance", "buy_yes_price": "Buy Yes 12.5¢", "buy_no_price": "Buy No 88.1¢"}],
+    })
+    assert not market.is_multi_outcome
+    assert market.volume == 1204117.0
+    outcome = market.outcomes[0]
+    assert outcome.volume is None
+    assert (outcome.probability, outcome.buy_yes, outcome.buy_no) == pytest.approx((0.12, 0.125, 0.881))
@@ -0,0 +1,66 @@
+from analytics import compute_metrics
+from prompts import encode_markets, encode_titles, estimate_tokens, fit, format_value
+from test_analytics import MULTI, SINGLE
+
+def test_estimate_tokens_counts_words_symbols_and_long_words():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a b") == 2
+    assert estimate_tokens("x|y") == 3
+    assert estimate_tokens("starship") == 2
+
+def test_format_value():
+    assert format_value(None) == "-"
+    assert format_value(float("nan")) == "-"
+    assert format_value(592563.0) == "592563"
+    assert format_value(0.95637) == "0.9564"
+    assert format_value("a|b\nc") == "a/b c"
+
+def test_fit_drops_the_fewest_items_that_fit():
+    def build(dropped):
+        return " ".join(["word"] * (10 - dropped))
+
+    assert fit(build, 10, None) == (build(0), 0)
+    assert fit(build, 10, 10) == (build(0), 0)
+    assert fit(build, 10, 7) == (build(3), 3)
+    # Too long even with everything dropped: the shortest text is returned
+    assert fit(build, 4, 2) == (build(4), 4)
+
+def test_encode_titles_numbers_titles_and_keeps_the_first():
+    markets = [{"title": "Starship flight 7"}, {"title": "Starship launches"}, {"title": "Bitcoin"}]
+    assert encode_titles(markets) == ("1. Starship flight 7\n2. Starship launches\n3. Bitcoin", 0)
+    text, dropped = encode_titles(markets, max_tokens=1)
+    assert (text, dropped) == ("1. Starship flight 7", 2)
+
+def test_encode_markets_writes_one_table_per_market():
+    text, dropped = encode_markets([MULTI, SINGLE], compute_metrics([MULTI, SINGLE]))
+    assert dropped == 0
+    multi, single = text.split("\n\n")
+    lines = multi.splitlines()
+    assert lines[0] == "Market: How many SpaceX Starship launches reach space in 2024?"
+    assert "overround=0.025" in lines[1] and "end=Dec 31, 2024" in lines[1]
+    assert lines[2] == "outcome|prob|implied|yes|no|spread|volume|share|ret_yes|ret_no"
+    assert lines[5] == "4|0.96|0.9564|0.97|0.041|0.011|145048|0.2448|-0.0141|0.0641"
+    assert len(lines) == 7
+    assert single.splitlines()[0] == "Market: Will Starship Flight 7 launch before 2025?"
+
+def test_encode_markets_without_metrics_uses_parsed_values():
+    text, _ = encode_markets([MULTI])
+    assert text.splitlines()[2] == "outcome|prob|yes|no|volume"
+    assert "4|0.96|0.97|0.041|145048" in text
+
+def test_encode_markets_drops_lowest_volume_outcomes_first():
+    full, _ = encode_markets([MULTI, SINGLE], compute_metrics([MULTI, SINGLE]))
+    text, dropped = encode_markets([MULTI, SINGLE], compute_metrics([MULTI, SINGLE]),
+                                   max_tokens=estimate_tokens(full) - 1)
+    assert dropped == 1
+    assert "\n2 or less|" not in text
+    assert "+1 more lower-volume outcomes: volume=84310 prob_sum=0.005" in text
+
+def test_encode_markets_keeps_each_markets_largest_outcome():
+    text, dropped = encode_markets([MULTI, SINGLE], compute_metrics([MULTI, SINGLE]), max_tokens=1)
+    # Every outcome of the multi-outcome market but "5+", the single market's only one
+    assert dropped == 3
+    assert "\n5+|" in text
+    assert "+3 more lower-volume outcomes: volume=358334" in text
+    assert "Market: Will Starship Flight 7 launch before 2025?" in text
+    assert "\nWill Starship Flight 7 launch before 2025?|0.12|" in text
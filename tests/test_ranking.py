@@ -0,0 +1,41 @@
+from ranking import MarketIndex, normalize_title, tokenize
+
+CARDS = [
+    {"title": "Will Starship Flight 7 launch before 2025?", "index": 1},
+    {"title": "How many SpaceX Starship launches reach space in 2024?", "index": 2},
+    {"title": "Bitcoin above $100k in 2024?", "index": 3},
+    {"title": "Who will win the 2024 US presidential election?", "index": 4},
+]
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert tokenize("How many Starship launches in 2024?") == ["starship", "launch", "2024"]
+    assert normalize_title("  Bitcoin above $100k in 2024? ") == "bitcoin above 100k in 2024"
+
+def test_prerank_picks_a_clear_winner():
+    winner, candidates = MarketIndex(CARDS).prerank("bitcoin 100k")
+    assert winner is CARDS[2]
+    assert candidates == [CARDS[2]]
+
+def test_prerank_leaves_close_titles_to_the_llm():
+    winner, candidates = MarketIndex(CARDS).prerank("starship launches")
+    assert winner is None
+    assert candidates == [CARDS[0], CARDS[1]]
+
+def test_prerank_needs_enough_of_the_query_in_the_winner():
+    winner, candidates = MarketIndex(CARDS).prerank("election polls turnout swing states")
+    assert winner is None
+    assert candidates == [CARDS[3]]
+
+def test_prerank_without_matches_sends_the_first_cards():
+    winner, candidates = MarketIndex(CARDS).prerank("ethereum merge", top_k=2)
+    assert winner is None
+    assert candidates == CARDS[:2]
+
+def test_prerank_on_an_empty_page():
+    assert MarketIndex([]).prerank("starship") == (None, [])
+
+def test_lookup_tolerates_case_punctuation_and_small_edits():
+    index = MarketIndex(CARDS)
+    assert index.lookup("will starship flight 7 launch before 2025") is CARDS[0]
+    assert index.lookup("How many SpaceX Starship launch reach space in 2024?") is CARDS[1]
+    assert index.lookup("Will the Fed cut rates?") is None
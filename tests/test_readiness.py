@@ -0,0 +1,39 @@
+from readiness import Condition, Readiness
+
+class FakeDriver:
+    """Driver whose condition script returns ``value`` from the first call on."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def execute_script(self, script, *args):
+        return self.value
+
+def readiness(optional=False, **options):
+    conditions = {"cards": Condition("cards", "", optional=optional)}
+    return Readiness(conditions, poll_interval=0.01, **options)
+
+def test_timeouts_are_not_learned_as_load_times():
+    r = readiness(default_timeout=0.05, min_timeout=0.01, min_samples=1)
+    for _ in range(3):
+        assert not r.wait(FakeDriver(None), "cards")
+    assert r.timeout_for("cards") == 0.05
+    assert r.stats()["cards"]["timeouts"] == 3
+
+def test_timeout_comes_from_successful_waits_only():
+    r = readiness(default_timeout=0.05, min_timeout=0.01, max_timeout=10, timeout_factor=1, min_samples=3)
+    for _ in range(3):
+        assert r.wait(FakeDriver(1), "cards")
+    learned = r.timeout_for("cards")
+    assert not r.wait(FakeDriver(None), "cards", timeout=0.2)
+    assert r.timeout_for("cards") == learned
+
+def test_p95_does_not_extrapolate_past_the_slowest_wait():
+    r = readiness(min_timeout=0, timeout_factor=1, min_samples=3)
+    r._samples["cards"] = [1.0, 1.0, 2.0]
+    assert r.timeout_for("cards") <= 2.0
+
+def test_optional_miss_is_not_a_timeout():
+    r = readiness(optional=True, default_timeout=0.03)
+    assert not r.wait(FakeDriver(None), "cards")
+    assert r.stats()["cards"]["timeouts"] == 0
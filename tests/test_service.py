@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from service import AnalysisService, ServiceBusy, normalize_query, start_service
+
+class BlockedRun:
+    """Pipeline stub that holds every query until ``release`` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, query):
+        self.calls.append(query)
+        self.release.wait(5)
+        return {"query": query} if "fail" not in query else None
+
+@pytest.fixture
+def blocked():
+    run = BlockedRun()
+    yield run
+    run.release.set()
+
+@pytest.fixture
+def server(blocked):
+    server = start_service(blocked, workers=1, max_queue=1, request_timeout=5)
+    yield server
+    blocked.release.set()
+    server.shutdown()
+    server.server_close()
+    server.service.close()
+
+def request(server, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(server.base_url + path, data=data), timeout=5) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+def test_normalize_query():
+    assert normalize_query("  Starship   LAUNCHES ") == "starship launches"
+
+def test_rejects_beyond_workers_plus_queue(blocked):
+    service = AnalysisService(blocked, workers=1, max_queue=1)
+    try:
+        service.submit("first")
+        service.submit("second")
+        with pytest.raises(ServiceBusy):
+            service.submit("third")
+        # A duplicate of an admitted query joins it instead of being rejected
+        future, shared = service.submit("SECOND")
+        assert shared
+        blocked.release.set()
+        assert future.result(5) == {"query": "second"}
+    finally:
+        blocked.release.set()
+        service.close()
+    assert service.stats()["rejected"] == 1
+
+def test_busy_service_answers_429_with_retry_after(server):
+    server.service.submit("first")
+    server.service.submit("second")
+    status, headers, body = request(server, "/analyze", {"query": "third"})
+    assert status == 429
+    assert headers["Retry-After"] == "5"
+    assert "Too many queries" in body["error"]
+
+def test_duplicate_query_shares_the_running_one(server, blocked):
+    responses = {}
+
+    def ask(name, query):
+        responses[name] = request(server, "/analyze", {"query": query})
+
+    threads = [threading.Thread(target=ask, args=("first", "Starship launches"))]
+    threads[0].start()
+    wait_for(lambda: blocked.calls)
+    threads.append(threading.Thread(target=ask, args=("duplicate", "  starship   LAUNCHES")))
+    threads[1].start()
+    wait_for(lambda: server.service.stats()["deduplicated"] == 1)
+    blocked.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert blocked.calls == ["Starship launches"]
+    assert responses["first"][0] == responses["duplicate"][0] == 200
+    assert responses["first"][2]["shared"] is False
+    assert responses["duplicate"][2]["shared"] is True
+    assert responses["duplicate"][2]["result"] == {"query": "Starship launches"}
+
+def test_stats_count_admissions_and_outcomes(server, blocked):
+    server.service.submit("ok query")
+    server.service.submit("fail query")
+    status, _, stats = request(server, "/stats")
+    assert status == 200
+    assert stats["running"] == 1 and stats["queued"] == 1 and stats["admitted"] == 2
+    assert request(server, "/analyze", {"query": "one more"})[0] == 429
+    duplicate = threading.Thread(target=request, args=(server, "/analyze?q=OK%20query"))
+    duplicate.start()
+    wait_for(lambda: server.service.stats()["deduplicated"] == 1)
+    blocked.release.set()
+    duplicate.join(5)
+
+    wait_for(lambda: server.service.stats()["queued"] == 0 and server.service.stats()["running"] == 0)
+    _, _, stats = request(server, "/stats")
+    assert stats == {
+        "workers": 1, "max_queue": 1, "running": 0, "queued": 0,
+        "admitted": 2, "completed": 1, "failed": 1, "rejected": 1, "deduplicated": 1,
+    }
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+# Stands in for a .env file: load_dotenv sets the variables when main calls it
+SCRIPT = """
+import json, os, sys
+import dotenv
+
+def load_dotenv(*args, **kwargs):
+    os.environ.update(json.loads(sys.argv[1]))
+    return True
+
+dotenv.load_dotenv = load_dotenv
+import main, scraper
+print(json.dumps({
+    "profile": scraper.BROWSER_PROFILE,
+    "strategy": scraper.PAGE_LOAD_STRATEGY,
+    "blocked": scraper.EXTRA_BLOCKED_URLS,
+}))
+"""
+
+def scraper_settings(tmp_path, dotenv):
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("BROWSER_PROFILE", "PAGE_LOAD_STRATEGY", "BLOCKED_URLS")}
+    env.update(
+        GLHF_API_KEY="test",
+        SNAPSHOT_PATH=str(tmp_path / "snapshots.sqlite"),
+        LLM_CACHE_PATH=str(tmp_path / "llm_cache.sqlite"),
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT, json.dumps(dotenv)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_dotenv_browser_profile_reaches_the_scraper(tmp_path):
+    settings = scraper_settings(tmp_path, {"BROWSER_PROFILE": "lean", "BLOCKED_URLS": "*.css*, *.js*"})
+    assert settings["profile"] == "lean"
+    assert settings["blocked"] == ["*.css*", "*.js*"]
+
+def test_dotenv_page_load_strategy_reaches_the_scraper(tmp_path):
+    assert scraper_settings(tmp_path, {"PAGE_LOAD_STRATEGY": "eager"})["strategy"] == "eager"
+    assert scraper_settings(tmp_path, {})["strategy"] == "normal"
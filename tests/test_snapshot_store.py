@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from backends import ScraperBackend
+from snapshot_store import SnapshotBackend, SnapshotStore, market_key
+
+MARKET = {"title": "Will Starship Flight 7 launch before 2025?",
+          "url": "https://polymarket.com/event/will-starship-flight-7-launch-before-2025"}
+KEY = "will-starship-flight-7-launch-before-2025"
+
+def details(percentage="12%", volume="$1,204,117 Vol."):
+    return {
+        "title": MARKET["title"],
+        "volume": volume,
+        "end_date": "Dec 31, 2024",
+        "outcomes": [{"title": "Yes", "volume": "N/A", "percentage": percentage,
+                      "buy_yes_price": "Buy Yes 12.5¢", "buy_no_price": "Buy No 88.1¢"}],
+    }
+
+class StubBackend(ScraperBackend):
+    name = "stub"
+
+    def __init__(self, result=None, gate=None):
+        self.result = result or details("40%")
+        self.gate = gate
+        self.fetched = []
+        self.closed = False
+
+    def fetch_market(self, market):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.fetched.append(market["url"])
+        return self.result
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite"), fresh_for=60, stale_for=600)
+    yield store
+    store.close()
+
+def age(store, seconds):
+    store.put(KEY, details(), MARKET["url"], captured_at=time.time() - seconds)
+
+def test_market_key_uses_slug_or_title():
+    assert market_key(MARKET) == KEY
+    assert market_key({"title": "Starship  Booster?"}) == market_key({"title": "starship booster"})
+
+def test_freshness_windows(store):
+    assert store.freshness(60) == "fresh"
+    assert store.freshness(61) == "stale"
+    assert store.freshness(660) == "stale"
+    assert store.freshness(661) == "expired"
+
+def test_fresh_snapshot_is_served_without_scraping(store):
+    age(store, 10)
+    backend = StubBackend()
+    assert SnapshotBackend(backend, store).fetch_market(MARKET) == details()
+    assert backend.fetched == []
+    assert store.hits["fresh"] == 1
+
+def test_stale_snapshot_is_served_and_refreshed_in_background(store):
+    age(store, 120)
+    backend, refresher = StubBackend(), StubBackend()
+    assert SnapshotBackend(backend, store, lambda: refresher).fetch_market(MARKET) == details()
+    store.drain()
+    assert backend.fetched == []
+    assert refresher.fetched == [MARKET["url"]] and refresher.closed
+    assert store.get(KEY)[0] == details("40%")
+    assert store.hits["stale"] == 1
+
+def test_stale_snapshot_without_factory_is_scraped(store):
+    age(store, 120)
+    backend = StubBackend()
+    assert SnapshotBackend(backend, store).fetch_market(MARKET) == details("40%")
+    assert backend.fetched == [MARKET["url"]]
+    assert store.hits["miss"] == 1
+
+def test_stale_snapshot_is_not_refreshed_when_factory_declines(store):
+    age(store, 120)
+    backend = StubBackend()
+    assert SnapshotBackend(backend, store, lambda: None).fetch_market(MARKET) == details()
+    store.drain()
+    assert backend.fetched == []
+    assert store.get(KEY)[0] == details()
+
+def test_expired_snapshot_is_scraped(store):
+    age(store, 1000)
+    backend, refresher = StubBackend(), StubBackend()
+    assert SnapshotBackend(backend, store, lambda: refresher).fetch_market(MARKET) == details("40%")
+    assert backend.fetched == [MARKET["url"]]
+    assert refresher.fetched == []
+
+def test_concurrent_queries_share_one_scrape(store):
+    gate = threading.Event()
+    backend = StubBackend(gate=gate)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(SnapshotBackend(backend, store).fetch_market(MARKET)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    while store.hits["miss"] + store.hits["shared"] < 3:
+        time.sleep(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert backend.fetched == [MARKET["url"]]
+    assert results == [details("40%")] * 3
+    assert store.hits["miss"] == 1 and store.hits["shared"] == 2
+
+def test_failed_scrape_wakes_waiters_with_none(store):
+    future, owner = store.claim(KEY)
+    assert owner
+    assert store.claim(KEY) == (future, False)
+    store.resolve(KEY, None)
+    assert future.result(0) is None
+    assert store.get(KEY) is None
+
+def test_history_records_only_changed_captures(store):
+    store.put(KEY, details("12%"), captured_at=100)
+    store.put(KEY, details("12%"), captured_at=200)
+    store.put(KEY, details("15%", "$1,300,000 Vol."), captured_at=300)
+    points = store.history(KEY)
+    assert [p["captured_at"] for p in points] == [100, 300]
+    assert points[0]["volume"] == 1204117
+    assert points[1]["outcomes"]["Yes"]["probability"] == pytest.approx(0.15)
+    assert [p["captured_at"] for p in store.history(KEY, since=200)] == [300]
+    assert store.markets() == {KEY: 300}
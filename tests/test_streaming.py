@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from streaming import AnalysisStreamParser, extract_analysis, recover_json, strip_fences
+
+ANALYSIS = {
+    "analysis": {
+        "bet_description": "It is a bet.",
+        "probabilities": 0.5,
+        "volume_and_liquidity": "Thin.",
+        "summary": "Done.",
+    }
+}
+
+def feed_chars(parser, text):
+    completed = []
+    for ch in text:
+        completed.extend(parser.feed(ch))
+    return completed
+
+def test_parser_emits_each_section_once_when_fed_char_by_char():
+    parser = AnalysisStreamParser()
+    completed = feed_chars(parser, json.dumps(ANALYSIS))
+    assert completed == list(ANALYSIS["analysis"].items())
+
+def test_parser_waits_for_a_number_split_at_the_decimal_point():
+    parser = AnalysisStreamParser()
+    assert parser.feed('{"analysis": {"probabilities": 0') == []
+    assert parser.feed(".") == []
+    assert parser.feed('5, "summary": "Done."}}') == [("probabilities", 0.5), ("summary", "Done.")]
+
+def test_parser_ignores_a_leading_markdown_fence():
+    parser = AnalysisStreamParser()
+    completed = feed_chars(parser, "```json\n" + json.dumps(ANALYSIS) + "\n```")
+    assert dict(completed) == ANALYSIS["analysis"]
+
+def test_strip_fences():
+    assert strip_fences('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert strip_fences('{"a": 1}') == '{"a": 1}'
+
+def test_recover_json_with_surrounding_prose():
+    assert recover_json('Here you go: {"a": 1} hope it helps') == {"a": 1}
+
+@pytest.mark.parametrize("truncated, expected", [
+    ('{"analysis": {"bet_description": "It is', {"analysis": {"bet_description": "It is"}}),
+    ('{"analysis": {"bet_description": "It is a bet.", "volume_and',
+     {"analysis": {"bet_description": "It is a bet."}}),
+    ('{"analysis": {"bet_description": "It is a bet.", "volume_and_liquidity"',
+     {"analysis": {"bet_description": "It is a bet."}}),
+    ('{"analysis": {"bet_description": "It is a bet.", "volume_and_liquidity": ',
+     {"analysis": {"bet_description": "It is a bet."}}),
+    ('{"analysis": {"probabilities": 0.', {"analysis": {"probabilities": 0}}),
+    ('{"analysis": {"risks": ["a", "b', {"analysis": {"risks": ["a", "b"]}}),
+])
+def test_recover_json_closes_truncated_documents(truncated, expected):
+    assert recover_json(truncated) == expected
+
+def test_recover_json_gives_up_without_an_object():
+    assert recover_json("no json here") is None
+    assert recover_json("") is None
+
+def test_extract_analysis_accepts_wrapped_and_bare_sections():
+    assert extract_analysis(ANALYSIS) == ANALYSIS["analysis"]
+    assert extract_analysis({"summary": "Done."}) == {"summary": "Done."}
+    assert extract_analysis({"other": 1}) is None
+    assert extract_analysis(None) is None
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from tracing import Tracer
+
+def names(span):
+    return [span.name] + [name for child in span.children for name in names(child)]
+
+def test_spans_nest_and_record_errors():
+    tracer = Tracer(enabled=True)
+    with tracer.span("query", q="starship") as query:
+        with tracer.span("search") as search:
+            search.set(results=3)
+        with pytest.raises(ValueError):
+            with tracer.span("details"):
+                raise ValueError("no outcomes")
+    assert list(tracer.roots) == [query]
+    assert names(query) == ["query", "search", "details"]
+    assert query.attrs == {"q": "starship"}
+    assert search.attrs == {"results": 3}
+    assert query.children[1].error == "ValueError: no outcomes"
+    assert tracer.durations["details"]["errors"] == 1
+    assert tracer.durations["search"]["count"] == 1
+    assert tracer.current() is None
+
+def test_propagate_nests_worker_spans_under_the_caller():
+    tracer = Tracer(enabled=True)
+
+    def fetch(url):
+        with tracer.span("http_get", url=url):
+            pass
+
+    with tracer.span("details") as details:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(tracer.propagate(fetch), ["a", "b", "c"]))
+    assert list(tracer.roots) == [details]
+    assert sorted(child.attrs["url"] for child in details.children) == ["a", "b", "c"]
+
+def test_propagate_without_a_span_returns_the_function():
+    tracer = Tracer(enabled=True)
+    fetch = lambda: None
+    assert tracer.propagate(fetch) is fetch
+
+def test_record_usage_counts_tokens_and_tags_the_span():
+    tracer = Tracer(enabled=True)
+    with tracer.span("llm") as span:
+        tracer.record_usage("hf:model", SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+    tracer.record_usage("hf:model", SimpleNamespace(prompt_tokens=10, completion_tokens=None))
+    tracer.record_usage("hf:model", None)
+    assert span.attrs == {"prompt_tokens": 120, "completion_tokens": 30}
+    assert tracer.counters[("llm_prompt_tokens_total", (("model", "hf:model"),))] == 130
+    assert tracer.counters[("llm_completion_tokens_total", (("model", "hf:model"),))] == 30
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("query") as span:
+        span.set(q="starship")
+        tracer.incr("llm_requests_total", model="m")
+        tracer.record_usage("m", SimpleNamespace(prompt_tokens=1, completion_tokens=1))
+        assert tracer.current() is None
+    assert not tracer.roots and not tracer.counters and not tracer.durations
+    assert tracer.prometheus_text() == "\n"
+
+def test_prometheus_text_escapes_labels():
+    tracer = Tracer(enabled=True)
+    tracer.incr("llm_requests_total", model='hf:"quoted"\\model\nx', cache="miss")
+    tracer.incr("llm_requests_total", 0.5, model="plain", cache="hit")
+    with tracer.span("search"):
+        pass
+    lines = tracer.prometheus_text().splitlines()
+    assert lines[0] == "# TYPE llm_requests_total counter"
+    assert 'llm_requests_total{cache="hit",model="plain"} 0.5' in lines
+    assert 'llm_requests_total{cache="miss",model="hf:\\"quoted\\"\\\\model\\nx"} 1' in lines
+    assert "# TYPE stage_duration_seconds summary" in lines
+    assert 'stage_duration_seconds_count{stage="search"} 1' in lines
+    assert 'stage_errors_total{stage="search"} 0' in lines
+
+def test_to_dict_and_reset():
+    tracer = Tracer(enabled=True)
+    with tracer.span("query"):
+        tracer.incr("retries_total", stage="search")
+    data = tracer.to_dict()
+    assert data["spans"][0]["name"] == "query"
+    assert data["counters"] == [{"name": "retries_total", "labels": {"stage": "search"}, "value": 1}]
+    tracer.reset()
+    assert tracer.to_dict()["spans"] == [] and tracer.to_dict()["counters"] == []
+
+def test_record_usage_sums_requests_on_one_span():
+    tracer = Tracer(enabled=True)
+    with tracer.span("llm_batch") as span:
+        tracer.record_usage("a", SimpleNamespace(prompt_tokens=100, completion_tokens=10))
+        tracer.record_usage("b", SimpleNamespace(prompt_tokens=50, completion_tokens=5))
+    assert span.attrs == {"prompt_tokens": 150, "completion_tokens": 15}
+    assert tracer.counters[("llm_prompt_tokens_total", (("model", "b"),))] == 50
@@ -0,0 +1,154 @@
+import io
+import json
+
+import pytest
+
+import main
+from backends import ScraperBackend
+from snapshot_store import SnapshotStore
+from watch import Thresholds, Watcher, crosses, diff_markets
+
+def outcome(title, percentage="12%", yes="Buy Yes 12.5¢", no="Buy No 88.1¢", volume="$100,000 Vol."):
+    return {"title": title, "volume": volume, "percentage": percentage,
+            "buy_yes_price": yes, "buy_no_price": no}
+
+def market(*outcomes, volume="$1,000,000 Vol."):
+    return {"title": "How many Starship launches?", "volume": volume, "end_date": "Dec 31, 2024",
+            "outcomes": list(outcomes)}
+
+def fields(changes):
+    return {(c["outcome"], c["field"]): (c["old"], c["new"]) for c in changes}
+
+def test_unchanged_market_has_no_changes():
+    assert diff_markets(market(outcome("4")), market(outcome("4"))) == []
+
+def test_reports_numeric_moves_per_outcome_and_market():
+    before = market(outcome("4", "12%"), outcome("5+"))
+    after = market(outcome("4", "15%", yes="Buy Yes 15.5¢"), outcome("5+"), volume="$1,100,000 Vol.")
+    changes = fields(diff_markets(before, after))
+    assert changes.keys() == {(None, "volume"), ("4", "probability"), ("4", "buy_yes")}
+    assert changes[(None, "volume")] == (1_000_000, 1_100_000)
+    old, new = changes[("4", "probability")]
+    assert (round(old, 3), round(new, 3)) == (0.12, 0.15)
+
+def test_reports_added_and_removed_outcomes():
+    changes = fields(diff_markets(market(outcome("3"), outcome("4")), market(outcome("4"), outcome("5+"))))
+    assert changes == {("5+", "added"): (None, None), ("3", "removed"): (None, None)}
+
+def test_value_appearing_or_disappearing_is_a_change():
+    before = market(outcome("4", yes=None))
+    after = market(outcome("4"))
+    assert fields(diff_markets(before, after)) == {("4", "buy_yes"): (None, 0.125)}
+    assert fields(diff_markets(after, before)) == {("4", "buy_yes"): (0.125, None)}
+
+def test_price_move_crosses_in_either_direction():
+    thresholds = Thresholds(price=0.02)
+    up = {"outcome": "4", "field": "probability", "old": 0.12, "new": 0.15}
+    down = {"outcome": "4", "field": "buy_no", "old": 0.88, "new": 0.85}
+    small = {"outcome": "4", "field": "buy_yes", "old": 0.125, "new": 0.135}
+    assert crosses(up, thresholds)
+    assert crosses(down, thresholds)
+    assert not crosses(small, thresholds)
+
+def test_move_of_exactly_the_threshold_crosses():
+    # 0.145 - 0.125 is a hair under 0.02 in floating point
+    assert crosses({"outcome": "4", "field": "buy_yes", "old": 0.125, "new": 0.145}, Thresholds(price=0.02))
+    assert crosses({"outcome": None, "field": "volume", "old": 100.0, "new": 110.0}, Thresholds(volume=0.10))
+    assert crosses({"outcome": None, "field": "volume", "old": 100.0, "new": 90.0}, Thresholds(volume=0.10))
+    assert not crosses({"outcome": None, "field": "volume", "old": 100.0, "new": 109.0}, Thresholds(volume=0.10))
+
+def test_missing_values_and_membership_changes_always_cross():
+    thresholds = Thresholds()
+    assert crosses({"outcome": "4", "field": "probability", "old": None, "new": 0.12}, thresholds)
+    assert crosses({"outcome": "4", "field": "probability", "old": 0.12, "new": None}, thresholds)
+    assert crosses({"outcome": "5+", "field": "added", "old": None, "new": None}, thresholds)
+    assert crosses({"outcome": "3", "field": "removed", "old": None, "new": None}, thresholds)
+
+def test_volume_from_zero_crosses_only_when_it_grows():
+    thresholds = Thresholds(volume=0.10)
+    assert crosses({"outcome": "4", "field": "volume", "old": 0.0, "new": 50.0}, thresholds)
+    assert not crosses({"outcome": "4", "field": "volume", "old": 0.0, "new": 0.0}, thresholds)
+
+def test_diffed_changes_feed_crosses():
+    before = market(outcome("4", "12%", yes="Buy Yes 12.5¢"))
+    after = market(outcome("4", "13%", yes="Buy Yes 13.5¢"))
+    assert not any(crosses(c, Thresholds(price=0.02)) for c in diff_markets(before, after))
+    assert all(crosses(c, Thresholds(price=0.01)) for c in diff_markets(before, after))
+
+WATCHED = [{"url": "https://polymarket.com/event/how-many-starship-launches", "title": "How many Starship launches?"}]
+KEY = "how-many-starship-launches"
+
+class ScriptedBackend(ScraperBackend):
+    """Returns the next scripted details on every poll."""
+
+    name = "scripted"
+
+    def __init__(self, *polls):
+        self.polls = list(polls)
+
+    def fetch_markets(self, markets, concurrency=4):
+        return [self.polls.pop(0) for _ in markets]
+
+@pytest.fixture
+def analyses(monkeypatch, tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite"))
+    monkeypatch.setattr(main, "snapshot_store", store)
+    calls = []
+
+    def analyze_final(query, market_details, metrics=None, on_section=None):
+        calls.append(market_details[0])
+        return {"summary": f"analysis {len(calls)}"}
+
+    monkeypatch.setattr(main, "analyze_final", analyze_final)
+    yield calls
+    store.close()
+
+def events(feed, event_type=None):
+    lines = [json.loads(line) for line in feed.getvalue().splitlines()]
+    return [e for e in lines if event_type is None or e["type"] == event_type]
+
+def test_reuses_analysis_until_a_threshold_is_crossed(analyses):
+    first = market(outcome("4", "12%"))
+    small = market(outcome("4", "13%"))
+    large = market(outcome("4", "15%"))
+    feed = io.StringIO()
+    watcher = Watcher(WATCHED, ScriptedBackend(first, first, small, large), Thresholds(price=0.02), feed=feed)
+    for _ in range(4):
+        watcher.poll()
+
+    # Analyzed on the first poll and after the move past the threshold only
+    assert analyses == [first, large]
+    assert (watcher.analyses, watcher.reused) == (2, 2)
+    assert [e["type"] for e in events(feed)] == ["analysis", "change", "change", "analysis"]
+    assert events(feed, "analysis")[1]["triggers"][0]["field"] == "probability"
+
+def test_change_events_list_the_moves_since_the_last_poll(analyses):
+    feed = io.StringIO()
+    watcher = Watcher(WATCHED, ScriptedBackend(market(outcome("4", "12%")), market(outcome("4", "13%"))), feed=feed)
+    watcher.poll()
+    watcher.poll()
+    (change,) = events(feed, "change")
+    assert change["market"] == KEY
+    assert [(c["outcome"], c["field"]) for c in change["changes"]] == [("4", "probability")]
+    assert change["changes"][0]["new"] == pytest.approx(0.13)
+
+def test_failed_fetch_emits_an_error_and_keeps_the_analysis(analyses):
+    feed = io.StringIO()
+    watcher = Watcher(WATCHED, ScriptedBackend(market(outcome("4")), None), feed=feed)
+    watcher.poll()
+    watcher.poll()
+    assert len(analyses) == 1
+    assert events(feed, "error")[0]["error"] == "market could not be fetched"
+    assert watcher.state[KEY]["analysis"] == {"summary": "analysis 1"}
+
+def test_state_survives_a_restart(analyses, tmp_path):
+    state = str(tmp_path / "watch_state.json")
+    first = market(outcome("4", "12%"))
+    Watcher(WATCHED, ScriptedBackend(first), state_path=state).poll()
+
+    restarted = Watcher(WATCHED, ScriptedBackend(market(outcome("4", "13%"))), state_path=state)
+    assert restarted.state[KEY]["analysis"] == {"summary": "analysis 1"}
+    restarted.poll()
+    assert len(analyses) == 1 and restarted.reused == 1
+    with open(state) as f:
+        assert json.load(f)[KEY]["baseline"] == first